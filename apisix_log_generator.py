@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Synthetic APISIX Log Generator
+
+This script writes realistic APISIX access log lines (one JSON object per line)
+following the field layout in ES/ESIndex.md, with controllable schema variety,
+malformed-line rate, nesting depth and output size.
+"""
+
+import gzip
+import json
+import random
+import sys
+from typing import Dict, List, Any
+import argparse
+
+
+# Optional fields toggled by the bits of a record's schema variant, in bit order
+OPTIONAL_FIELDS = [
+    ('request', 'headers', 'content-type'),
+    ('request', 'headers', 'postman-token'),
+    ('response', 'headers', 'apisix-plugins'),
+    ('request', 'headers', 'accept-encoding'),
+    ('service_id',),
+    ('upstream',),
+    ('policies_count',),
+    ('enabled_policies_count',),
+    ('request', 'headers', 'x-request-id'),
+    ('request', 'headers', 'x-forwarded-for'),
+    ('response', 'headers', 'content-length'),
+    ('apisix_latency',)
+]
+
+HTTP_METHODS = ['GET', 'GET', 'GET', 'POST', 'PUT', 'DELETE', 'PATCH']
+STATUS_CODES = [200, 200, 200, 200, 201, 204, 301, 400, 401, 403, 404, 429, 500, 502, 503]
+USER_AGENTS = ['curl/8.4.0', 'PostmanRuntime/7.36.0', 'python-requests/2.31.0',
+               'Mozilla/5.0 (X11; Linux x86_64)', 'okhttp/4.12.0']
+URIS = ['/v1/items', '/v1/orders', '/v1/users/me', '/healthz', '/v2/search', '/v1/payments']
+
+
+def parse_size(value: str) -> int:
+    """Parse a size such as 500000, 64KB, 100MB or 2GB into bytes."""
+    units = {'KB': 1 << 10, 'MB': 1 << 20, 'GB': 1 << 30}
+    value = value.strip().upper()
+    for suffix, multiplier in units.items():
+        if value.endswith(suffix):
+            return int(float(value[:-len(suffix)]) * multiplier)
+    return int(value)
+
+
+class APISIXLogGenerator:
+    def __init__(self, variety: int = 20, malformed_rate: float = 0.001,
+                 nesting_depth: int = 0, seed: int = 42):
+        self.variety = max(1, variety)
+        self.malformed_rate = malformed_rate
+        self.nesting_depth = nesting_depth
+        self.rng = random.Random(seed)
+        self.start_time = 1700000000000
+
+        # Zipf-like variant popularity: variant 0 dominates, later variants are rare
+        weights = [1.0 / (rank + 1) ** 1.2 for rank in range(self.variety)]
+        self.cum_weights: List[float] = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            self.cum_weights.append(total)
+
+    def variant_fields(self, variant: int) -> List[tuple]:
+        """Optional fields present in a schema variant (one per set bit)."""
+        return [field for bit, field in enumerate(OPTIONAL_FIELDS) if (variant >> bit) & 1]
+
+    def generate_record(self, variant: int = None) -> Dict[str, Any]:
+        """Generate one APISIX log record for a schema variant."""
+        rng = self.rng
+        if variant is None:
+            variant = rng.choices(range(self.variety), cum_weights=self.cum_weights)[0]
+
+        self.start_time += rng.randint(0, 50)
+        upstream_latency = round(rng.uniform(1, 300), 3)
+        apisix_latency = round(rng.uniform(0.1, 5), 3)
+        method = rng.choice(HTTP_METHODS)
+        uri = rng.choice(URIS)
+        status = rng.choice(STATUS_CODES)
+        host = f"api{rng.randint(1, 3)}.example.com"
+
+        record = {
+            "client_ip": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "route_id": f"route-{rng.randint(1, 12)}",
+            "server": {"hostname": f"gw-{rng.randint(1, 8)}", "version": "3.9.0"},
+            "start_time": self.start_time,
+            "upstream_latency": upstream_latency,
+            "total_latency": round(upstream_latency + apisix_latency, 3),
+            "latency": round(upstream_latency + apisix_latency, 3),
+            "request": {
+                "url": f"http://{host}:9080{uri}",
+                "method": method,
+                "size": rng.randint(80, 4000),
+                "uri": uri,
+                "headers": {
+                    "user-agent": rng.choice(USER_AGENTS),
+                    "host": host,
+                    "connection": "keep-alive",
+                    "accept": "*/*"
+                }
+            },
+            "response": {
+                "headers": {
+                    "content-type": "application/json",
+                    "date": "Tue, 14 Nov 2023 22:13:20 GMT",
+                    "connection": "keep-alive",
+                    "server": "APISIX/3.9.0"
+                },
+                "status": status,
+                "body": "",
+                "size": rng.randint(100, 20000)
+            }
+        }
+
+        optional_values = {
+            'content-type': "application/json",
+            'postman-token': f"{rng.getrandbits(64):016x}",
+            'apisix-plugins': "limit-count,key-auth",
+            'accept-encoding': "gzip, deflate, br",
+            'service_id': f"svc-{rng.randint(1, 4)}",
+            'upstream': f"10.1.0.{rng.randint(1, 20)}:8080",
+            'policies_count': rng.randint(0, 6),
+            'enabled_policies_count': rng.randint(0, 6),
+            'x-request-id': f"{rng.getrandbits(128):032x}",
+            'x-forwarded-for': f"203.0.113.{rng.randint(1, 254)}",
+            'content-length': rng.randint(100, 20000),
+            'apisix_latency': apisix_latency
+        }
+        for field in self.variant_fields(variant):
+            target = record
+            for key in field[:-1]:
+                target = target[key]
+            target[field[-1]] = optional_values[field[-1]]
+
+        # Variants beyond the optional-field combinations add custom headers
+        extra = variant >> len(OPTIONAL_FIELDS)
+        bit = 0
+        while extra >> bit:
+            if (extra >> bit) & 1:
+                record["request"]["headers"][f"x-custom-{bit}"] = "1"
+            bit += 1
+
+        if self.nesting_depth:
+            nested = record["request"]
+            for level in range(self.nesting_depth):
+                nested["ctx"] = {"level": level, "enabled": True}
+                nested = nested["ctx"]
+
+        return record
+
+    def generate_malformed(self) -> str:
+        """Generate a malformed line: truncated, concatenated, or garbage."""
+        line = json.dumps(self.generate_record())
+        kind = self.rng.randrange(3)
+        if kind == 0:
+            return line[:self.rng.randint(1, len(line) - 1)]
+        if kind == 1:
+            return line + json.dumps(self.generate_record())
+        return "upstream prematurely closed connection while reading response header"
+
+    def generate_line(self) -> str:
+        """Generate one log line (without newline)."""
+        if self.malformed_rate and self.rng.random() < self.malformed_rate:
+            return self.generate_malformed()
+        return json.dumps(self.generate_record(), separators=(',', ':'))
+
+    def write(self, output_path: str, lines: int = None, size_bytes: int = None) -> Dict[str, int]:
+        """
+        Write lines until `lines` lines or `size_bytes` bytes have been written.
+        Paths ending in .gz are gzip-compressed. Returns line and byte counts.
+        """
+        opener = gzip.open if output_path.endswith('.gz') else open
+        written_lines = 0
+        written_bytes = 0
+
+        with opener(output_path, 'wt', encoding='utf-8') as f:
+            while True:
+                if lines is not None and written_lines >= lines:
+                    break
+                if size_bytes is not None and written_bytes >= size_bytes:
+                    break
+                line = self.generate_line() + "\n"
+                f.write(line)
+                written_lines += 1
+                written_bytes += len(line)
+
+        return {'lines': written_lines, 'bytes': written_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic APISIX log files for testing and benchmarking"
+    )
+    parser.add_argument(
+        "output",
+        help="Output log file path (.gz for gzip)"
+    )
+    parser.add_argument(
+        "-n", "--lines", type=int,
+        help="Number of lines to write (default: 100000 unless --size is given)"
+    )
+    parser.add_argument(
+        "-s", "--size",
+        help="Approximate uncompressed size to write, e.g. 500MB or 2GB"
+    )
+    parser.add_argument(
+        "--variety", type=int, default=20,
+        help="Number of distinct schema variants, Zipf-distributed (default: 20)"
+    )
+    parser.add_argument(
+        "--malformed-rate", type=float, default=0.001,
+        help="Fraction of malformed lines (default: 0.001)"
+    )
+    parser.add_argument(
+        "--nesting-depth", type=int, default=0,
+        help="Extra levels of nested objects under request (default: 0)"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=42,
+        help="Random seed (default: 42)"
+    )
+
+    args = parser.parse_args()
+
+    lines = args.lines
+    size_bytes = parse_size(args.size) if args.size else None
+    if lines is None and size_bytes is None:
+        lines = 100000
+
+    generator = APISIXLogGenerator(args.variety, args.malformed_rate, args.nesting_depth, args.seed)
+    stats = generator.write(args.output, lines=lines, size_bytes=size_bytes)
+    print(f"Wrote {stats['lines']} lines ({stats['bytes'] / (1 << 20):.1f} MB) to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
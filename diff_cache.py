@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Schema Diff Cache
+
+SQLite-backed store of schema comparison results keyed by the fingerprint pair
+(baseline, schema), each a digest of the schema's flattened field paths, types
+and required flags, so repeated runs of the schema difference analyzer only
+compare schema pairs they have not seen before.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+
+# Stored as the database's user_version; bump it whenever the comparison result
+# layout or semantics change, which drops every cached result
+DIFF_CACHE_VERSION = 2
+
+
+class DiffCache:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != DIFF_CACHE_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS diffs")
+            self.connection.execute(f"PRAGMA user_version = {DIFF_CACHE_VERSION}")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS diffs (
+                baseline_fingerprint TEXT NOT NULL,
+                schema_fingerprint TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (baseline_fingerprint, schema_fingerprint)
+            ) WITHOUT ROWID
+        """)
+        self.connection.commit()
+
+        # New results are written in one transaction by flush
+        self.pending: List[Tuple[str, str, str, str]] = []
+
+    def load(self, baseline_fingerprint: str) -> Dict[str, Any]:
+        """All cached results against a baseline, by schema fingerprint, in one query."""
+        rows = self.connection.execute(
+            "SELECT schema_fingerprint, result_json FROM diffs WHERE baseline_fingerprint = ?",
+            (baseline_fingerprint,)
+        )
+        return {schema_fingerprint: json.loads(result_json) for schema_fingerprint, result_json in rows}
+
+    def add(self, baseline_fingerprint: str, schema_fingerprint: str, result: Any):
+        """Queue a new comparison result; it is stored by flush."""
+        self.pending.append((baseline_fingerprint, schema_fingerprint,
+                             json.dumps(result, ensure_ascii=False, separators=(',', ':')),
+                             datetime.now().isoformat()))
+
+    def flush(self):
+        """Store the queued results and commit."""
+        if self.pending:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO diffs (baseline_fingerprint, schema_fingerprint, result_json, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                self.pending
+            )
+            self.pending = []
+        self.connection.commit()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
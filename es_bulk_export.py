@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Elasticsearch Bulk Export
+
+Export stage for the APISIX schema extractor: takes already-parsed log records,
+adds the derived fields from ES/ESIndex.md (status_class, hour_of_day,
+day_of_week) and writes Elasticsearch _bulk NDJSON batches sized by bytes,
+either to files or to an ES endpoint with bounded in-flight requests.
+Run directly to start a local _bulk stub server for testing.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Tuple
+import argparse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Status codes worth retrying: throttling and transient server errors
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """
+    Serialize to compact JSON bytes, using orjson when installed. Values orjson
+    refuses (integers beyond 64 bits, lone surrogates) go through json, which
+    escapes non-ASCII text when it cannot be encoded as UTF-8.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    try:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    except UnicodeEncodeError:
+        return json.dumps(obj, separators=(',', ':')).encode('ascii')
+
+
+def add_derived_fields(record: Dict) -> Dict:
+    """
+    Add the derived fields of the ES mapping in place: status_class ("2xx"),
+    hour_of_day and day_of_week (UTC, from start_time in epoch millis) and
+    @timestamp when missing. A start_time outside the supported date range
+    gets no time fields.
+    """
+    response = record.get('response')
+    status = response.get('status') if isinstance(response, dict) else None
+    if isinstance(status, int):
+        record['status_class'] = f"{status // 100}xx"
+
+    start_time = record.get('start_time')
+    if isinstance(start_time, (int, float)) and not isinstance(start_time, bool):
+        try:
+            moment = datetime.fromtimestamp(start_time / 1000, timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            # Out of the platform's time range: no derived time fields
+            return record
+        record['hour_of_day'] = moment.hour
+        record['day_of_week'] = moment.strftime('%A')
+        if '@timestamp' not in record:
+            record['@timestamp'] = moment.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+    return record
+
+
+class ESBulkExporter:
+    def __init__(self, index: str = "apisix-logs", output_dir: str = None, endpoint: str = None,
+                 batch_bytes: int = 5 << 20, max_in_flight: int = 4, file_prefix: str = "bulk",
+                 max_retries: int = 5, timeout: float = 30.0):
+        if not output_dir and not endpoint:
+            raise ValueError("ESBulkExporter needs an output_dir or an endpoint")
+
+        self.index = index
+        self.output_dir = output_dir
+        self.endpoint = endpoint.rstrip('/') if endpoint else None
+        self.batch_bytes = batch_bytes
+        self.file_prefix = file_prefix
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        # The action line is identical for every document
+        self.action_line = dumps_bytes({"index": {"_index": index}}) + b"\n"
+        self.buffer = bytearray()
+        self.buffer_docs = 0
+        self.batch_number = 0
+
+        self.stats = {'docs': 0, 'batches': 0, 'bytes': 0, 'failed_docs': 0, 'failed_batches': 0,
+                      'retries': 0}
+        self.stats_lock = threading.Lock()
+
+        # Bounded in-flight requests: submit() blocks on the semaphore, which is
+        # the backpressure that keeps the producer from outrunning Elasticsearch
+        self.executor = None
+        self.in_flight = None
+        self.pending = []
+        if self.endpoint:
+            self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+            self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+
+    def add(self, record: Dict):
+        """Add one parsed record; flushes a batch once it reaches batch_bytes."""
+        add_derived_fields(record)
+        self.buffer += self.action_line
+        self.buffer += dumps_bytes(record)
+        self.buffer += b"\n"
+        self.buffer_docs += 1
+        if len(self.buffer) >= self.batch_bytes:
+            self.flush_batch()
+
+    def flush_batch(self):
+        """Write or send the current batch."""
+        if not self.buffer_docs:
+            return
+
+        payload = bytes(self.buffer)
+        docs = self.buffer_docs
+        self.buffer.clear()
+        self.buffer_docs = 0
+        self.batch_number += 1
+
+        if self.output_dir:
+            batch_file = os.path.join(self.output_dir, f"{self.file_prefix}_{self.batch_number:06d}.ndjson")
+            with open(batch_file, 'wb') as f:
+                f.write(payload)
+            # With an endpoint as well, the sender records the batch once it is acknowledged
+            if not self.endpoint:
+                self.record_batch(docs, len(payload), failed_docs=0)
+
+        if self.endpoint:
+            self.in_flight.acquire()
+            future = self.executor.submit(self.send_batch, payload, docs)
+            future.add_done_callback(lambda _: self.in_flight.release())
+            self.pending = [f for f in self.pending if not f.done()]
+            self.pending.append(future)
+
+    def send_batch(self, payload: bytes, docs: int):
+        """POST one batch to {endpoint}/_bulk, retrying throttled/transient failures with backoff."""
+        request = urllib.request.Request(
+            f"{self.endpoint}/_bulk", data=payload, method='POST',
+            headers={'Content-Type': 'application/x-ndjson'}
+        )
+        for attempt in range(self.max_retries + 1):
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    result = json.loads(response.read())
+                failed_docs = 0
+                if result.get('errors'):
+                    failed_docs = sum(1 for item in result.get('items', [])
+                                      if next(iter(item.values()), {}).get('status', 200) >= 300)
+                self.record_batch(docs, len(payload), failed_docs)
+                return
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRYABLE_STATUS or attempt == self.max_retries:
+                    break
+            except (urllib.error.URLError, OSError):
+                if attempt == self.max_retries:
+                    break
+            with self.stats_lock:
+                self.stats['retries'] += 1
+            time.sleep(min(0.5 * (2 ** attempt), 30))
+
+        with self.stats_lock:
+            self.stats['failed_batches'] += 1
+            self.stats['failed_docs'] += docs
+
+    def record_batch(self, docs: int, size: int, failed_docs: int):
+        with self.stats_lock:
+            self.stats['batches'] += 1
+            self.stats['docs'] += docs
+            self.stats['bytes'] += size
+            self.stats['failed_docs'] += failed_docs
+
+    def flush(self):
+        """Flush the partial batch and wait until every in-flight request has finished."""
+        self.flush_batch()
+        for future in self.pending:
+            future.result()
+        self.pending = []
+
+    def close(self) -> Dict[str, int]:
+        """Flush everything, stop the sender and return the export statistics."""
+        self.flush()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        return dict(self.stats)
+
+
+class BulkStubHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Elasticsearch _bulk API, for local testing."""
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('_bulk'):
+            self.send_error(404)
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        docs = max(0, body.count(b"\n") // 2)
+        with self.server.stats_lock:
+            self.server.received_docs += docs
+            self.server.received_batches += 1
+
+        response = json.dumps({
+            "took": 1,
+            "errors": False,
+            "items": [{"index": {"status": 201}}] * docs
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port: int = 0) -> Tuple[ThreadingHTTPServer, threading.Thread]:
+    """Start the _bulk stub on localhost in a background thread; port 0 picks a free port."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), BulkStubHandler)
+    server.stats_lock = threading.Lock()
+    server.received_docs = 0
+    server.received_batches = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a local Elasticsearch _bulk stub server for testing the export stage"
+    )
+    parser.add_argument(
+        "--port", type=int, default=9200,
+        help="Port to listen on (default: 9200)"
+    )
+
+    args = parser.parse_args()
+
+    server, thread = start_stub_server(args.port)
+    print(f"_bulk stub listening on http://127.0.0.1:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        while thread.is_alive():
+            time.sleep(5)
+            print(f"Received {server.received_docs} docs in {server.received_batches} batches")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
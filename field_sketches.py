@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Per-Field Sketches
+
+Fixed-memory, mergeable statistics for every field path of the APISIX log
+records: HyperLogLog for distinct counts, DDSketch for numeric quantiles and
+a count-min sketch with a candidate set for top-k heavy hitters. Sketches from
+worker shards or checkpoints merge exactly as if one process had seen all values.
+"""
+
+import base64
+import hashlib
+import math
+from array import array
+from collections import Counter
+from typing import Dict, List, Any, Tuple
+
+
+# Exact sums are kept in units of 2**-1074, the smallest positive double
+SUM_SCALE_BITS = 1074
+
+# Scalar values buffered per path before they are folded into the sketches
+PENDING_VALUES = 1024
+
+# Type names as used in the schema output
+JSON_TYPE_NAMES = {
+    dict: 'object',
+    list: 'array',
+    str: 'string',
+    int: 'integer',
+    float: 'number',
+    bool: 'boolean',
+    type(None): 'null'
+}
+
+
+def value_hash(value: Any) -> int:
+    """
+    Stable 64-bit hash of a scalar value. Python's hash() is salted per process,
+    so it cannot be used for sketches that are merged across worker processes.
+    """
+    if isinstance(value, str):
+        data = value.encode('utf-8', errors='surrogatepass')
+    else:
+        data = b'\x00' + repr(value).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2**precision one-byte registers (about 1.6% error at 12)."""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add_hash(self, value_hash: int):
+        index = value_hash >> (64 - self.precision)
+        rest = value_hash & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Small-range correction (linear counting); a 64-bit hash needs no large-range one
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_state(self) -> Dict:
+        return {'precision': self.precision,
+                'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'HyperLogLog':
+        sketch = cls(state['precision'])
+        sketch.registers = bytearray(base64.b64decode(state['registers']))
+        return sketch
+
+
+class DDSketch:
+    """
+    Quantile sketch with relative-error guarantees (DDSketch): values fall into
+    logarithmic buckets of ratio gamma; past max_bins the lowest buckets collapse.
+    Infinities and NaN (the json module accepts them) are counted apart from the
+    buckets: -inf ranks below and inf above every finite value, NaN not at all.
+    The sum is kept exactly, as an integer multiple of 2**-SUM_SCALE_BITS, so the
+    mean does not depend on the order in which values and sketches are combined.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.scaled_sum = 0
+        # Infinities and NaN cannot be scaled exactly or bucketed
+        self.special_sum = 0.0
+        self.negative_infinite = 0
+        self.positive_infinite = 0
+        self.nan_count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1):
+        self.count += count
+        if isinstance(value, int) or math.isfinite(value):
+            numerator, denominator = value.as_integer_ratio()
+            self.scaled_sum += (numerator << (SUM_SCALE_BITS + 1 - denominator.bit_length())) * count
+        else:
+            self.special_sum += value
+            if value != value:
+                self.nan_count += count
+                return
+            if value > 0:
+                self.positive_infinite += count
+            else:
+                self.negative_infinite += count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        if value > 0:
+            store = self.positive
+        elif value < 0:
+            store = self.negative
+            value = -value
+        else:
+            self.zero_count += count
+            return
+        if value == math.inf:
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        if key in store:
+            store[key] += count
+        else:
+            store[key] = count
+            if len(store) > self.max_bins:
+                self.collapse(store)
+
+    def collapse(self, store: Dict[int, int]):
+        """Fold the lowest buckets into one so the store holds at most max_bins buckets."""
+        keys = sorted(store)
+        excess = keys[:len(keys) - self.max_bins + 1]
+        folded = sum(store.pop(key) for key in excess)
+        store[excess[-1]] = folded
+
+    def merge(self, other: 'DDSketch'):
+        for own, incoming in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in incoming.items():
+                own[key] = own.get(key, 0) + count
+            if len(own) > self.max_bins:
+                self.collapse(own)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.scaled_sum += other.scaled_sum
+        self.special_sum += other.special_sum
+        self.negative_infinite += other.negative_infinite
+        self.positive_infinite += other.positive_infinite
+        self.nan_count += other.nan_count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        ranked = self.count - self.nan_count
+        if not ranked:
+            return None if not self.count else math.nan
+        rank = q * (ranked - 1)
+        seen = self.negative_infinite
+        if seen > rank:
+            return -math.inf
+        # Most negative values first (largest magnitude keys), then zeros, then positives
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(self.min, -self.bucket_value(key))
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self.max, self.bucket_value(key))
+        return self.max
+
+    def mean(self) -> float:
+        if not self.count:
+            return None
+        try:
+            total = self.scaled_sum / (1 << SUM_SCALE_BITS)
+        except OverflowError:
+            total = math.inf if self.scaled_sum > 0 else -math.inf
+        return (total + self.special_sum) / self.count
+
+    def bucket_value(self, key: int) -> float:
+        """
+        Representative value of a bucket, within relative_accuracy of every value in it;
+        inf for buckets of integers beyond the float range (quantile clamps it to max).
+        """
+        try:
+            return 2 * self.gamma ** key / (self.gamma + 1)
+        except OverflowError:
+            return math.inf
+
+    def to_state(self) -> Dict:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'positive': [[key, count] for key, count in self.positive.items()],
+            'negative': [[key, count] for key, count in self.negative.items()],
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'scaled_sum': self.scaled_sum,
+            'special_sum': self.special_sum,
+            'negative_infinite': self.negative_infinite,
+            'positive_infinite': self.positive_infinite,
+            'nan_count': self.nan_count,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'DDSketch':
+        sketch = cls(state['relative_accuracy'], state['max_bins'])
+        sketch.positive = {key: count for key, count in state['positive']}
+        sketch.negative = {key: count for key, count in state['negative']}
+        sketch.zero_count = state['zero_count']
+        sketch.count = state['count']
+        sketch.scaled_sum = state['scaled_sum']
+        sketch.special_sum = state['special_sum']
+        sketch.negative_infinite = state.get('negative_infinite', 0)
+        sketch.positive_infinite = state.get('positive_infinite', 0)
+        sketch.nan_count = state.get('nan_count', 0)
+        if state['count']:
+            sketch.min = state['min']
+            sketch.max = state['max']
+        return sketch
+
+
+class CountMinTopK:
+    """
+    Heavy hitters: a depth x width count-min sketch estimates every value's
+    frequency, and up to 2 * k candidates with the highest estimates are kept.
+    Each row indexes the table with its own 16-bit slice of the value hash, so
+    width must be a power of two of at most 65536 and depth at most 4.
+    Candidates are keyed by (type, value), so 1, 1.0 and True stay apart.
+    """
+
+    def __init__(self, k: int = 10, width: int = 1024, depth: int = 4):
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.mask = width - 1
+        self.rows = [(row * width, row * 16) for row in range(depth)]
+        self.table = array('Q', [0]) * (width * depth)
+        self.total = 0
+        self.candidates: Dict[Tuple[type, Any], int] = {}
+        # Lower bound on the smallest candidate estimate; values at or below it cannot get in
+        self.floor = 0
+
+    def add_hash(self, value: Any, hashed: int, count: int = 1):
+        self.total += count
+        table = self.table
+        mask = self.mask
+        estimate = None
+        for base, shift in self.rows:
+            index = base + ((hashed >> shift) & mask)
+            cell = table[index] + count
+            table[index] = cell
+            if estimate is None or cell < estimate:
+                estimate = cell
+
+        candidates = self.candidates
+        key = (type(value), value)
+        if key in candidates or len(candidates) < 2 * self.k:
+            candidates[key] = estimate
+        elif estimate > self.floor:
+            weakest = min(candidates, key=candidates.get)
+            if estimate > candidates[weakest]:
+                del candidates[weakest]
+                candidates[key] = estimate
+            self.floor = min(candidates.values())
+
+    def estimate(self, value: Any) -> int:
+        hashed = value_hash(value)
+        return min(self.table[base + ((hashed >> shift) & self.mask)] for base, shift in self.rows)
+
+    def error_bound(self) -> float:
+        """Count-min overestimate bound e * N / width (holds with probability 1 - e**-depth)."""
+        return math.e * self.total / self.width
+
+    def merge(self, other: 'CountMinTopK'):
+        self.table = array('Q', map(int.__add__, self.table, other.table))
+        self.total += other.total
+        merged = {key: self.estimate(key[1]) for key in set(self.candidates) | set(other.candidates)}
+        self.candidates = dict(sorted(merged.items(), key=lambda item: (-item[1], repr(item[0][1])))[:2 * self.k])
+        self.floor = 0
+
+    def top(self) -> List[Tuple[Any, int]]:
+        """The k most frequent values whose estimate exceeds the error bound (noise otherwise)."""
+        bound = self.error_bound()
+        ranked = sorted(self.candidates.items(), key=lambda item: (-item[1], repr(item[0][1])))
+        return [(value, count) for (_, value), count in ranked if count > bound][:self.k]
+
+    def to_state(self) -> Dict:
+        return {
+            'k': self.k,
+            'width': self.width,
+            'depth': self.depth,
+            'total': self.total,
+            'table': base64.b64encode(self.table.tobytes()).decode('ascii'),
+            'candidates': [[value, count] for (_, value), count in self.candidates.items()]
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'CountMinTopK':
+        sketch = cls(state['k'], state['width'], state['depth'])
+        sketch.table = array('Q')
+        sketch.table.frombytes(base64.b64decode(state['table']))
+        sketch.total = state['total']
+        sketch.candidates = {(type(value), value): count for value, count in state['candidates']}
+        return sketch
+
+
+class PathStats:
+    """
+    Statistics for one field path; sketches are created on first use.
+    Scalar values are buffered and folded in per distinct value, so repetitive
+    fields (status, method, route_id) cost one sketch update per batch.
+    Values are counted by (type, value), so 1, 1.0 and True stay distinct.
+    """
+
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.present = 0
+        self.null_count = 0
+        self.types: Dict[str, int] = {}
+        self.distinct = None
+        self.numeric = None
+        self.heavy_hitters = None
+        self.pending: List[Any] = []
+
+    def add_container(self, type_name: str):
+        """Count an object or array value (its contents are tracked under child paths)."""
+        self.present += 1
+        self.types[type_name] = self.types.get(type_name, 0) + 1
+
+    def add(self, value: Any):
+        """Buffer a scalar value."""
+        pending = self.pending
+        pending.append(value)
+        if len(pending) >= PENDING_VALUES:
+            self.flush()
+
+    def flush(self):
+        """Fold the buffered values into the counters and sketches."""
+        values = self.pending
+        if not values:
+            return
+        self.pending = []
+        self.present += len(values)
+
+        types = self.types
+        for value_type, count in Counter(map(type, values)).items():
+            type_name = JSON_TYPE_NAMES.get(value_type, 'unknown')
+            types[type_name] = types.get(type_name, 0) + count
+
+        for (value_type, value), count in Counter(zip(map(type, values), values)).items():
+            if value is None:
+                self.null_count += count
+                continue
+
+            hashed = value_hash(value)
+            if self.distinct is None:
+                self.distinct = HyperLogLog()
+                self.heavy_hitters = CountMinTopK(self.top_k)
+            self.distinct.add_hash(hashed)
+            self.heavy_hitters.add_hash(value, hashed, count)
+
+            if value_type is int or value_type is float:
+                if self.numeric is None:
+                    self.numeric = DDSketch()
+                self.numeric.add(value, count)
+
+    def merge(self, other: 'PathStats'):
+        self.flush()
+        other.flush()
+        self.present += other.present
+        self.null_count += other.null_count
+        for type_name, count in other.types.items():
+            self.types[type_name] = self.types.get(type_name, 0) + count
+        for name in ('distinct', 'numeric', 'heavy_hitters'):
+            incoming = getattr(other, name)
+            if incoming is None:
+                continue
+            if getattr(self, name) is None:
+                setattr(self, name, incoming)
+            else:
+                getattr(self, name).merge(incoming)
+
+    def summary(self, records: int) -> Dict:
+        self.flush()
+        summary = {
+            'present': self.present,
+            'presence_rate': round(self.present / records, 6) if records else 0.0,
+            'null_count': self.null_count,
+            'null_rate': round(self.null_count / self.present, 6) if self.present else 0.0,
+            'types': self.types
+        }
+        if self.distinct is not None:
+            summary['distinct_estimate'] = self.distinct.estimate()
+            summary['top_values'] = [[value, count] for value, count in self.heavy_hitters.top()]
+            summary['top_values_error_bound'] = round(self.heavy_hitters.error_bound(), 1)
+        if self.numeric is not None:
+            sketch = self.numeric
+            summary['numeric'] = {
+                'count': sketch.count,
+                'min': sketch.min,
+                'max': sketch.max,
+                'mean': sketch.mean(),
+                **{f"p{round(q * 100)}": sketch.quantile(q) for q in (0.5, 0.9, 0.95, 0.99)}
+            }
+        return summary
+
+    def to_state(self) -> Dict:
+        self.flush()
+        return {
+            'present': self.present,
+            'null_count': self.null_count,
+            'types': self.types,
+            'distinct': self.distinct.to_state() if self.distinct else None,
+            'numeric': self.numeric.to_state() if self.numeric else None,
+            'heavy_hitters': self.heavy_hitters.to_state() if self.heavy_hitters else None
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict, top_k: int = 10) -> 'PathStats':
+        stats = cls(top_k)
+        stats.present = state['present']
+        stats.null_count = state['null_count']
+        stats.types = state['types']
+        if state['distinct']:
+            stats.distinct = HyperLogLog.from_state(state['distinct'])
+        if state['numeric']:
+            stats.numeric = DDSketch.from_state(state['numeric'])
+        if state['heavy_hitters']:
+            stats.heavy_hitters = CountMinTopK.from_state(state['heavy_hitters'])
+        return stats
+
+
+class FieldStatsCollector:
+    """
+    Walks each record and feeds every field path (root.request.headers.host,
+    array items as root.items[]) into its PathStats. At most max_paths paths
+    are tracked, so records keyed by IDs cannot grow memory without bound.
+    """
+
+    def __init__(self, max_paths: int = 1000, top_k: int = 10):
+        self.max_paths = max_paths
+        self.top_k = top_k
+        self.records = 0
+        self.untracked_values = 0
+        self.paths: Dict[str, PathStats] = {}
+        # (parent path, key) -> child path, so path strings are built once
+        self.child_paths: Dict[Tuple[str, str], str] = {}
+
+    def add_record(self, record: Any):
+        self.records += 1
+        self.add_value(record, "root")
+
+    def add_value(self, value: Any, path: str):
+        stats = self.paths.get(path)
+        if stats is None:
+            if len(self.paths) >= self.max_paths:
+                self.untracked_values += 1
+                return
+            stats = self.paths[path] = PathStats(self.top_k)
+
+        value_type = type(value)
+        if value_type is dict:
+            stats.add_container('object')
+            child_paths = self.child_paths
+            for key, child in value.items():
+                child_path = child_paths.get((path, key))
+                if child_path is None:
+                    child_path = f"{path}.{key}"
+                    if len(child_paths) < 4 * self.max_paths:
+                        child_paths[(path, key)] = child_path
+                self.add_value(child, child_path)
+        elif value_type is list:
+            stats.add_container('array')
+            item_path = path + "[]"
+            for item in value:
+                self.add_value(item, item_path)
+        else:
+            stats.add(value)
+
+    def merge(self, other: 'FieldStatsCollector'):
+        self.records += other.records
+        self.untracked_values += other.untracked_values
+        for path, stats in other.paths.items():
+            if path in self.paths:
+                self.paths[path].merge(stats)
+            elif len(self.paths) < self.max_paths:
+                self.paths[path] = stats
+            else:
+                self.untracked_values += stats.present
+
+    def summary(self) -> Dict:
+        return {
+            'records': self.records,
+            'untracked_values': self.untracked_values,
+            'paths': {path: stats.summary(self.records) for path, stats in sorted(self.paths.items())}
+        }
+
+    def to_state(self) -> Dict:
+        return {
+            'max_paths': self.max_paths,
+            'top_k': self.top_k,
+            'records': self.records,
+            'untracked_values': self.untracked_values,
+            'paths': {path: stats.to_state() for path, stats in self.paths.items()}
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'FieldStatsCollector':
+        collector = cls(state['max_paths'], state['top_k'])
+        collector.records = state['records']
+        collector.untracked_values = state['untracked_values']
+        collector.paths = {path: PathStats.from_state(stats, collector.top_k)
+                           for path, stats in state['paths'].items()}
+        return collector
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Streaming JSON Output
+
+Result-file writers for the APISIX schema extractor that serialize one table
+entry (a schema or merge group) at a time, so the output is never held as one
+big string or a second copy of the table. Formats: pretty (the indent=2
+layout), compact (one JSON object without whitespace) or jsonl (one entry per
+line, with its key as the first field), each optionally gzipped. Readers
+accept all of them and stream them back one entry at a time, so
+SchemaDiffAnalyzer can load any variant without holding the whole file.
+"""
+
+import gzip
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterable, Iterator, TextIO, Tuple
+
+OUTPUT_FORMATS = ('pretty', 'compact', 'jsonl')
+
+COMPACT_SEPARATORS = (',', ':')
+
+# Level 6 is several times faster than gzip's default 9 and only slightly larger
+GZIP_LEVEL = 6
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Characters read at a time when streaming a single JSON object; the read size
+# doubles while one entry does not fit
+STREAM_CHUNK_SIZE = 1 << 20
+
+JSON_WHITESPACE = ' \t\r\n'
+
+# Characters that can continue a number decoded at the end of the buffer
+NUMBER_CHARS = '0123456789.eE+-'
+
+
+def output_file_path(base_path: str, output_format: str = 'pretty', compress: bool = False) -> str:
+    """File name for a table written in output_format: .json or .jsonl, plus .gz if compressed."""
+    return base_path + ('.jsonl' if output_format == 'jsonl' else '.json') + ('.gz' if compress else '')
+
+
+def open_text_output(path: str, compress: bool = False, append: bool = False) -> TextIO:
+    """
+    Open a UTF-8 text file for writing, gzip-compressed if requested. Appending
+    to a gzip file adds a new member, and readers see all members as one stream.
+    """
+    mode = 'at' if append else 'wt'
+    if compress:
+        return gzip.open(path, mode, encoding='utf-8', compresslevel=GZIP_LEVEL)
+    return open(path, mode, encoding='utf-8')
+
+
+def open_text_input(path: str) -> TextIO:
+    """Open a UTF-8 text file for reading, decompressing it if it is gzipped."""
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+class JSONTableWriter:
+    """
+    Writes a table of key -> JSON object one entry at a time.
+
+    pretty and compact produce a single JSON object; pretty output is byte-for-byte
+    what json.dump(table, indent=2) writes. jsonl writes one object per line with
+    the key stored under key_field, so readers can stream it back entry by entry.
+    """
+
+    def __init__(self, base_path: str, output_format: str = 'pretty', compress: bool = False,
+                 key_field: str = 'id'):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"unknown output format {output_format!r} (use {', '.join(OUTPUT_FORMATS)})")
+        self.output_format = output_format
+        self.key_field = key_field
+        self.path = output_file_path(base_path, output_format, compress)
+        self.file = open_text_output(self.path, compress)
+        self.entries = 0
+
+    def write(self, key: str, value: Dict[str, Any]):
+        """Serialize and write one table entry."""
+        if self.output_format == 'jsonl':
+            entry = {self.key_field: key}
+            entry.update(value)
+            self.file.write(json.dumps(entry, ensure_ascii=False, separators=COMPACT_SEPARATORS) + "\n")
+        elif self.output_format == 'compact':
+            self.file.write(('{' if not self.entries else ',') + json.dumps(key, ensure_ascii=False) + ':'
+                            + json.dumps(value, ensure_ascii=False, separators=COMPACT_SEPARATORS))
+        else:
+            # Nested one level deeper than a standalone dump; JSON strings never contain raw newlines
+            self.file.write(('{\n  ' if not self.entries else ',\n  ') + json.dumps(key, ensure_ascii=False) + ': '
+                            + json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+        self.entries += 1
+
+    def close(self):
+        """Finish the enclosing object, if any, and close the file."""
+        if self.output_format == 'pretty':
+            self.file.write("\n}" if self.entries else "{}")
+        elif self.output_format == 'compact':
+            self.file.write("}" if self.entries else "{}")
+        self.file.close()
+
+    def __enter__(self) -> 'JSONTableWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_json_table(base_path: str, entries: Iterable[Tuple[str, Dict]], output_format: str = 'pretty',
+                     compress: bool = False, key_field: str = 'id') -> str:
+    """Write (key, object) pairs as they are produced and return the file path."""
+    with JSONTableWriter(base_path, output_format, compress, key_field) as writer:
+        for key, value in entries:
+            writer.write(key, value)
+    return writer.path
+
+
+def write_json_document(base_path: str, document: Any, output_format: str = 'pretty',
+                        compress: bool = False) -> str:
+    """
+    Write a single small JSON document (e.g. field statistics): indented when
+    pretty, on one line otherwise. The file is always .json, plus .gz if compressed.
+    """
+    path = output_file_path(base_path, 'pretty', compress)
+    with open_text_output(path, compress) as f:
+        if output_format == 'pretty':
+            json.dump(document, f, indent=2, ensure_ascii=False)
+        else:
+            json.dump(document, f, ensure_ascii=False, separators=COMPACT_SEPARATORS)
+    return path
+
+
+def is_jsonl_path(path: str) -> bool:
+    """True for JSON Lines outputs (.jsonl or .jsonl.gz)."""
+    return path.endswith(('.jsonl', '.jsonl.gz'))
+
+
+def iter_json_object(f: TextIO, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Tuple[str, Any]]:
+    """
+    Stream the members of a file holding one JSON object, decoding one value at a
+    time with raw_decode, so only the current entry and one read chunk are held.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    
+    def fill() -> bool:
+        # Keep the unread part and read at least as much again; False at end of file
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        more = f.read(max(chunk_size, len(buffer) - position))
+        eof = not more
+        buffer = buffer[position:] + more
+        position = 0
+        return not eof
+    
+    def next_char() -> str:
+        # The next non-whitespace character, not consumed; '' at end of file
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in JSON_WHITESPACE:
+                position += 1
+            if position < len(buffer) or not fill():
+                return buffer[position:position + 1]
+    
+    def expect(chars: str) -> str:
+        nonlocal position
+        char = next_char()
+        if not char or char not in chars:
+            raise ValueError(f"Malformed JSON object: expected {' or '.join(chars)}, "
+                             f"found {char or 'end of file'!r}")
+        position += 1
+        return char
+    
+    def decode() -> Any:
+        # A number decoded up to the end of the buffer (or to "12.") may continue after it
+        nonlocal position
+        next_char()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                if eof or (end < len(buffer) and buffer[end] not in NUMBER_CHARS):
+                    position = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+    
+    expect('{')
+    if next_char() == '}':
+        return
+    while True:
+        key = decode()
+        if not isinstance(key, str):
+            raise ValueError(f"Malformed JSON object: key {key!r} is not a string")
+        expect(':')
+        yield key, decode()
+        if expect(',}') == '}':
+            return
+
+
+def iter_json_table(path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    (key, object) pairs of a table written by JSONTableWriter, in file order,
+    streamed one entry at a time: JSON Lines files take the key from the first
+    field of each line, pretty and compact files are read with iter_json_object.
+    """
+    with open_text_input(path) as f:
+        if not is_jsonl_path(path):
+            yield from iter_json_object(f)
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            key = next(iter(entry))
+            yield entry.pop(key), entry
+
+
+def compress_file(path: str, target_path: str):
+    """
+    Stream a file into a gzip copy at target_path. The copy is written to a
+    temporary name and renamed, so target_path is never left half-written.
+    """
+    tmp_path = target_path + ".tmp"
+    with open(path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=GZIP_LEVEL) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(tmp_path, target_path)
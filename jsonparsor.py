@@ -6,77 +6,549 @@ This script processes APISIX log files, extracts unique JSON schemas,
 handles malformed records, and provides detailed processing statistics.
 """
 
+import base64
+import bisect
+import bz2
+import fnmatch
+import glob
+import gzip
+import hashlib
+import heapq
+import io
 import json
 import os
+import random
+import re
+import shutil
+import signal
 import sys
-from typing import Dict, List, Set, Any, Tuple
+import time
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Any, TextIO, Tuple
 from collections import defaultdict
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import islice
+
+from es_bulk_export import ESBulkExporter
+from field_sketches import FieldStatsCollector
+from json_output import (COMPACT_SEPARATORS, OUTPUT_FORMATS, compress_file, open_text_output,
+                         write_json_document, write_json_table)
+from line_recovery import HEAD_DEFER_LINES, REJOIN_LINES, REJOIN_MAX_BYTES, split_json_objects
+from log_sampling import (SAMPLE_EMPTY, SAMPLE_FAILED, SampleEstimator, estimate_line_count,
+                          find_line_start, parse_sample_spec, random_offsets, required_sample_size)
+from parquet_export import ParquetPartitionWriter, publish_partitions
+from pipeline_metrics import ProgressReporter, profiling, write_prometheus_textfile
+from schema_nodes import EMPTY_ARRAY_NODE, LEAF_NODES, SchemaNode
+from schema_registry import SchemaRegistry
+
+# Optional fast JSON decoders; stdlib json is always available as a fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# Optional zstd support for compressed input
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Number of failed records kept in memory for the summary report
+FAILED_PREVIEW_SIZE = 10
+
+# Line keys of multi-file runs hold the file index above the low 40 bits (line number)
+FILE_LINE_BITS = 40
+FILE_LINE_MASK = (1 << FILE_LINE_BITS) - 1
+
+
+def sample_priority(line_number: int) -> int:
+    """
+    Deterministic pseudo-random priority for a line number (splitmix64 finalizer).
+    Keeping the lowest-priority lines of a schema gives a uniform sample that
+    merges exactly across shards and checkpoints.
+    """
+    z = (line_number * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return z ^ (z >> 31)
+
+
+class JSONDecoderBackend:
+    """
+    A bytes -> object JSON decoder together with the exception types
+    it raises for malformed input.
+    """
+    
+    def __init__(self, name: str, loads: Callable[[bytes], Any], decode_errors: Tuple[type, ...]):
+        self.name = name
+        self.loads = loads
+        self.decode_errors = decode_errors
+
+
+# A number token of 19+ digits (after ':', '[' or ',') may be an integer outside
+# the 64-bit range, which the fast decoders turn into a float (orjson) or reject,
+# but json keeps as int. Digit runs inside strings (request IDs, nanosecond
+# timestamps) mostly follow a quote or letter and do not match
+WIDE_INTEGER = re.compile(rb'[:\[,][ \t]*-?\d{19}')
+
+
+def with_json_fallback(loads: Callable[[bytes], Any], decode_errors: Tuple[type, ...]) -> Callable[[bytes], Any]:
+    """
+    Wrap a fast decoder so every line json.loads accepts decodes as json.loads
+    would: lines it rejects (NaN, Infinity, lone surrogates) and lines with wide
+    integer tokens are decoded again with json. A line json also rejects raises the
+    fast decoder's error, so failed records are the same for every backend.
+    """
+    def loads_with_fallback(line: bytes) -> Any:
+        try:
+            record = loads(line)
+        except decode_errors as error:
+            try:
+                return json.loads(line)
+            except ValueError:
+                raise error from None
+        if WIDE_INTEGER.search(line) is not None:
+            return json.loads(line)
+        return record
+    return loads_with_fallback
+
+
+def available_decoder_backends() -> List[str]:
+    """Return the decoder backend names usable in this environment, fastest first."""
+    backends = []
+    if orjson is not None:
+        backends.append('orjson')
+    if simdjson is not None:
+        backends.append('simdjson')
+    backends.append('json')
+    return backends
+
+
+def get_decoder_backend(name: str = 'auto') -> JSONDecoderBackend:
+    """
+    Build the named decoder backend. 'auto' picks the fastest installed one.
+    """
+    if name == 'auto':
+        name = available_decoder_backends()[0]
+    
+    if name == 'orjson':
+        if orjson is None:
+            raise ValueError("orjson decoder requested but orjson is not installed")
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        return JSONDecoderBackend('orjson', with_json_fallback(orjson.loads, (orjson.JSONDecodeError,)),
+                                  (orjson.JSONDecodeError,))
+    if name == 'simdjson':
+        if simdjson is None:
+            raise ValueError("simdjson decoder requested but pysimdjson is not installed")
+        # pysimdjson reports malformed documents as ValueError
+        return JSONDecoderBackend('simdjson', with_json_fallback(simdjson.loads, (ValueError,)), (ValueError,))
+    if name == 'json':
+        return JSONDecoderBackend('json', json.loads, (json.JSONDecodeError,))
+    
+    raise ValueError(f"Unknown JSON decoder: {name}")
+
+
+# Leading magic bytes of the supported compressed input formats
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+class ByteRangeReader(io.RawIOBase):
+    """
+    Read-only file object exposing only the bytes in [start, end) of a file,
+    so a decompressor can stream one independent member or frame range.
+    """
+    
+    def __init__(self, file_path: str, start: int, end: int):
+        super().__init__()
+        self.file = open(file_path, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        data = self.file.read(size)
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+    
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def detect_compression(file_path: str) -> str:
+    """
+    Detect the compression format from the file's magic bytes.
+    Returns 'gzip', 'bz2', 'zstd', or None for plain text.
+    """
+    with open(file_path, 'rb') as file:
+        magic = file.read(4)
+    
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic.startswith(BZIP2_MAGIC):
+        return 'bz2'
+    if magic.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+def open_decompressed(file_path: str, compression: str, start: int = 0, end: int = None) -> io.BufferedReader:
+    """
+    Open a streaming, line-iterable reader over the decompressed bytes of [start, end).
+    Concatenated gzip members, bz2 streams and zstd frames are read back to back.
+    """
+    if end is None:
+        end = os.path.getsize(file_path)
+    source = ByteRangeReader(file_path, start, end)
+    
+    if compression == 'gzip':
+        return io.BufferedReader(gzip.GzipFile(fileobj=source, mode='rb'))
+    if compression == 'bz2':
+        return io.BufferedReader(bz2.BZ2File(source, mode='rb'))
+    if compression == 'zstd':
+        if zstandard is None:
+            source.close()
+            raise ValueError("zstd input requires the zstandard package (pip install zstandard)")
+        reader = zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True)
+        return io.BufferedReader(reader)
+    
+    source.close()
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def find_gzip_members(file_path: str) -> List[int]:
+    """
+    Return candidate gzip member start offsets (magic, deflate method, valid flags).
+    Candidates can be false positives inside compressed data; callers must verify them.
+    """
+    offsets = []
+    block_size = 1 << 20
+    position = 0
+    tail = b''
+    
+    with open(file_path, 'rb') as file:
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            data = tail + block
+            base = position - len(tail)
+            index = data.find(b'\x1f\x8b\x08')
+            while index != -1 and index + 3 < len(data):
+                # Reserved FLG bits must be zero in a real member header
+                if data[index + 3] < 0x20:
+                    offsets.append(base + index)
+                index = data.find(b'\x1f\x8b\x08', index + 1)
+            position += len(block)
+            # Keep enough bytes to match a header split across blocks
+            tail = data[-3:]
+    
+    return sorted(set(offsets))
+
+
+def find_zstd_frames(file_path: str) -> List[int]:
+    """
+    Return the start offsets of every zstd frame by walking frame and block headers.
+    Skippable frames are folded into the preceding frame.
+    """
+    offsets = []
+    file_size = os.path.getsize(file_path)
+    
+    with open(file_path, 'rb') as file:
+        position = 0
+        while position < file_size:
+            file.seek(position)
+            magic = file.read(4)
+            if len(magic) < 4:
+                raise ValueError(f"Truncated zstd frame at byte {position}")
+            
+            magic_number = int.from_bytes(magic, 'little')
+            if magic_number & 0xFFFFFFF0 == 0x184D2A50:
+                # Skippable frame: 4-byte little-endian payload size
+                position += 8 + int.from_bytes(file.read(4), 'little')
+                continue
+            if magic != ZSTD_MAGIC:
+                raise ValueError(f"Invalid zstd frame magic at byte {position}")
+            
+            offsets.append(position)
+            descriptor = file.read(1)[0]
+            content_size_flag = descriptor >> 6
+            single_segment = (descriptor >> 5) & 1
+            has_checksum = (descriptor >> 2) & 1
+            dictionary_id_flag = descriptor & 3
+            
+            header_size = 1
+            header_size += 0 if single_segment else 1
+            header_size += (0, 1, 2, 4)[dictionary_id_flag]
+            header_size += (1 if single_segment else 0, 2, 4, 8)[content_size_flag]
+            position += 4 + header_size
+            
+            while True:
+                file.seek(position)
+                block_header = int.from_bytes(file.read(3), 'little')
+                last_block = block_header & 1
+                block_type = (block_header >> 1) & 3
+                block_size = block_header >> 3
+                if block_type == 3:
+                    raise ValueError(f"Reserved zstd block type at byte {position}")
+                # RLE blocks store a single byte regardless of Block_Size
+                position += 3 + (1 if block_type == 1 else block_size)
+                if last_block:
+                    break
+            
+            position += 4 if has_checksum else 0
+    
+    return offsets
+
+
+def compute_compressed_segments(file_path: str, compression: str, segments: int) -> List[Tuple[int, int]]:
+    """
+    Group independent gzip members or zstd frames into up to `segments` byte ranges.
+    Formats or files without multiple members yield a single range.
+    """
+    file_size = os.path.getsize(file_path)
+    if compression == 'gzip':
+        starts = find_gzip_members(file_path)
+    elif compression == 'zstd':
+        starts = find_zstd_frames(file_path)
+    else:
+        starts = [0]
+    
+    boundaries = [0]
+    for i in range(1, segments):
+        target = file_size * i // segments
+        index = bisect.bisect_left(starts, target)
+        if index < len(starts) and starts[index] > boundaries[-1]:
+            boundaries.append(starts[index])
+    boundaries.append(file_size)
+    
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+# Largest shard of a crash-safe parallel run; a checkpoint can follow each shard
+CHECKPOINT_SHARD_BYTES = 256 << 20
+
+# Maximum interned object/array shapes before the shape cache is reset
+SHAPE_CACHE_LIMIT = 100000
 
 
 class SchemaExtractor:
-    def __init__(self, log_file_path: str, output_dir: str = None):
+    def __init__(self, log_file_path: str, output_dir: str = None, verbose: bool = True,
+                 decoder: str = 'auto', max_sample_lines: int = 100, failed_spill_path: str = None,
+                 merge_field: str = None, registry_path: str = None,
+                 progress_interval: float = 5.0, progress_format: str = 'text', metrics_file: str = None,
+                 es_export: Dict = None, parquet_export: Dict = None, field_stats: Dict = None,
+                 source_names: List[str] = None, sample: Dict = None,
+                 output_format: str = 'pretty', compress_output: bool = False,
+                 rejoin_lines: int = REJOIN_LINES):
         self.log_file_path = log_file_path
         self.output_dir = output_dir or os.path.dirname(log_file_path)
+        # Multi-file runs: display name per file index; line numbers are then line keys
+        # (file index << FILE_LINE_BITS | line) and are written out as "file:line"
+        self.source_names = source_names
+        self.verbose = verbose
+        self.decoder = get_decoder_backend(decoder)
+        self.run_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.processed_count = 0
         self.failed_count = 0
         self.schemas = {}
-        self.failed_records = []
+        
+        # Records recovered from damaged lines (also in processed_count): several
+        # objects on one line, or one object split over up to rejoin_lines lines.
+        # pending_fragments holds (line number, bytes, error) of a record that may
+        # continue on the next line; head_lines are a worker shard's leading lines
+        # that failed on their own, left for the parent to retry (see defer_line)
+        self.recovered_concatenated = 0
+        self.recovered_split = 0
+        self.rejoin_lines = rejoin_lines
+        self.pending_fragments: List[Tuple[int, bytes, str]] = []
+        self.head_lines: List[Tuple[int, bytes]] = []
+        self.head_closed = False
+        
+        # Hot-path instrumentation: raw lines/bytes read and time spent decoding
+        # JSON versus extracting and matching schemas
+        self.lines_read = 0
+        self.bytes_read = 0
+        self.parse_seconds = 0.0
+        self.schema_seconds = 0.0
+        self.start_time = time.monotonic()
+        self.progress = ProgressReporter(progress_interval, progress_format)
+        self.metrics_file = metrics_file
+        # Maps canonical schema fingerprint -> schema_id for O(1) dedup
+        self.fingerprint_index: Dict[str, str] = {}
+        
+        # Optional persistent registry assigning stable schema IDs across runs;
+        # registry_synced holds the per-fingerprint counts already added to it
+        self.registry = SchemaRegistry(registry_path) if registry_path else None
+        self.registry_synced: Dict[str, int] = {}
+        
+        # Interned shape nodes and the fingerprints of root shapes
+        self.shape_cache: Dict[Tuple, SchemaNode] = {}
+        self.shape_fingerprints: Dict[SchemaNode, str] = {}
+        
+        # Merge mode: per-group (e.g. per route_id) table of fingerprint -> [shape, count],
+        # folded into one union schema per group at output time
+        self.merge_field = merge_field
+        self.groups: Dict[str, Dict] = {}
+        self.merged_schema_file = None
+        
+        # sample_lines keeps at most max_sample_lines per schema (0 = unlimited)
+        self.max_sample_lines = max_sample_lines
+        # Cached (priority, line) of the sample each schema would evict next
+        self.sample_thresholds: Dict[str, Tuple[int, int]] = {}
+        
+        # Failed records stream to a JSONL spill file; only a preview stays in memory
+        self.failed_preview: List[Dict] = []
+        self.failed_spill_path = failed_spill_path or os.path.join(
+            self.output_dir, f"failed_records_{self.run_timestamp}.jsonl")
+        self.failed_spill_file = None
+        
+        # Result files are streamed entry by entry as pretty JSON, compact JSON or
+        # JSON Lines, optionally gzipped; failed records are compact unless pretty
+        self.output_format = output_format
+        self.compress_output = compress_output
+        self.failed_separators = None if output_format == 'pretty' else COMPACT_SEPARATORS
+        
+        # Optional Elasticsearch _bulk export of the already-parsed records;
+        # es_export holds the ESBulkExporter settings, es_stats the finished totals
+        self.es_export = es_export
+        self.exporter = ESBulkExporter(**es_export) if es_export else None
+        self.es_stats: Dict[str, int] = {}
+        
+        # Optional Parquet output of the flattened records, partitioned by schema_id
+        # and date; files are staged by fingerprint until schema IDs are final
+        self.parquet_export = None
+        self.parquet_writer = None
+        if parquet_export:
+            self.parquet_export = dict(parquet_export)
+            self.parquet_export.setdefault('file_prefix', f"part-{self.run_timestamp}")
+            self.parquet_writer = ParquetPartitionWriter(**self.parquet_export)
+        self.parquet_staged: List[Tuple[str, str, str]] = []
+        self.parquet_files: List[str] = []
+        self.parquet_rows = 0
+        
+        # Optional fixed-memory per-path sketches (distinct counts, quantiles, heavy hitters)
+        self.field_stats_options = field_stats
+        self.field_stats = FieldStatsCollector(**field_stats) if field_stats else None
+        self.field_stats_file = None
+        
+        # Crash-safe batch runs (resume_batch): where and how often to checkpoint, the
+        # identity of the input file, and how many worker shards have been merged so far
+        self.checkpoint_path = None
+        self.checkpoint_interval = 60.0
+        self.last_checkpoint = 0.0
+        self.checkpoint_file_id = None
+        self.shards_done = 0
+        
+        # Optional sampling survey: sample holds the design (method, size, seed,
+        # rare_threshold, confidence), sampler the per-schema population estimates
+        self.sample_options = sample
+        self.sampler = None
+        self.sample_settings: Dict[str, Any] = {}
+        if sample:
+            self.sampler = SampleEstimator(sample['method'], sample.get('confidence', 0.95),
+                                           sample.get('rare_threshold', 0.001))
+            # Sampled lines are not adjacent, so split records cannot be rejoined
+            self.rejoin_lines = 0
         
         # Create output directory if it doesn't exist
         os.makedirs(self.output_dir, exist_ok=True)
     
-    def get_json_schema(self, obj: Any, path: str = "root") -> Dict:
+    def get_schema_shape(self, obj: Any) -> SchemaNode:
         """
-        Recursively extract schema from a JSON object.
-        Returns a schema dictionary with type information and structure.
+        Extract the path-less schema node ("shape") of a JSON value.
+        Object and array nodes are interned in shape_cache, keyed on key names and
+        child node identities, so repeated sub-objects share one node and no paths
+        or nodes are built for shapes seen before.
         """
-        if obj is None:
-            return {"type": "null", "path": path}
-        elif isinstance(obj, bool):
-            return {"type": "boolean", "path": path}
+        obj_type = type(obj)
+        leaf = LEAF_NODES.get(obj_type)
+        if leaf is not None:
+            return leaf
+        
+        if obj_type is dict:
+            children = [self.get_schema_shape(value) for value in obj.values()]
+            key = (tuple(obj), tuple(map(id, children)))
+            node = self.shape_cache.get(key)
+            if node is None:
+                node = SchemaNode("object", obj, children)
+                self.cache_shape(key, node)
+            return node
+        
+        if obj_type is list:
+            if not obj:
+                return EMPTY_ARRAY_NODE
+            # Use the first item's schema as the array item schema
+            item = self.get_schema_shape(obj[0])
+            key = ('array', id(item))
+            node = self.shape_cache.get(key)
+            if node is None:
+                node = SchemaNode("array", items=item)
+                self.cache_shape(key, node)
+            return node
+        
+        # Subclasses of the JSON types (decoders normally return exact types)
+        if isinstance(obj, bool):
+            return LEAF_NODES[bool]
         elif isinstance(obj, int):
-            return {"type": "integer", "path": path}
+            return LEAF_NODES[int]
         elif isinstance(obj, float):
-            return {"type": "number", "path": path}
+            return LEAF_NODES[float]
         elif isinstance(obj, str):
-            return {"type": "string", "path": path}
-        elif isinstance(obj, list):
-            if not obj:
-                return {"type": "array", "items": {"type": "unknown"}, "path": path}
-            
-            # Get schema of first item and check if all items have same schema
-            item_schemas = []
-            for i, item in enumerate(obj[:5]):  # Check first 5 items for performance
-                item_schema = self.get_json_schema(item, f"{path}[{i}]")
-                item_schemas.append(item_schema)
-            
-            # For simplicity, use the first item's schema as the array item schema
-            return {
-                "type": "array",
-                "items": item_schemas[0] if item_schemas else {"type": "unknown"},
-                "path": path
-            }
+            return LEAF_NODES[str]
         elif isinstance(obj, dict):
-            properties = {}
-            for key, value in obj.items():
-                properties[key] = self.get_json_schema(value, f"{path}.{key}")
-            
-            return {
-                "type": "object",
-                "properties": properties,
-                "required": list(obj.keys()),
-                "path": path
-            }
-        else:
-            return {"type": "unknown", "value_type": str(type(obj)), "path": path}
+            return self.get_schema_shape(dict(obj))
+        elif isinstance(obj, list):
+            return self.get_schema_shape(list(obj))
+        return SchemaNode("unknown", value_type=str(type(obj)))
+    
+    def cache_shape(self, key: Tuple, node: SchemaNode):
+        """
+        Intern a shape node, resetting the cache if it grows past SHAPE_CACHE_LIMIT
+        (e.g. objects keyed by IDs, where every record has a new key set).
+        """
+        if len(self.shape_cache) >= SHAPE_CACHE_LIMIT:
+            self.shape_cache.clear()
+            # The fingerprint table would otherwise keep every evicted root shape alive
+            self.shape_fingerprints.clear()
+        self.shape_cache[key] = node
+    
+    def attach_schema_paths(self, node: SchemaNode, path: str = "root") -> Dict:
+        """
+        Build the output schema layout (a fresh tree with 'path' on every node) from a shape.
+        """
+        return node.to_json(path)
+    
+    def get_json_schema(self, obj: Any, path: str = "root") -> Dict:
+        """
+        Recursively extract schema from a JSON object.
+        Returns a schema dictionary with type information and structure.
+        """
+        return self.attach_schema_paths(self.get_schema_shape(obj), path)
     
     def normalize_schema_for_comparison(self, schema: Dict) -> Dict:
         """
         Normalize schema for comparison by removing paths and sorting required fields.
         This ensures that schemas with fields in different orders are treated as identical.
         """
+        if isinstance(schema, SchemaNode):
+            return schema.canonical()
         if isinstance(schema, dict):
             normalized = {}
             for k, v in schema.items():
@@ -102,109 +574,1328 @@ class SchemaExtractor:
         Compare two schemas to check if they are equivalent.
         Ignores field ordering and path information.
         """
+        if isinstance(schema1, SchemaNode) and isinstance(schema2, SchemaNode):
+            return schema1 == schema2
         normalized1 = self.normalize_schema_for_comparison(schema1)
         normalized2 = self.normalize_schema_for_comparison(schema2)
         return normalized1 == normalized2
     
-    def add_schema(self, schema: Dict, record_line: int):
+    def schema_fingerprint(self, schema: Dict) -> str:
+        """
+        Compute a stable digest of the normalized schema.
+        Two schemas are equal (per schemas_equal) iff their fingerprints match.
+        """
+        normalized = self.normalize_schema_for_comparison(schema)
+        canonical = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+    
+    def shape_fingerprint(self, shape: SchemaNode) -> str:
+        """
+        Fingerprint of a shape, computed once per distinct root shape.
+        """
+        fingerprint = self.shape_fingerprints.get(shape)
+        if fingerprint is None:
+            fingerprint = self.schema_fingerprint(shape)
+            self.shape_fingerprints[shape] = fingerprint
+        return fingerprint
+    
+    def add_schema_shape(self, shape: SchemaNode, record_line: int, fingerprint: str = None):
+        """
+        Add a record's shape (from get_schema_shape) to the collection.
+        The fingerprint is cached per root shape, and a new unique schema stores
+        the shared shape node itself; the JSON layout is only built for output.
+        """
+        if fingerprint is None:
+            fingerprint = self.shape_fingerprint(shape)
+        
+        existing_id = self.fingerprint_index.get(fingerprint)
+        if existing_id is not None:
+            existing_schema = self.schemas[existing_id]
+            existing_schema['count'] += 1
+            self.add_sample_line(existing_id, existing_schema['sample_lines'], record_line)
+            return existing_id
+        
+        return self.add_schema(shape, record_line, fingerprint)
+    
+    def add_schema(self, schema: SchemaNode, record_line: int, fingerprint: str = None):
         """
         Add a schema to the collection, checking for uniqueness.
+        Uses the fingerprint index so lookup cost does not grow with the number of schemas.
+        A schema in the JSON layout (e.g. from get_json_schema) is converted to a node.
         """
-        schema_id = None
+        if isinstance(schema, dict):
+            schema = SchemaNode.from_json(schema)
+        if fingerprint is None:
+            fingerprint = self.schema_fingerprint(schema)
         
         # Check if this schema already exists
-        for existing_id, existing_schema in self.schemas.items():
-            if self.schemas_equal(schema, existing_schema['schema']):
-                existing_schema['count'] += 1
-                existing_schema['sample_lines'].append(record_line)
-                return existing_id
+        existing_id = self.fingerprint_index.get(fingerprint)
+        if existing_id is not None:
+            existing_schema = self.schemas[existing_id]
+            existing_schema['count'] += 1
+            self.add_sample_line(existing_id, existing_schema['sample_lines'], record_line)
+            return existing_id
         
         # New unique schema
-        schema_id = f"schema_{len(self.schemas) + 1}"
+        schema_id = self.new_schema_id(fingerprint, schema, record_line)
         self.schemas[schema_id] = {
             'schema': schema,
             'count': 1,
             'sample_lines': [record_line],
-            'first_seen': record_line
+            'first_seen': record_line,
+            'fingerprint': fingerprint
         }
+        self.fingerprint_index[fingerprint] = schema_id
         return schema_id
     
-    def process_log_file(self):
+    def new_schema_id(self, fingerprint: str, schema: SchemaNode, first_seen: int) -> str:
+        """
+        Assign an ID to a newly seen schema: the registry's stable ID when a
+        registry is configured, otherwise the next schema_N in this run.
+        """
+        if self.registry is not None:
+            source, line = self.line_source(first_seen)
+            return self.registry.get_or_create(fingerprint, schema.to_json(), source, line)
+        return f"schema_{len(self.schemas) + 1}"
+    
+    def line_source(self, line_number: int) -> Tuple[str, int]:
+        """
+        The file and per-file line number a line number (or multi-file line key) refers to.
+        """
+        if self.source_names is None:
+            return self.log_file_path, line_number
+        return self.source_names[line_number >> FILE_LINE_BITS], line_number & FILE_LINE_MASK
+    
+    def format_line(self, line_number: int) -> Any:
+        """
+        A line number as written to the outputs: unchanged for one file, "file:line" for several.
+        """
+        if self.source_names is None:
+            return line_number
+        source, line = self.line_source(line_number)
+        return f"{source}:{line}"
+    
+    def iter_output_schemas(self, schemas: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, Dict]]:
+        """
+        Schema table entries in the output layout, one at a time: schema nodes converted
+        to JSON trees with paths, and sample_lines and first_seen qualified by file in
+        multi-file runs. Only the entry being written exists in this form.
+        """
+        for schema_id, info in schemas:
+            info = dict(info)
+            if isinstance(info['schema'], SchemaNode):
+                info['schema'] = info['schema'].to_json()
+            if self.source_names is not None:
+                info['sample_lines'] = [self.format_line(line) for line in info['sample_lines']]
+                info['first_seen'] = self.format_line(info['first_seen'])
+            yield schema_id, info
+    
+    def sync_registry(self):
+        """
+        Add the counts accumulated since the last sync to the registry and commit.
+        Sampled counts are not totals, so sampling runs only mark schemas as seen.
+        """
+        if self.registry is None:
+            return
+        deltas = {info['fingerprint']: info['count'] - self.registry_synced.get(info['fingerprint'], 0)
+                  for info in self.schemas.values()}
+        self.registry.flush_counts(deltas, add_counts=self.sampler is None)
+        self.registry_synced = {info['fingerprint']: info['count'] for info in self.schemas.values()}
+    
+    def add_group_shape(self, record: Any, shape: SchemaNode, fingerprint: str, record_line: int):
+        """
+        Count a record's shape in its merge group. Constant work per record:
+        the union schema is only folded together in iter_merged_schemas.
+        """
+        value = record.get(self.merge_field) if isinstance(record, dict) else None
+        group_id = f"{self.merge_field}:{value if value is not None else '<missing>'}"
+        
+        group = self.groups.get(group_id)
+        if group is None:
+            group = self.groups[group_id] = {
+                'count': 0,
+                'sample_lines': [],
+                'first_seen': record_line,
+                'shapes': {}
+            }
+        group['count'] += 1
+        self.add_sample_line(f"group:{group_id}", group['sample_lines'], record_line)
+        
+        entry = group['shapes'].get(fingerprint)
+        if entry is None:
+            group['shapes'][fingerprint] = [shape, 1]
+        else:
+            entry[1] += 1
+    
+    def merge_groups(self, groups: Dict[str, Dict]):
+        """
+        Merge another extractor's merge-group tables (from a later part of the file).
+        """
+        for group_id, incoming in groups.items():
+            group = self.groups.get(group_id)
+            if group is None:
+                self.groups[group_id] = incoming
+                continue
+            group['count'] += incoming['count']
+            self.merge_sample_lines(f"group:{group_id}", group['sample_lines'], incoming['sample_lines'])
+            for fingerprint, (shape, count) in incoming['shapes'].items():
+                entry = group['shapes'].get(fingerprint)
+                if entry is None:
+                    group['shapes'][fingerprint] = [shape, count]
+                else:
+                    entry[1] += count
+    
+    def fold_union(self, union: Dict, shape: SchemaNode, weight: int):
+        """
+        Fold a shape occurring `weight` times into a union node, accumulating
+        type counts, per-property presence and merged array item types.
+        """
+        union['presence'] += weight
+        node_type = shape.type
+        union['types'][node_type] = union['types'].get(node_type, 0) + weight
+        
+        if node_type == 'object':
+            properties = union.setdefault('properties', {})
+            for key, child in shape.properties():
+                if key not in properties:
+                    properties[key] = {'presence': 0, 'types': {}}
+                self.fold_union(properties[key], child, weight)
+        elif node_type == 'array':
+            item = shape.items
+            # Empty arrays say nothing about the item type
+            if item.type != 'unknown' or item.value_type is not None:
+                if 'items' not in union:
+                    union['items'] = {'presence': 0, 'types': {}}
+                self.fold_union(union['items'], item, weight)
+    
+    def render_union(self, union: Dict, path: str = "root") -> Dict:
+        """
+        Convert a union node to the output schema layout. 'type' is a string, or a
+        list (most frequent first) when several types were seen; 'required' lists the
+        properties present in every occurrence of the object.
+        """
+        types = sorted(union['types'].items(), key=lambda item: (-item[1], item[0]))
+        schema = {"type": types[0][0] if len(types) == 1 else [t for t, _ in types]}
+        if len(types) > 1:
+            schema['type_counts'] = dict(types)
+        schema['presence'] = union['presence']
+        
+        if 'properties' in union:
+            object_count = union['types']['object']
+            schema['properties'] = {key: self.render_union(child, f"{path}.{key}")
+                                    for key, child in union['properties'].items()}
+            schema['required'] = [key for key, child in union['properties'].items()
+                                  if child['presence'] == object_count]
+            schema['optional'] = [key for key, child in union['properties'].items()
+                                  if child['presence'] < object_count]
+        if union['types'].get('array'):
+            schema['items'] = self.render_union(union['items'], f"{path}[0]") \
+                if 'items' in union else {"type": "unknown"}
+        
+        schema['path'] = path
+        return schema
+    
+    def iter_merged_schemas(self) -> Iterator[Tuple[str, Dict]]:
+        """
+        Fold each merge group's shape table into one union schema, one group at a time.
+        Entries keep the unique_schemas layout so SchemaDiffAnalyzer can read them.
+        """
+        for group_id, group in self.groups.items():
+            union = {'presence': 0, 'types': {}}
+            for shape, count in group['shapes'].values():
+                self.fold_union(union, shape, count)
+            yield group_id, {
+                'schema': self.render_union(union),
+                'count': group['count'],
+                'sample_lines': group['sample_lines'],
+                'first_seen': group['first_seen'],
+                'variants': len(group['shapes'])
+            }
+    
+    def add_sample_line(self, schema_id: str, samples: List[int], record_line: int):
+        """
+        Offer a line to a schema's bounded sample, kept sorted by line number.
+        Once full, the sample holds the lines with the lowest sample_priority,
+        so memory stays at max_sample_lines per schema.
+        """
+        if samples and samples[-1] == record_line:
+            return  # another record recovered from the same line
+        if not self.max_sample_lines or len(samples) < self.max_sample_lines:
+            if not samples or record_line > samples[-1]:
+                samples.append(record_line)
+            else:
+                bisect.insort(samples, record_line)
+            return
+        
+        threshold = self.sample_thresholds.get(schema_id)
+        if threshold is None:
+            threshold = max((sample_priority(line), line) for line in samples)
+            self.sample_thresholds[schema_id] = threshold
+        
+        if sample_priority(record_line) < threshold[0]:
+            samples.remove(threshold[1])
+            bisect.insort(samples, record_line)
+            del self.sample_thresholds[schema_id]
+    
+    def merge_sample_lines(self, schema_id: str, samples: List[int], incoming: List[int]):
+        """
+        Merge another sample of the same schema, keeping the lowest-priority lines.
+        """
+        combined = samples + incoming
+        if self.max_sample_lines and len(combined) > self.max_sample_lines:
+            combined = heapq.nsmallest(self.max_sample_lines, combined, key=sample_priority)
+        samples[:] = sorted(combined)
+        self.sample_thresholds.pop(schema_id, None)
+    
+    def process_line(self, raw_line: bytes, line_number: int) -> str:
+        """
+        Parse a single raw log line and record its schema or failure.
+        The line is handed to the decoder as bytes; it is only decoded to str
+        when it has to be stored as a failed record. Lines that do not parse
+        go to recover_line.
+        Returns the record's schema ID (of the first record recovered from a
+        damaged line), or None for empty and failed lines.
+        """
+        self.lines_read += 1
+        self.bytes_read += len(raw_line)
+        
+        # Progress indicator, checked every 1024 lines and rate-limited by time
+        if self.verbose and not self.lines_read & 1023:
+            self.progress.maybe_report(self.progress_stats())
+        
+        line = raw_line.strip()
+        
+        if not line:  # Skip empty lines
+            return None
+        
+        try:
+            # Parse JSON record
+            parse_start = time.perf_counter()
+            record = self.decoder.loads(line)
+            schema_start = time.perf_counter()
+            
+            # A line that parses on its own ends any split record before it, unless it
+            # is a bare value (e.g. a string) that may be the middle of that record
+            if self.pending_fragments:
+                if not isinstance(record, dict):
+                    taken, schema_id = self.continue_pending(raw_line.rstrip(b"\r\n"), line_number,
+                                                             "JSON value outside a record")
+                    if taken:
+                        return schema_id
+                self.flush_pending()
+            
+            # Extract schema shape and add to unique schemas
+            schema_id, shape, fingerprint = self.add_record(record, line_number)
+            
+            self.parse_seconds += schema_start - parse_start
+            self.schema_seconds += time.perf_counter() - schema_start
+        
+        except self.decoder.decode_errors as e:
+            return self.recover_line(raw_line, line_number, str(e))
+        
+        except Exception as e:
+            self.record_failure(line_number, line.decode('utf-8', errors='replace'),
+                                f"Unexpected error: {str(e)}")
+        
+        else:
+            self.export_record(record, shape, fingerprint, line_number)
+            return schema_id
+        
+        return None
+    
+    def add_record(self, record: Any, record_line: int) -> Tuple[str, SchemaNode, str]:
+        """
+        Add a decoded record's schema to the unique schemas (and its merge group).
+        Returns (schema_id, shape, fingerprint).
+        """
+        shape = self.get_schema_shape(record)
+        fingerprint = self.shape_fingerprint(shape)
+        schema_id = self.add_schema_shape(shape, record_line, fingerprint)
+        if self.merge_field:
+            self.add_group_shape(record, shape, fingerprint, record_line)
+        self.processed_count += 1
+        return schema_id, shape, fingerprint
+    
+    def export_record(self, record: Any, shape: SchemaNode, fingerprint: str, record_line: int):
+        """
+        Hand a decoded record to the optional output stages instead of parsing the line again.
+        A record an output stage fails on is recorded as failed, like any other bad line.
+        """
+        try:
+            if self.field_stats is not None:
+                self.field_stats.add_record(record)
+            if self.parquet_writer is not None:
+                self.parquet_writer.add(record, shape, fingerprint)
+            if self.exporter is not None:
+                self.exporter.add(record)
+        except Exception as e:
+            self.record_failure(record_line, json.dumps(record), f"Export error: {str(e)}")
+    
+    def recover_line(self, raw_line: bytes, line_number: int, error: str) -> str:
+        """
+        Recover the records of a line that does not parse on its own, in the same pass:
+        it may continue a record split over the pending lines before it, hold several
+        concatenated objects, or end with the start of an object that continues on the
+        next line (kept pending for up to rejoin_lines lines). What cannot be recovered
+        is recorded as failed. Returns the schema ID of the first record recovered.
+        """
+        # Only the line break is dropped: a split inside a string keeps its spaces
+        fragment = raw_line.rstrip(b"\r\n")
+        
+        taken, schema_id = self.continue_pending(fragment, line_number, error)
+        if taken:
+            return schema_id
+        
+        objects, rest, truncated = split_json_objects(fragment)
+        hold = truncated and self.rejoin_lines > 1
+        if hold or (objects and (truncated or (len(objects) > 1 and not rest))):
+            self.recovered_concatenated += len(objects)
+            schema_id = self.add_recovered(objects, line_number)
+            if hold:
+                self.pending_fragments = [(line_number, rest, error)]
+            elif rest:
+                self.record_failure(line_number, rest.decode('utf-8', errors='replace'), error)
+            return schema_id
+        
+        self.record_failure(line_number, raw_line.strip().decode('utf-8', errors='replace'), error)
+        return None
+    
+    def continue_pending(self, fragment: bytes, line_number: int, error: str) -> Tuple[bool, str]:
+        """
+        Try a line as the continuation of the pending split record. If it does not
+        fit, the oldest pending fragment is failed and the rest retried without it
+        (a truncated line can otherwise swallow the split record after it), until the
+        line is taken or nothing is pending. Returns (taken, schema ID).
+        """
+        while self.pending_fragments:
+            taken, schema_id = self.rejoin_pending(fragment, line_number, error)
+            if taken:
+                return True, schema_id
+            self.fail_oldest_fragment()
+        return False, None
+    
+    def rejoin_pending(self, fragment: bytes, line_number: int, error: str) -> Tuple[bool, str]:
+        """
+        Try a line as the continuation of the pending split record. Returns whether it
+        was taken, completing the record (with the schema ID of the record) or
+        extending it while it is still incomplete.
+        """
+        first_line = self.pending_fragments[0][0]
+        joined = b''.join(part for _, part, _ in self.pending_fragments) + fragment
+        objects, rest, truncated = split_json_objects(joined)
+        if objects and (not rest or truncated):
+            # The first object is the split record; more may follow on this line
+            self.pending_fragments = []
+            self.recovered_split += 1
+            self.recovered_concatenated += len(objects) - 1
+            schema_id = self.add_recovered(objects[:1], first_line)
+            self.add_recovered(objects[1:], line_number)
+            if rest:
+                self.pending_fragments = [(line_number, rest, error)]
+            return True, schema_id
+        if truncated and len(self.pending_fragments) + 1 < self.rejoin_lines \
+                and len(joined) <= REJOIN_MAX_BYTES:
+            self.pending_fragments.append((line_number, fragment, error))
+            return True, None
+        return False, None
+    
+    def add_recovered(self, records: List[Any], record_line: int) -> str:
+        """
+        Add records recovered by recover_line as if each had a line of its own.
+        Returns the schema ID of the first.
+        """
+        first_id = None
+        for record in records:
+            try:
+                schema_id, shape, fingerprint = self.add_record(record, record_line)
+            except Exception as e:
+                self.record_failure(record_line, json.dumps(record, ensure_ascii=False),
+                                    f"Unexpected error: {str(e)}")
+                continue
+            self.export_record(record, shape, fingerprint, record_line)
+            first_id = first_id or schema_id
+        return first_id
+    
+    def fail_oldest_fragment(self):
+        """
+        Record the oldest pending fragment as a failed line and retry the later ones
+        as a split record of their own.
+        """
+        (line_number, fragment, error), *later = self.pending_fragments
+        self.pending_fragments = []
+        self.record_failure(line_number, fragment.strip().decode('utf-8', errors='replace'), error)
+        for line_number, fragment, error in later:
+            self.recover_line(fragment, line_number, error)
+    
+    def flush_pending(self):
+        """
+        End the pending split record: whatever of it cannot be completed is recorded as failed lines.
+        """
+        while self.pending_fragments:
+            self.fail_oldest_fragment()
+    
+    def defer_line(self, raw_line: bytes, line_number: int) -> bool:
+        """
+        Worker shards only: keep a leading line that does not parse on its own in
+        head_lines, since it may continue a record split across the shard boundary;
+        the parent retries it in file order (merge_shard_result). Returns False,
+        ending the head, once a line parses as an object or HEAD_DEFER_LINES lines are held.
+        """
+        if len(self.head_lines) < HEAD_DEFER_LINES:
+            line = raw_line.strip()
+            try:
+                if line and isinstance(self.decoder.loads(line), dict):
+                    self.head_closed = True
+                    return False
+            except Exception:
+                pass
+            self.head_lines.append((line_number, raw_line))
+            return True
+        self.head_closed = True
+        return False
+    
+    def record_failure(self, line_number: int, content: str, error: str):
+        """
+        Record a line that could not be processed by appending it to the spill file.
+        """
+        self.failed_count += 1
+        failed = {
+            'line_number': self.format_line(line_number),
+            'content': content,
+            'error': error
+        }
+        if len(self.failed_preview) < FAILED_PREVIEW_SIZE:
+            self.failed_preview.append(failed)
+        
+        self.open_failed_spill().write(json.dumps(failed, ensure_ascii=False, separators=self.failed_separators) + "\n")
+        
+        if self.verbose and self.progress.allow_warning():
+            print(f"Warning: Failed to parse JSON at line {self.format_line(line_number)}: {error}")
+    
+    def progress_stats(self) -> Dict[str, float]:
+        """
+        Current counters for progress reporting and metrics export.
+        """
+        return {
+            'lines_read': self.lines_read,
+            'bytes_read': self.bytes_read,
+            'processed_count': self.processed_count,
+            'failed_count': self.failed_count,
+            'unique_schemas': len(self.schemas),
+            'parse_seconds': self.parse_seconds,
+            'schema_seconds': self.schema_seconds
+        }
+    
+    def write_metrics(self):
+        """
+        Export run metrics to the Prometheus textfile, if one was requested.
+        """
+        if not self.metrics_file:
+            return
+        
+        elapsed = time.monotonic() - self.start_time
+        write_prometheus_textfile(self.metrics_file, {
+            'lines_read_total': self.lines_read,
+            'bytes_read_total': self.bytes_read,
+            'records_processed_total': self.processed_count,
+            'records_failed_total': self.failed_count,
+            'records_recovered_total': self.recovered_concatenated + self.recovered_split,
+            'unique_schemas': len(self.schemas),
+            'parse_seconds_total': round(self.parse_seconds, 6),
+            'schema_seconds_total': round(self.schema_seconds, 6),
+            'run_duration_seconds': round(elapsed, 3),
+            'lines_per_second': round(self.lines_read / elapsed, 1) if elapsed > 0 else 0,
+            'last_update_timestamp_seconds': int(time.time())
+        }, labels={'log_file': self.log_file_path})
+    
+    def failed_spill_target(self) -> str:
+        """
+        The spill file on disk: with --gzip-output it is written compressed as failures
+        occur (failed_spill_path plus .gz), so no recompression is left for the end.
+        """
+        return self.failed_spill_path + ".gz" if self.compress_output else self.failed_spill_path
+    
+    def open_failed_spill(self) -> TextIO:
+        """The failed-record spill file, opened for appending on first use."""
+        if self.failed_spill_file is None:
+            self.failed_spill_file = open_text_output(self.failed_spill_target(), self.compress_output, append=True)
+        return self.failed_spill_file
+    
+    def close_failed_spill(self):
+        """
+        Flush and close the failed-record spill file if it is open.
+        """
+        if self.failed_spill_file is not None:
+            self.failed_spill_file.close()
+            self.failed_spill_file = None
+    
+    def close_exporter(self):
+        """
+        Flush the Elasticsearch export and add its statistics to es_stats.
+        """
+        if self.exporter is not None:
+            for key, value in self.exporter.close().items():
+                self.es_stats[key] = self.es_stats.get(key, 0) + value
+            self.exporter = None
+    
+    def finish_parquet_files(self):
+        """
+        Write buffered Parquet rows and close the open files; they stay staged until published.
+        """
+        if self.parquet_writer is not None:
+            self.parquet_staged.extend(self.parquet_writer.flush())
+    
+    def parquet_row_count(self) -> int:
+        """Rows written to Parquet by this process and the merged worker shards."""
+        return self.parquet_rows + (self.parquet_writer.rows_written if self.parquet_writer else 0)
+    
+    def publish_parquet(self):
+        """
+        Finish the open Parquet files and move all staged files into their
+        schema_id=/date= partitions, now that the schema IDs are known.
+        """
+        self.finish_parquet_files()
+        if self.parquet_staged:
+            self.parquet_files.extend(publish_partitions(self.parquet_export['output_dir'],
+                                                         self.parquet_staged, self.fingerprint_index))
+            self.parquet_staged = []
+    
+    def process_byte_range(self, start: int, end: int, line_offset: int = 0, defer_head: bool = False) -> int:
+        """
+        Process the lines in [start, end) of the log file.
+        Line numbers continue from line_offset; returns the number of lines read.
+        With defer_head (worker shards), leading lines that fail on their own are
+        left in head_lines for the parent.
+        """
+        line_number = line_offset
+        position = start
+        
+        with open(self.log_file_path, 'rb') as file:
+            file.seek(start)
+            while position < end:
+                raw_line = file.readline()
+                if not raw_line:
+                    break
+                position += len(raw_line)
+                line_number += 1
+                if defer_head:
+                    defer_head = self.defer_line(raw_line, line_number)
+                    if defer_head:
+                        continue
+                self.process_line(raw_line, line_number)
+                if self.checkpoint_path is not None and not line_number & 1023:
+                    self.maybe_checkpoint(position, line_number)
+        
+        return line_number - line_offset
+    
+    def process_stream(self, stream: io.BufferedReader, line_offset: int = 0) -> int:
+        """
+        Process every line of a binary stream, such as a decompressing reader.
+        Line numbers continue from line_offset; returns the number of lines read.
+        """
+        line_number = line_offset
+        for raw_line in stream:
+            line_number += 1
+            self.process_line(raw_line, line_number)
+        return line_number - line_offset
+    
+    def process_compressed_stream(self, compression: str, start: int = 0, line_number: int = 0,
+                                  carry: bytes = b'', skip_lines: int = 0):
+        """
+        Decompress from a member/frame boundary at `start` and process the rest as one
+        stream. carry is an incomplete line that continues at start; the first
+        skip_lines lines were processed before a resume and are only read past.
+        Line numbers continue from line_number.
+        """
+        base_line = line_number - skip_lines
+        with open_decompressed(self.log_file_path, compression, start) as stream:
+            pending = carry
+            if skip_lines:
+                print(f"Skipping {skip_lines} lines processed before the checkpoint")
+                for _ in islice(stream, skip_lines):
+                    pass
+                pending = b''
+            for raw_line in stream:
+                if pending:
+                    raw_line = pending + raw_line
+                    pending = b''
+                line_number += 1
+                self.process_line(raw_line, line_number)
+                if self.checkpoint_path is not None and not line_number & 1023:
+                    self.maybe_checkpoint(start, line_number, carry, line_number - base_line)
+            if pending:
+                self.process_line(pending, line_number + 1)
+    
+    def process_log_file(self, workers: int = 1, resume_path: str = None, checkpoint_interval: float = 60.0):
         """
         Process the APISIX log file and extract schemas.
+        With workers > 1 the file is split into newline-aligned shards processed in parallel.
+        With resume_path the run is crash-safe: a checkpoint is saved there every
+        checkpoint_interval seconds, and one left by an interrupted run over the same,
+        unchanged file is continued from, giving the output of an uninterrupted run.
         """
         print(f"Processing log file: {self.log_file_path}")
         print(f"Output directory: {self.output_dir}")
+        if resume_path:
+            print(f"Checkpoint file: {resume_path}")
+        print(f"JSON decoder: {self.decoder.name}")
         print("-" * 60)
         
         if not os.path.exists(self.log_file_path):
             raise FileNotFoundError(f"Log file not found: {self.log_file_path}")
         
-        line_number = 0
+        offset, line_number, carry, skip_lines = 0, 0, b'', 0
+        if resume_path:
+            offset, line_number, carry, skip_lines = self.resume_batch(resume_path, checkpoint_interval)
         
-        with open(self.log_file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                line_number += 1
-                line = line.strip()
-                
-                if not line:  # Skip empty lines
+        compression = detect_compression(self.log_file_path)
+        if compression:
+            print(f"Compressed input: {compression}")
+            if workers > 1 and not skip_lines:
+                self.process_compressed_parallel(compression, workers, offset, line_number, carry)
+            else:
+                self.process_compressed_stream(compression, offset, line_number, carry, skip_lines)
+        elif workers > 1:
+            self.process_parallel(workers, offset, line_number)
+        else:
+            self.process_byte_range(offset, os.path.getsize(self.log_file_path), line_number)
+        
+        # A split record still open at the end of the file was never completed
+        self.flush_pending()
+        
+        if self.verbose:
+            self.progress.report(self.progress_stats(), final=True)
+    
+    def process_log_files(self, file_paths: List[str], workers: int = 1):
+        """
+        Process several log files into one consolidated schema table.
+        Each file is one task, submitted largest first so the longest files start
+        early; results are merged in input order, so schema IDs and samples do not
+        depend on scheduling. Requires source_names (one per file path).
+        """
+        print(f"Processing {len(file_paths)} log files under: {self.log_file_path}")
+        print(f"Output directory: {self.output_dir}")
+        print(f"JSON decoder: {self.decoder.name}")
+        print("-" * 60)
+        
+        missing = [path for path in file_paths if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"Log file not found: {missing[0]}")
+        
+        sizes = [os.path.getsize(path) for path in file_paths]
+        order = sorted(range(len(file_paths)), key=lambda i: -sizes[i])
+        
+        if workers > 1:
+            print(f"Scheduling {len(file_paths)} files ({sum(sizes) / (1 << 20):.1f} MB) "
+                  f"largest first across {workers} workers...")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {i: executor.submit(process_file, file_paths[i], i, self.worker_kwargs(i))
+                           for i in order}
+                for i in range(len(file_paths)):
+                    self.merge_shard_result(futures[i].result())
+        else:
+            for i, path in enumerate(file_paths):
+                self.merge_shard_result(process_file(path, i, self.worker_kwargs(i)))
+        
+        if self.verbose:
+            self.progress.report(self.progress_stats(), final=True)
+    
+    def process_sampled(self):
+        """
+        Survey the log file from a sample of its lines instead of a full pass.
+        The sample is sized so that schemas at or above the rare-schema threshold
+        are seen with the requested confidence: an explicit seek count is raised
+        to that size, and an every-Nth step is lowered to it when the line count
+        can be estimated (plain files).
+        """
+        print(f"Sampling log file: {self.log_file_path}")
+        print(f"Output directory: {self.output_dir}")
+        print(f"JSON decoder: {self.decoder.name}")
+        print("-" * 60)
+    
+        if not os.path.exists(self.log_file_path):
+            raise FileNotFoundError(f"Log file not found: {self.log_file_path}")
+    
+        options = self.sample_options
+        size = options.get('size')
+        required = required_sample_size(self.sampler.rare_threshold, self.sampler.confidence)
+        compression = detect_compression(self.log_file_path)
+    
+        if options['method'] == 'seek':
+            if compression:
+                raise ValueError("seek sampling needs an uncompressed log file; use every:N instead")
+            seed = options.get('seed')
+            if seed is None:
+                seed = random.randrange(1 << 32)
+            if size is not None and size < required:
+                print(f"Raising {size} seeks to {required} to detect schemas at "
+                      f"{self.sampler.rare_threshold:.4%} frequency")
+            self.sample_settings = {'seeks': max(size or 0, required), 'seed': seed}
+            print(f"Seek sampling: {self.sample_settings['seeks']} random offsets (seed {seed})")
+            self.process_seek_sample(self.sample_settings['seeks'], seed)
+        else:
+            every = size
+            if not compression:
+                limit = max(1, estimate_line_count(self.log_file_path,
+                                                   os.path.getsize(self.log_file_path)) // required)
+                if every is not None and every > limit:
+                    print(f"Lowering every:{every} to every:{limit} to detect schemas at "
+                          f"{self.sampler.rare_threshold:.4%} frequency")
+                every = limit if every is None else min(every, limit)
+            elif every is None:
+                raise ValueError("every-Nth sampling of compressed input needs an explicit step (every:N)")
+            self.sample_settings = {'every': every}
+            print(f"Systematic sampling: every {every} lines")
+            if compression:
+                print(f"Compressed input: {compression}")
+                with open_decompressed(self.log_file_path, compression) as stream:
+                    self.process_every_nth(stream, every)
+            else:
+                with open(self.log_file_path, 'rb') as stream:
+                    self.process_every_nth(stream, every)
+            if self.sampler.draws < required:
+                print(f"Warning: only {self.sampler.draws} lines sampled; schemas at "
+                      f"{self.sampler.rare_threshold:.4%} frequency are detected with probability "
+                      f"{self.sampler.summary()['rare_detection_probability']:.1%}")
+    
+        if self.verbose:
+            self.progress.report(self.progress_stats(), final=True)
+    
+    def process_every_nth(self, stream: io.BufferedReader, every: int):
+        """
+        Process lines 1, 1 + every, 1 + 2 * every, ... of a binary stream.
+        Skipped lines are only counted, not decoded, so the total line count is exact.
+        """
+        line_number = 0
+        for raw_line in stream:
+            line_number += 1
+            self.sample_line(raw_line, line_number)
+            line_number += sum(1 for _ in islice(stream, every - 1))
+        self.sampler.total_lines = line_number
+    
+    def process_seek_sample(self, seeks: int, seed: int):
+        """
+        Process the lines containing `seeks` random byte offsets. Lines are
+        identified by their starting byte offset, which stands in for the line
+        number in samples and failed records; a line hit by several offsets is
+        decoded once but counted as every draw.
+        """
+        file_size = os.path.getsize(self.log_file_path)
+        if not file_size:
+            return
+    
+        line_start = line_end = -1
+        key = weight = None
+        with open(self.log_file_path, 'rb') as file:
+            for offset in random_offsets(file_size, seeks, seed):
+                if offset < line_end:
+                    self.sampler.add(key, weight)
                     continue
+                line_start = find_line_start(file, offset)
+                file.seek(line_start)
+                raw_line = file.readline()
+                line_end = line_start + len(raw_line)
+                weight = file_size / len(raw_line)
+                key = self.sample_line(raw_line, line_start, weight)
+    
+    def sample_line(self, raw_line: bytes, position: int, weight: float = 1.0) -> str:
+        """
+        Process one sampled line and record its outcome (schema ID, failed or empty)
+        with the sampler; returns the outcome key.
+        """
+        failed_count = self.failed_count
+        key = self.process_line(raw_line, position)
+        if key is None:
+            key = SAMPLE_FAILED if self.failed_count != failed_count else SAMPLE_EMPTY
+        self.sampler.add(key, weight)
+        return key
+    
+    def add_sample_estimates(self, schemas: Iterable[Tuple[str, Dict]]) -> Iterable[Tuple[str, Dict]]:
+        """
+        Schema table entries with estimated_count and its confidence interval added in sampling runs.
+        """
+        if self.sampler is None:
+            return schemas
+        return ((schema_id, dict(info, **self.sampler.estimate(schema_id))) for schema_id, info in schemas)
+    
+    def sampling_summary(self) -> Dict[str, Any]:
+        """
+        Sampling design, sample size and estimated totals, including failed records.
+        """
+        summary = dict(self.sampler.summary(), **self.sample_settings)
+        failed = self.sampler.estimate(SAMPLE_FAILED)
+        summary['estimated_failed'] = failed['estimated_count']
+        summary['estimated_failed_ci'] = failed['estimated_count_ci']
+        return summary
+    
+    def worker_kwargs(self, index: int, **extra) -> Dict:
+        """
+        Settings for worker `index` (a shard, segment or file), with its own
+        part-file names so worker outputs never collide.
+        """
+        kwargs = {
+            'output_dir': self.output_dir,
+            'decoder': self.decoder.name,
+            'max_sample_lines': self.max_sample_lines,
+            'merge_field': self.merge_field,
+            'failed_spill_path': f"{self.failed_spill_path}.part{index}",
+            'es_export': dict(self.es_export, file_prefix=f"bulk_part{index}") if self.es_export else None,
+            'parquet_export': dict(self.parquet_export, file_prefix=f"{self.parquet_export['file_prefix']}-s{index}")
+            if self.parquet_export else None,
+            'field_stats': self.field_stats_options,
+            'source_names': self.source_names,
+            'output_format': self.output_format,
+            'rejoin_lines': self.rejoin_lines
+        }
+        kwargs.update(extra)
+        return kwargs
+    
+    def process_parallel(self, workers: int, start: int = 0, line_offset: int = 0):
+        """
+        Process the log file from byte `start` in newline-aligned shards across a
+        process pool, then merge the per-shard schema tables in file order.
+        Crash-safe runs use smaller shards and may checkpoint after each merge.
+        """
+        shards = workers
+        if self.checkpoint_path is not None:
+            remaining = os.path.getsize(self.log_file_path) - start
+            shards = max(workers * 4, -(-remaining // CHECKPOINT_SHARD_BYTES))
+        ranges = compute_shard_ranges(self.log_file_path, shards, start)
+        print(f"Processing {len(ranges)} shards with {workers} workers...")
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            starts = [start for start, _ in ranges]
+            ends = [end for _, end in ranges]
+            paths = [self.log_file_path] * len(ranges)
+            
+            # Count lines per shard first so workers emit global line numbers;
+            # this keeps sample selection identical to a single-threaded run
+            line_counts = list(executor.map(count_lines, paths, starts, ends))
+            line_offsets = [line_offset + sum(line_counts[:i]) for i in range(len(ranges))]
+            
+            first_shard = self.shards_done
+            shard_kwargs = [self.worker_kwargs(first_shard + i, line_offset=line_offsets[i])
+                            for i in range(len(ranges))]
+            
+            # map() yields in submission order, so shards merge in file order
+            for i, result in enumerate(executor.map(process_shard, paths, starts, ends, shard_kwargs)):
+                self.merge_shard_result(result)
+                self.shards_done += 1
+                if self.checkpoint_path is not None:
+                    self.maybe_checkpoint(ends[i], line_offsets[i] + line_counts[i])
+    
+    def process_compressed_parallel(self, compression: str, workers: int, start: int = 0,
+                                    line_offset: int = 0, carry: bytes = b''):
+        """
+        Decompress and process independent gzip members or zstd frames in parallel.
+        A first pass counts lines per segment (and verifies the member boundaries);
+        lines that straddle a segment boundary are stitched and processed here.
+        Falls back to a single stream when the file has no usable boundaries.
+        A resumed run starts at the member boundary `start` with the incomplete line `carry`.
+        """
+        segments = compute_compressed_segments(self.log_file_path, compression, workers * 4)
+        if start:
+            segments = [(max(segment_start, start), end) for segment_start, end in segments if end > start]
+        line_counts = None
+        
+        if len(segments) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                paths = [self.log_file_path] * len(segments)
+                compressions = [compression] * len(segments)
+                starts = [segment_start for segment_start, _ in segments]
+                ends = [end for _, end in segments]
+                line_counts = list(executor.map(count_compressed_lines, paths, compressions, starts, ends))
                 
-                try:
-                    # Parse JSON record
-                    record = json.loads(line)
-                    
-                    # Extract schema
-                    schema = self.get_json_schema(record)
+                if None not in line_counts:
+                    print(f"Processing {len(segments)} compressed segments with {workers} workers...")
+                    line_offsets = [line_offset + sum(line_counts[:i]) for i in range(len(segments))]
+                    first_shard = self.shards_done
+                    shard_kwargs = [self.worker_kwargs(first_shard + i, compression=compression,
+                                                       line_offset=line_offsets[i])
+                                    for i in range(len(segments))]
                     
-                    # Add to unique schemas
-                    self.add_schema(schema, line_number)
+                    for i, result in enumerate(executor.map(process_compressed_shard,
+                                                            paths, starts, ends, shard_kwargs)):
+                        # The line ending at this segment's first newline began in an earlier one
+                        if result['head'] is not None:
+                            self.process_line(carry + result['head'], line_offsets[i] + 1)
+                            carry = b''
+                        self.merge_shard_result(result)
+                        self.shards_done += 1
+                        carry += result['tail']
+                        if self.checkpoint_path is not None:
+                            self.maybe_checkpoint(ends[i], line_offsets[i] + line_counts[i], carry)
                     
-                    self.processed_count += 1
+                    if carry:
+                        self.process_line(carry, line_offset + sum(line_counts) + 1)
+                    return
+            
+            print("Member boundaries could not be verified; decompressing as a single stream")
+        else:
+            print("No independent members/frames found; decompressing as a single stream")
+        
+        self.process_compressed_stream(compression, start, line_offset, carry)
+    
+    def merge_shard_result(self, result: Dict):
+        """
+        Merge one shard's results into this extractor.
+        Shards must be merged in file order so schema IDs match a single-threaded run.
+        """
+        # The shard's leading lines that failed on their own may continue a record
+        # split across the boundary, so they are retried here after the previous
+        # shard's pending fragments; its first line that parsed closed that record
+        for line_number, raw_line in result['head_lines']:
+            self.process_line(raw_line, line_number)
+        if result['head_closed']:
+            self.flush_pending()
+        
+        self.processed_count += result['processed_count']
+        self.recovered_concatenated += result['recovered_concatenated']
+        self.recovered_split += result['recovered_split']
+        
+        # Local schema IDs are assigned in first-seen order, so iterating them in
+        # insertion order preserves the global first-seen order
+        for local_info in result['schemas'].values():
+            existing_id = self.fingerprint_index.get(local_info['fingerprint'])
+            if existing_id is not None:
+                existing_schema = self.schemas[existing_id]
+                existing_schema['count'] += local_info['count']
+                self.merge_sample_lines(existing_id, existing_schema['sample_lines'],
+                                        local_info['sample_lines'])
+                continue
+            
+            schema_id = self.new_schema_id(local_info['fingerprint'], local_info['schema'],
+                                           local_info['first_seen'])
+            self.schemas[schema_id] = local_info
+            self.fingerprint_index[local_info['fingerprint']] = schema_id
+        
+        self.merge_groups(result['groups'])
+        
+        for counter in ('lines_read', 'bytes_read', 'parse_seconds', 'schema_seconds'):
+            setattr(self, counter, getattr(self, counter) + result['stats'][counter])
+        
+        # Append the shard's spilled failures to ours, in file order
+        self.failed_count += result['failed_count']
+        self.failed_preview.extend(result['failed_preview'][:FAILED_PREVIEW_SIZE - len(self.failed_preview)])
+        if result['failed_spill_path'] and os.path.exists(result['failed_spill_path']):
+            with open(result['failed_spill_path'], 'r', encoding='utf-8') as part:
+                shutil.copyfileobj(part, self.open_failed_spill())
+            os.remove(result['failed_spill_path'])
+        
+        for key, value in result['es_stats'].items():
+            self.es_stats[key] = self.es_stats.get(key, 0) + value
+        
+        self.parquet_staged.extend(result['parquet_staged'])
+        self.parquet_rows += result['parquet_rows']
+        if result['field_stats'] is not None:
+            self.field_stats.merge(result['field_stats'])
+        
+        # A record left open at the end of the shard may continue in the next one
+        self.pending_fragments.extend(result['pending_fragments'])
+        
+        self.progress.maybe_report(self.progress_stats())
+    
+    def resume_batch(self, checkpoint_path: str, checkpoint_interval: float) -> Tuple[int, int, bytes, int]:
+        """
+        Enable periodic checkpoints for a batch run and restore the state of an
+        interrupted run of the same file, if its checkpoint exists. Returns where
+        to continue: (offset, line_number, carry, skip_lines), as saved by save_checkpoint.
+        """
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.last_checkpoint = time.monotonic()
+        file_stat = os.stat(self.log_file_path)
+        # A batch checkpoint is only valid for the unchanged file it was taken of
+        self.checkpoint_file_id = [file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns]
+        
+        state = self.load_checkpoint(checkpoint_path, self.checkpoint_file_id)
+        if state is None:
+            if os.path.exists(checkpoint_path):
+                print("Log file changed since the checkpoint; starting from the beginning")
+            return 0, 0, b'', 0
+        
+        # Keep the interrupted run's output names; drop what it wrote after the checkpoint
+        self.run_timestamp = state['run_timestamp']
+        for part in glob.glob(glob.escape(self.failed_spill_path) + ".part*"):
+            os.remove(part)
+        if self.parquet_writer is not None:
+            shutil.rmtree(self.parquet_writer.staging_dir, ignore_errors=True)
+        
+        print(f"Resuming from checkpoint at line {state['line_number']} (byte {state['offset']})")
+        return (state['offset'], state['line_number'], base64.b64decode(state.get('carry', '')),
+                state.get('skip_lines', 0))
+    
+    def maybe_checkpoint(self, offset: int, line_number: int, carry: bytes = b'', skip_lines: int = 0):
+        """
+        Save a batch checkpoint if checkpoint_interval seconds have passed since the last one.
+        """
+        if time.monotonic() - self.last_checkpoint >= self.checkpoint_interval:
+            self.save_checkpoint(self.checkpoint_path, offset, line_number, self.checkpoint_file_id,
+                                 carry, skip_lines)
+            self.last_checkpoint = time.monotonic()
+    
+    def load_checkpoint(self, checkpoint_path: str, file_id: List[int] = None) -> Dict:
+        """
+        Restore counters and the schema table from a checkpoint file.
+        Returns the checkpoint state, or None if no checkpoint exists (or, when
+        file_id is given, if it was taken of a different file).
+        """
+        if not os.path.exists(checkpoint_path):
+            return None
+        
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if file_id is not None and state['file_id'] != file_id:
+            return None
+        
+        self.processed_count = state['processed_count']
+        self.failed_count = state['failed_count']
+        self.recovered_concatenated = state.get('recovered_concatenated', 0)
+        self.recovered_split = state.get('recovered_split', 0)
+        self.pending_fragments = [(line_number, base64.b64decode(fragment), error)
+                                  for line_number, fragment, error in state.get('pending_fragments', [])]
+        self.schemas = {schema_id: dict(info, schema=SchemaNode.from_json(info['schema']))
+                        for schema_id, info in state['schemas'].items()}
+        self.groups = {group_id: dict(group, shapes={fingerprint: [SchemaNode.from_json(shape), count]
+                                                     for fingerprint, (shape, count) in group['shapes'].items()})
+                       for group_id, group in state.get('groups', {}).items()}
+        self.registry_synced = state.get('registry_synced', {})
+        self.fingerprint_index = {info['fingerprint']: schema_id
+                                  for schema_id, info in self.schemas.items()}
+        self.sample_thresholds = {}
+        self.failed_preview = state['failed_preview']
+        if self.field_stats is not None and state.get('field_stats'):
+            self.field_stats = FieldStatsCollector.from_state(state['field_stats'])
+        
+        # Export totals, and batch/shard numbering so later files do not overwrite earlier ones
+        self.es_stats = state.get('es_stats', {})
+        if self.exporter is not None:
+            self.exporter.batch_number = state.get('es_batches', 0)
+        self.parquet_rows = state.get('parquet_rows', 0)
+        self.parquet_files = state.get('parquet_files', [])
+        self.shards_done = state.get('shards_done', 0)
+        
+        # Keep appending to the spill file of the same name in this run's output directory,
+        # dropping anything written after the checkpoint
+        self.close_failed_spill()
+        spill_name = state.get('failed_spill_name') or os.path.basename(state['failed_spill_path'])
+        self.failed_spill_path = os.path.join(self.output_dir, spill_name)
+        self.restore_failed_spill(state['failed_spill_size'], state.get('failed_spill_compressed', False))
+        return state
+    
+    def restore_failed_spill(self, size: int, compressed: bool):
+        """
+        Cut the spill file back to its size at a checkpoint taken with or without
+        --gzip-output, and store it the way this run writes it. Checkpoints of
+        compressed spills are taken at gzip member boundaries, so the cut is clean.
+        Runs before streamed compression gzipped the plain spill at the end.
+        """
+        plain_path = self.failed_spill_path
+        compressed_path = plain_path + ".gz"
+        saved_path, other_path = (compressed_path, plain_path) if compressed else (plain_path, compressed_path)
+        if not os.path.exists(saved_path) and os.path.exists(other_path):
+            convert_spill(other_path, saved_path)
+        if os.path.exists(saved_path) and os.path.getsize(saved_path) > size:
+            os.truncate(saved_path, size)
+        target_path = self.failed_spill_target()
+        if target_path != saved_path and os.path.exists(saved_path):
+            convert_spill(saved_path, target_path)
+    
+    def save_checkpoint(self, checkpoint_path: str, offset: int, line_number: int, file_id: List[int],
+                        carry: bytes = b'', skip_lines: int = 0):
+        """
+        Atomically write the read position, counters and schema table to a checkpoint file.
+        For compressed input, offset is a member/frame boundary, carry the incomplete
+        line continuing there and skip_lines the lines already processed after it.
+        """
+        self.sync_registry()
+        # Closing ends the current gzip member, so the saved size is a member boundary
+        self.close_failed_spill()
+        # Everything before the saved offset must have been exported, so a
+        # restart re-exports at most the records after it
+        if self.exporter is not None:
+            self.exporter.flush()
+        self.publish_parquet()
+        failed_spill_size = os.path.getsize(self.failed_spill_target()) \
+            if os.path.exists(self.failed_spill_target()) else 0
+        
+        es_stats = dict(self.es_stats)
+        if self.exporter is not None:
+            for key, value in self.exporter.stats.items():
+                es_stats[key] = es_stats.get(key, 0) + value
+        
+        state = {
+            'log_file': self.log_file_path,
+            'file_id': file_id,
+            'offset': offset,
+            'line_number': line_number,
+            'carry': base64.b64encode(carry).decode('ascii'),
+            'skip_lines': skip_lines,
+            'run_timestamp': self.run_timestamp,
+            'saved_at': datetime.now().isoformat(),
+            'processed_count': self.processed_count,
+            'failed_count': self.failed_count,
+            'recovered_concatenated': self.recovered_concatenated,
+            'recovered_split': self.recovered_split,
+            'pending_fragments': [[line_number, base64.b64encode(fragment).decode('ascii'), error]
+                                  for line_number, fragment, error in self.pending_fragments],
+            'schemas': {schema_id: dict(info, schema=info['schema'].to_json())
+                        for schema_id, info in self.schemas.items()},
+            'groups': {group_id: dict(group, shapes={fingerprint: [shape.to_json(), count]
+                                                     for fingerprint, (shape, count) in group['shapes'].items()})
+                       for group_id, group in self.groups.items()},
+            'registry_synced': self.registry_synced,
+            'failed_preview': self.failed_preview,
+            'failed_spill_name': os.path.basename(self.failed_spill_path),
+            'failed_spill_size': failed_spill_size,
+            'failed_spill_compressed': self.compress_output,
+            'field_stats': self.field_stats.to_state() if self.field_stats else None,
+            'es_stats': es_stats,
+            'es_batches': self.exporter.batch_number if self.exporter is not None else 0,
+            'parquet_rows': self.parquet_row_count(),
+            'parquet_files': self.parquet_files,
+            'shards_done': self.shards_done
+        }
+        
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, checkpoint_path)
+        self.write_metrics()
+    
+    def process_incremental(self, checkpoint_path: str, follow: bool = False,
+                            checkpoint_interval: float = 60.0, poll_interval: float = 1.0):
+        """
+        Process only the bytes appended since the last checkpoint.
+        With follow=True, keep tailing the file (handling rotation and truncation)
+        until interrupted, checkpointing every checkpoint_interval seconds.
+        Only complete, newline-terminated lines are consumed; a record split at the
+        end of the data read so far stays pending in the checkpoint for the next run.
+        """
+        print(f"Processing log file: {self.log_file_path}")
+        print(f"Output directory: {self.output_dir}")
+        print(f"Checkpoint file: {checkpoint_path}")
+        print(f"JSON decoder: {self.decoder.name}")
+        print("-" * 60)
+        
+        if not os.path.exists(self.log_file_path):
+            raise FileNotFoundError(f"Log file not found: {self.log_file_path}")
+        
+        file = open(self.log_file_path, 'rb')
+        file_stat = os.fstat(file.fileno())
+        file_id = [file_stat.st_dev, file_stat.st_ino]
+        offset = 0
+        line_number = 0
+        
+        state = self.load_checkpoint(checkpoint_path)
+        if state:
+            if state['file_id'] == file_id and file_stat.st_size >= state['offset']:
+                offset = state['offset']
+                line_number = state['line_number']
+                print(f"Resuming from checkpoint at line {line_number} (byte {offset})")
+            else:
+                print("Log file was rotated or truncated since the checkpoint; starting from the beginning")
+                self.flush_pending()
+        
+        file.seek(offset)
+        last_checkpoint = time.monotonic()
+        
+        try:
+            while True:
+                raw_line = file.readline()
+                if raw_line.endswith(b'\n'):
+                    offset += len(raw_line)
+                    line_number += 1
+                    self.process_line(raw_line, line_number)
                     
-                    # Progress indicator
-                    if self.processed_count % 1000 == 0:
-                        print(f"Processed {self.processed_count} records...")
+                    if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                        self.save_checkpoint(checkpoint_path, offset, line_number, file_id)
+                        last_checkpoint = time.monotonic()
+                    continue
+                
+                # EOF or a partially written line: leave it for the next read
+                file.seek(offset)
+                if not follow:
+                    break
                 
-                except json.JSONDecodeError as e:
-                    self.failed_count += 1
-                    self.failed_records.append({
-                        'line_number': line_number,
-                        'content': line,
-                        'error': str(e)
-                    })
-                    print(f"Warning: Failed to parse JSON at line {line_number}: {str(e)}")
+                try:
+                    path_stat = os.stat(self.log_file_path)
+                except FileNotFoundError:
+                    # Rotated away and not recreated yet
+                    time.sleep(poll_interval)
+                    continue
                 
-                except Exception as e:
-                    self.failed_count += 1
-                    self.failed_records.append({
-                        'line_number': line_number,
-                        'content': line,
-                        'error': f"Unexpected error: {str(e)}"
-                    })
-                    print(f"Warning: Unexpected error at line {line_number}: {str(e)}")
+                if [path_stat.st_dev, path_stat.st_ino] != file_id:
+                    print(f"Log file rotated after line {line_number}; reopening")
+                    self.flush_pending()
+                    file.close()
+                    file = open(self.log_file_path, 'rb')
+                    file_stat = os.fstat(file.fileno())
+                    file_id = [file_stat.st_dev, file_stat.st_ino]
+                    offset = 0
+                    line_number = 0
+                elif path_stat.st_size < offset:
+                    print(f"Log file truncated after line {line_number}; restarting from the beginning")
+                    self.flush_pending()
+                    file.seek(0)
+                    offset = 0
+                    line_number = 0
+                else:
+                    time.sleep(poll_interval)
+        
+        except KeyboardInterrupt:
+            print("\nStopping follow mode...")
+        
+        finally:
+            self.save_checkpoint(checkpoint_path, offset, line_number, file_id)
+            file.close()
+            if self.verbose:
+                self.progress.report(self.progress_stats(), final=True)
     
     def save_results(self):
         """
-        Save the extracted schemas and failed records to files.
+        Save the extracted schemas and summary report.
+        Failed records have already been streamed to the JSONL spill file.
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = self.run_timestamp
+        
+        # Save unique schemas, converting and writing one entry at a time
+        schema_file = write_json_table(
+            os.path.join(self.output_dir, f"unique_schemas_{timestamp}"),
+            self.add_sample_estimates(self.iter_output_schemas(self.schemas.items())),
+            self.output_format, self.compress_output, key_field='schema_id')
+        
+        self.sync_registry()
+        
+        # Save the per-path sketch summaries next to the schema report
+        if self.field_stats is not None:
+            self.field_stats_file = write_json_document(
+                os.path.join(self.output_dir, f"field_stats_{timestamp}"),
+                self.field_stats.summary(), self.output_format, self.compress_output)
+        
+        # Save one union schema per merge group, folding each group as it is written
+        if self.merge_field:
+            self.merged_schema_file = write_json_table(
+                os.path.join(self.output_dir, f"merged_schemas_{timestamp}"),
+                self.iter_output_schemas(self.iter_merged_schemas()),
+                self.output_format, self.compress_output, key_field='group_id')
         
-        # Save unique schemas
-        schema_file = os.path.join(self.output_dir, f"unique_schemas_{timestamp}.json")
-        with open(schema_file, 'w', encoding='utf-8') as f:
-            json.dump(self.schemas, f, indent=2, ensure_ascii=False)
+        # Failed records, if any, are in the spill file; a compressed run
+        # replaces it with a gzip copy
+        self.close_failed_spill()
+        failed_file = self.failed_spill_target() if os.path.exists(self.failed_spill_target()) else None
         
-        # Save failed records if any
-        if self.failed_records:
-            failed_file = os.path.join(self.output_dir, f"failed_records_{timestamp}.json")
-            with open(failed_file, 'w', encoding='utf-8') as f:
-                json.dump(self.failed_records, f, indent=2, ensure_ascii=False)
+        # Send or write the last partial Elasticsearch batch
+        self.close_exporter()
+        self.publish_parquet()
         
         # Save summary report
         self.save_summary_report(timestamp)
+        self.write_metrics()
         
-        return schema_file, failed_file if self.failed_records else None
+        return schema_file, failed_file
     
     def save_summary_report(self, timestamp: str):
         """
@@ -215,32 +1906,85 @@ class SchemaExtractor:
         with open(report_file, 'w', encoding='utf-8') as f:
             f.write("APISIX Log Processing Report\n")
             f.write("=" * 50 + "\n\n")
-            f.write(f"Input file: {self.log_file_path}\n")
+            if self.source_names is not None:
+                f.write(f"Input files: {len(self.source_names)} under {self.log_file_path}\n")
+            else:
+                f.write(f"Input file: {self.log_file_path}\n")
             f.write(f"Processing time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
             
             f.write("PROCESSING STATISTICS:\n")
             f.write("-" * 30 + "\n")
             f.write(f"Total records processed successfully: {self.processed_count}\n")
             f.write(f"Total records failed to process: {self.failed_count}\n")
-            f.write(f"Total unique schemas found: {len(self.schemas)}\n\n")
-            
+            if self.recovered_concatenated or self.recovered_split:
+                f.write(f"Records recovered from damaged lines: "
+                        f"{self.recovered_concatenated + self.recovered_split} "
+                        f"({self.recovered_concatenated} from concatenated lines, "
+                        f"{self.recovered_split} rejoined from split lines)\n")
+            f.write(f"Total unique schemas found: {len(self.schemas)}\n")
+            if self.merge_field:
+                f.write(f"Merge groups ({self.merge_field}): {len(self.groups)}\n")
+            if self.es_stats:
+                f.write(f"Elasticsearch docs exported: {self.es_stats['docs']} in "
+                        f"{self.es_stats['batches']} batches ({self.es_stats['failed_docs']} failed)\n")
+            if self.parquet_export:
+                f.write(f"Parquet rows written: {self.parquet_row_count()} "
+                        f"in {len(self.parquet_files)} files\n")
+            f.write("\n")
+
+            if self.sampler is not None:
+                sampling = self.sampling_summary()
+                f.write("SAMPLING (estimated):\n")
+                f.write("-" * 30 + "\n")
+                settings = ", ".join(f"{key} {value}" for key, value in self.sample_settings.items())
+                f.write(f"Method: {sampling['method']} ({settings})\n")
+                f.write(f"Lines sampled: {sampling['sampled_lines']}\n")
+                if sampling['method'] == 'every':
+                    f.write(f"Total lines: {sampling['total_lines']}\n")
+                else:
+                    f.write(f"Estimated total lines: {sampling['estimated_total_lines']} "
+                            f"(CI {format_interval(sampling['estimated_total_lines_ci'])})\n")
+                    f.write("Positions below are byte offsets of the sampled lines\n")
+                f.write(f"Estimated failed records: {sampling['estimated_failed']} "
+                        f"(CI {format_interval(sampling['estimated_failed_ci'])})\n")
+                f.write(f"Confidence level: {sampling['confidence']:.0%}\n")
+                f.write(f"Schemas with frequency >= {sampling['rare_threshold']:.4%} are detected "
+                        f"with probability {sampling['rare_detection_probability']:.2%}\n")
+                f.write("\n")
+
+            if self.field_stats is not None:
+                f.write("FIELD STATISTICS (estimated):\n")
+                f.write("-" * 30 + "\n")
+                for path, stats in self.field_stats.summary()['paths'].items():
+                    line = f"{path}: present {stats['presence_rate']:.2%}, null {stats['null_rate']:.2%}"
+                    if 'distinct_estimate' in stats:
+                        line += f", ~{stats['distinct_estimate']} distinct"
+                    if 'numeric' in stats:
+                        line += f", p50 {stats['numeric']['p50']:.6g}, p99 {stats['numeric']['p99']:.6g}"
+                    f.write(line + "\n")
+                f.write("\n")
+
             if self.schemas:
                 f.write("SCHEMA SUMMARY:\n")
                 f.write("-" * 30 + "\n")
-                for schema_id, schema_info in self.schemas.items():
+                for schema_id, schema_info in self.add_sample_estimates(self.schemas.items()):
                     f.write(f"{schema_id}:\n")
                     f.write(f"  - Occurrences: {schema_info['count']}\n")
-                    f.write(f"  - First seen at line: {schema_info['first_seen']}\n")
-                    f.write(f"  - Sample lines: {schema_info['sample_lines'][:5]}\n")
+                    if 'estimated_count' in schema_info:
+                        f.write(f"  - Estimated occurrences: {schema_info['estimated_count']} "
+                                f"(CI {format_interval(schema_info['estimated_count_ci'])})\n")
+                    f.write(f"  - First seen at line: {self.format_line(schema_info['first_seen'])}\n")
+                    f.write(f"  - Sample lines: "
+                            f"{[self.format_line(line) for line in schema_info['sample_lines'][:5]]}\n")
                     f.write("\n")
             
-            if self.failed_records:
+            if self.failed_count:
                 f.write("FAILED RECORDS SUMMARY:\n")
                 f.write("-" * 30 + "\n")
-                for i, failed in enumerate(self.failed_records[:10], 1):
+                for i, failed in enumerate(self.failed_preview, 1):
                     f.write(f"{i}. Line {failed['line_number']}: {failed['error']}\n")
-                if len(self.failed_records) > 10:
-                    f.write(f"... and {len(self.failed_records) - 10} more failed records\n")
+                if self.failed_count > len(self.failed_preview):
+                    f.write(f"... and {self.failed_count - len(self.failed_preview)} more failed records\n")
     
     def print_summary(self):
         """
@@ -251,51 +1995,569 @@ class SchemaExtractor:
         print("=" * 60)
         print(f"Successfully processed: {self.processed_count} records")
         print(f"Failed to process: {self.failed_count} records")
+        if self.recovered_concatenated or self.recovered_split:
+            print(f"Recovered from damaged lines: {self.recovered_concatenated + self.recovered_split} records "
+                  f"({self.recovered_concatenated} concatenated, {self.recovered_split} rejoined)")
         print(f"Unique schemas found: {len(self.schemas)}")
+        if self.merge_field:
+            print(f"Merge groups ({self.merge_field}): {len(self.groups)}")
+        if self.es_stats:
+            print(f"Elasticsearch export: {self.es_stats['docs']} docs in {self.es_stats['batches']} "
+                  f"batches, {self.es_stats['failed_docs']} failed, {self.es_stats['retries']} retries")
+        if self.parquet_export:
+            print(f"Parquet output: {self.parquet_row_count()} rows in {len(self.parquet_files)} files")
+        if self.sampler is not None:
+            sampling = self.sampling_summary()
+            total = sampling.get('total_lines', sampling.get('estimated_total_lines'))
+            print(f"Sampled {sampling['sampled_lines']} of {'~' if sampling['method'] == 'seek' else ''}"
+                  f"{total} lines ({sampling['method']}); schemas at {sampling['rare_threshold']:.4%} "
+                  f"frequency detected with probability {sampling['rare_detection_probability']:.2%}")
         
         if self.schemas:
             print("\nSCHEMA BREAKDOWN:")
             print("-" * 30)
-            for schema_id, schema_info in self.schemas.items():
-                print(f"{schema_id}: {schema_info['count']} occurrences")
+            for schema_id, schema_info in self.add_sample_estimates(self.schemas.items()):
+                if 'estimated_count' in schema_info:
+                    print(f"{schema_id}: {schema_info['count']} sampled, ~{schema_info['estimated_count']} "
+                          f"estimated ({self.sampler.confidence:.0%} CI "
+                          f"{format_interval(schema_info['estimated_count_ci'])})")
+                else:
+                    print(f"{schema_id}: {schema_info['count']} occurrences")
         
-        success_rate = (self.processed_count / (self.processed_count + self.failed_count)) * 100
+        total = self.processed_count + self.failed_count
+        success_rate = (self.processed_count / total) * 100 if total else 0.0
         print(f"\nSuccess rate: {success_rate:.2f}%")
 
 
+def format_interval(interval: List[int]) -> str:
+    """A confidence interval as "low-high"; an unbounded high end is shown as "?"."""
+    low, high = interval
+    return f"{low}-{'?' if high is None else high}"
+
+
+def compute_shard_ranges(file_path: str, shards: int, start: int = 0) -> List[Tuple[int, int]]:
+    """
+    Split a file, from byte `start` (a line start) on, into up to `shards` byte
+    ranges whose boundaries fall just after a newline.
+    """
+    file_size = os.path.getsize(file_path)
+    if file_size <= start:
+        return []
+    
+    boundaries = [start]
+    with open(file_path, 'rb') as file:
+        for i in range(1, shards):
+            target = start + (file_size - start) * i // shards
+            if target <= boundaries[-1]:
+                continue
+            # Move forward to the start of the next line
+            file.seek(target - 1)
+            file.readline()
+            boundary = file.tell()
+            if boundary >= file_size:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    boundaries.append(file_size)
+    
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def count_lines(file_path: str, start: int, end: int) -> int:
+    """
+    Count newline characters in [start, end) of a file, reading in 1 MB blocks.
+    """
+    count = 0
+    remaining = end - start
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        while remaining > 0:
+            block = file.read(min(1 << 20, remaining))
+            if not block:
+                break
+            count += block.count(b'\n')
+            remaining -= len(block)
+    return count
+
+
+def create_shard_extractor(log_file_path: str, kwargs: Dict) -> 'SchemaExtractor':
+    """
+    Build the local, quiet extractor a worker uses for one shard, segment or file.
+    """
+    return SchemaExtractor(log_file_path, kwargs['output_dir'], verbose=False,
+                           decoder=kwargs['decoder'],
+                           max_sample_lines=kwargs['max_sample_lines'],
+                           failed_spill_path=kwargs['failed_spill_path'],
+                           merge_field=kwargs['merge_field'],
+                           es_export=kwargs['es_export'],
+                           parquet_export=kwargs['parquet_export'],
+                           field_stats=kwargs['field_stats'],
+                           source_names=kwargs.get('source_names'),
+                           output_format=kwargs.get('output_format', 'pretty'),
+                           rejoin_lines=kwargs.get('rejoin_lines', REJOIN_LINES))
+
+
+def collect_shard_result(extractor: 'SchemaExtractor') -> Dict:
+    """
+    Close a worker extractor's outputs and package its state for merge_shard_result.
+    """
+    extractor.close_failed_spill()
+    extractor.close_exporter()
+    extractor.finish_parquet_files()
+    return {
+        'processed_count': extractor.processed_count,
+        'recovered_concatenated': extractor.recovered_concatenated,
+        'recovered_split': extractor.recovered_split,
+        'head_lines': extractor.head_lines,
+        'head_closed': extractor.head_closed,
+        'pending_fragments': extractor.pending_fragments,
+        'schemas': extractor.schemas,
+        'groups': extractor.groups,
+        'stats': extractor.progress_stats(),
+        'failed_count': extractor.failed_count,
+        'failed_preview': extractor.failed_preview,
+        'failed_spill_path': extractor.failed_spill_path if extractor.failed_count else None,
+        'es_stats': extractor.es_stats,
+        'parquet_staged': extractor.parquet_staged,
+        'parquet_rows': extractor.parquet_writer.rows_written if extractor.parquet_writer else 0,
+        'field_stats': extractor.field_stats
+    }
+
+
+def process_shard(log_file_path: str, start: int, end: int, kwargs: Dict) -> Dict:
+    """
+    Worker entry point: extract schemas from one byte range with a local schema table.
+    Failed records are spilled to the shard's own part file. Records split across
+    the shard's boundaries are rejoined by the parent from head_lines and pending.
+    """
+    extractor = create_shard_extractor(log_file_path, kwargs)
+    lines = extractor.process_byte_range(start, end, kwargs['line_offset'], defer_head=True)
+    result = collect_shard_result(extractor)
+    result['lines'] = lines
+    return result
+
+
+def process_file(log_file_path: str, file_index: int, kwargs: Dict) -> Dict:
+    """
+    Worker entry point for one file of a multi-file run. Line numbers are line keys
+    carrying the file index, so samples stay exact when files are merged.
+    """
+    extractor = create_shard_extractor(log_file_path, kwargs)
+    line_offset = file_index << FILE_LINE_BITS
+    compression = detect_compression(log_file_path)
+    if compression:
+        with open_decompressed(log_file_path, compression) as stream:
+            lines = extractor.process_stream(stream, line_offset)
+    else:
+        lines = extractor.process_byte_range(0, os.path.getsize(log_file_path), line_offset)
+    # Records do not continue from one file into the next
+    extractor.flush_pending()
+    
+    result = collect_shard_result(extractor)
+    result['lines'] = lines
+    return result
+
+
+# Files this tool writes, by default next to the logs: skipped when expanding
+# directories and globs, so a rerun does not read its own checkpoints and reports
+OUTPUT_FILE_PATTERNS = ('*.checkpoint.json', '*.resume.json', '*.tmp', 'unique_schemas_*',
+                        'failed_records_*', 'merged_schemas_*', 'field_stats_*', 'processing_report_*')
+
+
+def is_output_file(name: str) -> bool:
+    """Whether a file name is one of this tool's outputs (OUTPUT_FILE_PATTERNS)."""
+    return any(fnmatch.fnmatch(name, pattern) for pattern in OUTPUT_FILE_PATTERNS)
+
+
+def convert_spill(source_path: str, target_path: str):
+    """
+    Replace a failed-record spill file with its gzip copy, or a gzip spill with its
+    plain copy, by the target file name.
+    """
+    if target_path.endswith(".gz"):
+        compress_file(source_path, target_path)
+    else:
+        with gzip.open(source_path, 'rb') as src, open(target_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+    os.remove(source_path)
+
+
+def expand_log_paths(inputs: List[str], include: str = "*") -> List[str]:
+    """
+    Expand log file arguments: globs (** allowed) and directories (searched
+    recursively for files matching `include`) become sorted file lists, without
+    the tool's own output files; duplicates are dropped, keeping the first occurrence.
+    """
+    paths = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            matches = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(entry)
+                for name in names
+                if fnmatch.fnmatch(name, include) and not is_output_file(name)
+            )
+        elif any(char in entry for char in '*?['):
+            matches = sorted(path for path in glob.glob(entry, recursive=True)
+                             if os.path.isfile(path) and not is_output_file(os.path.basename(path)))
+        else:
+            matches = [entry]
+        paths.extend(matches)
+    return list(dict.fromkeys(paths))
+
+
+def count_compressed_lines(file_path: str, compression: str, start: int, end: int) -> int:
+    """
+    Count newlines in a decompressed segment. Returns None if the segment does not
+    decode as a complete sequence of members/frames (a false member boundary).
+    """
+    count = 0
+    try:
+        with open_decompressed(file_path, compression, start, end) as stream:
+            while True:
+                block = stream.read(1 << 20)
+                if not block:
+                    break
+                count += block.count(b'\n')
+    except (OSError, EOFError, ValueError, zlib.error):
+        return None
+    except Exception as e:
+        # zstandard.ZstdError does not derive from the builtin error types
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            return None
+        raise
+    return count
+
+
+def process_compressed_shard(log_file_path: str, start: int, end: int, kwargs: Dict) -> Dict:
+    """
+    Worker entry point for one compressed segment. Lines wholly inside the segment are
+    processed here; the bytes up to the first newline (head) and after the last newline
+    (tail) are returned for the parent to stitch with neighbouring segments, and
+    lines after the head that fail on their own are deferred to it (defer_line).
+    """
+    extractor = create_shard_extractor(log_file_path, kwargs)
+    head = None
+    tail = b''
+    line_number = kwargs['line_offset'] + 1
+    defer_head = True
+    
+    with open_decompressed(log_file_path, kwargs['compression'], start, end) as stream:
+        first = stream.readline()
+        if first.endswith(b'\n'):
+            head = first
+            for raw_line in stream:
+                if not raw_line.endswith(b'\n'):
+                    tail = raw_line
+                    break
+                line_number += 1
+                if defer_head:
+                    defer_head = extractor.defer_line(raw_line, line_number)
+                    if defer_head:
+                        continue
+                extractor.process_line(raw_line, line_number)
+        else:
+            # No newline in the whole segment
+            tail = first
+    
+    result = collect_shard_result(extractor)
+    result['head'] = head
+    result['tail'] = tail
+    return result
+
+
+def raise_keyboard_interrupt(signum, frame):
+    """Signal handler that lets SIGTERM stop follow mode like Ctrl+C."""
+    raise KeyboardInterrupt
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Extract unique JSON schemas from APISIX log files"
     )
     parser.add_argument(
-        "log_file",
-        help="Path to the APISIX log file to process"
+        "log_files", nargs="+", metavar="log_file",
+        help="APISIX log files, globs or directories to process (plain, .gz, .bz2 or .zst); "
+             "several files produce one consolidated schema table"
+    )
+    parser.add_argument(
+        "--include", default="*.log*",
+        help="File name pattern used when searching directories (default: *.log*); the tool's own "
+             "checkpoints and output files are always skipped"
     )
     parser.add_argument(
         "-o", "--output-dir",
         help="Output directory for results (default: same as input file directory)"
     )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="Number of worker processes; a single file is split into newline-aligned shards, "
+             "several files are processed in parallel, largest first (default: 1)"
+    )
+    parser.add_argument(
+        "--decoder", choices=['auto', 'orjson', 'simdjson', 'json'], default='auto',
+        help="JSON decoder backend; 'auto' uses orjson or simdjson when installed (default: auto)"
+    )
+    parser.add_argument(
+        "--max-sample-lines", type=int, default=100,
+        help="Maximum sample line numbers kept per schema; 0 keeps all (default: 100)"
+    )
+    parser.add_argument(
+        "--merge", nargs="?", const="route_id", metavar="FIELD",
+        help="Also keep one union schema per value of a top-level FIELD, tracking optional "
+             "fields and type unions (default FIELD: route_id; e.g. service_id)"
+    )
+    parser.add_argument(
+        "--registry",
+        help="SQLite schema registry giving stable schema IDs and cumulative counts across runs"
+    )
+    parser.add_argument(
+        "--progress-interval", type=float, default=5.0,
+        help="Seconds between progress lines; also the window for rate-limiting warnings (default: 5)"
+    )
+    parser.add_argument(
+        "--progress-format", choices=['text', 'json'], default='text',
+        help="Progress line format: key=value text or JSON (default: text)"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Write Prometheus textfile-collector metrics here (updated at checkpoints and at the end)"
+    )
+    parser.add_argument(
+        "--profile", metavar="FILE",
+        help="Profile the run with cProfile and save the stats to FILE (main process only)"
+    )
+    parser.add_argument(
+        "--tracemalloc", action="store_true",
+        help="Trace memory allocations and print the top allocation sites (main process only)"
+    )
+    parser.add_argument(
+        "--es-export", metavar="DIR",
+        help="Write the parsed records as Elasticsearch _bulk NDJSON batch files to DIR, "
+             "with status_class, hour_of_day and day_of_week added"
+    )
+    parser.add_argument(
+        "--es-url",
+        help="Also POST the _bulk batches to this Elasticsearch endpoint, e.g. http://localhost:9200"
+    )
+    parser.add_argument(
+        "--es-index", default="apisix-logs",
+        help="Target index for the _bulk export (default: apisix-logs)"
+    )
+    parser.add_argument(
+        "--es-batch-mb", type=float, default=5.0,
+        help="Size of each _bulk batch in MB (default: 5)"
+    )
+    parser.add_argument(
+        "--es-max-in-flight", type=int, default=4,
+        help="Maximum concurrent _bulk requests per process; parsing blocks while "
+             "this many are pending (default: 4)"
+    )
+    parser.add_argument(
+        "--parquet", metavar="DIR",
+        help="Write the records, flattened by schema, as Parquet files partitioned by "
+             "schema_id and date under DIR (requires pyarrow)"
+    )
+    parser.add_argument(
+        "--parquet-batch-rows", type=int, default=65536,
+        help="Rows per Parquet row group (default: 65536)"
+    )
+    parser.add_argument(
+        "--parquet-compression", choices=['snappy', 'zstd', 'gzip', 'none'], default='snappy',
+        help="Parquet compression codec (default: snappy)"
+    )
+    parser.add_argument(
+        "--rejoin-lines", type=int, default=REJOIN_LINES,
+        help="Rejoin a JSON record split by a buffer flush over up to this many lines; "
+             "concatenated records on one line are always split apart. 1 disables rejoining "
+             "(default: 4)"
+    )
+    parser.add_argument(
+        "--output-format", choices=OUTPUT_FORMATS, default='pretty',
+        help="Layout of the schema, merged-schema and field-stats files: indented JSON, compact "
+             "JSON or JSON Lines with one schema per line; failed records are always JSON Lines, "
+             "compact unless pretty (default: pretty)"
+    )
+    parser.add_argument(
+        "--gzip-output", action="store_true",
+        help="Gzip the schema, merged-schema, field-stats and failed-record files (.gz); failed "
+             "records are compressed as they are written"
+    )
+    parser.add_argument(
+        "--field-stats", action="store_true",
+        help="Collect per-path statistics with fixed-memory sketches: null rate, distinct "
+             "counts (HyperLogLog), numeric quantiles (DDSketch) and top values (count-min)"
+    )
+    parser.add_argument(
+        "--field-stats-max-paths", type=int, default=1000,
+        help="Maximum field paths tracked by --field-stats (default: 1000)"
+    )
+    parser.add_argument(
+        "--field-stats-top-k", type=int, default=10,
+        help="Top values reported per path by --field-stats (default: 10)"
+    )
+    parser.add_argument(
+        "--sample", metavar="SPEC",
+        help="Survey a sample instead of every line: every:N (every Nth line) or seek:K "
+             "(K random byte offsets, plain files only); without N/K the sample is sized from "
+             "--rare-threshold. Schema counts are reported as estimates with confidence intervals, and "
+             "--registry counts are left unchanged (only last-seen times are updated)"
+    )
+    parser.add_argument(
+        "--sample-seed", type=int,
+        help="Random seed for seek sampling (default: random, reported in the summary)"
+    )
+    parser.add_argument(
+        "--rare-threshold", type=float, default=0.001,
+        help="Smallest schema frequency the sample must catch with --sample-confidence; "
+             "sample sizes are raised to match (default: 0.001)"
+    )
+    parser.add_argument(
+        "--sample-confidence", type=float, default=0.95,
+        help="Confidence level for sample intervals and rare-schema detection (default: 0.95)"
+    )
+    parser.add_argument(
+        "-f", "--follow", action="store_true",
+        help="Keep tailing the log file, handling rotation, until interrupted"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Checkpoint file for incremental runs; resumes from it if present "
+             "(default with --follow: <output-dir>/<log name>.checkpoint.json)"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Make a batch run crash-safe: checkpoint to <output-dir>/<log name>.resume.json every "
+             "--checkpoint-interval seconds and continue from that checkpoint if an earlier run "
+             "was interrupted; it is removed once the results are saved"
+    )
+    parser.add_argument(
+        "--checkpoint-interval", type=float, default=60.0,
+        help="Seconds between checkpoint saves in incremental and --resume runs (default: 60)"
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=1.0,
+        help="Seconds to wait for new data in follow mode (default: 1)"
+    )
     
     args = parser.parse_args()
     
+    log_files = expand_log_paths(args.log_files, args.include)
+    if not log_files:
+        parser.error("no log files matched " + " ".join(args.log_files))
+    log_file = log_files[0]
+    
+    # Several files: one consolidated run over the common directory, with
+    # samples and failures qualified by the file path relative to it
+    source_names = None
+    output_dir = args.output_dir
+    if len(log_files) > 1:
+        log_file = os.path.commonpath([os.path.abspath(path) for path in log_files])
+        source_names = [os.path.relpath(os.path.abspath(path), log_file) for path in log_files]
+        output_dir = output_dir or log_file
+    
+    if args.workers > 1 and (args.follow or args.checkpoint):
+        parser.error("--workers cannot be combined with --follow or --checkpoint")
+    if source_names and (args.follow or args.checkpoint):
+        parser.error("--follow and --checkpoint take a single log file")
+    if (args.follow or args.checkpoint) and os.path.exists(log_file) \
+            and detect_compression(log_file):
+        parser.error("--follow and --checkpoint require an uncompressed log file")
+    if args.resume and (args.follow or args.checkpoint or args.sample or source_names):
+        parser.error("--resume takes a single log file and cannot be combined with "
+                     "--follow, --checkpoint or --sample")
+    
+    sample = None
+    if args.sample:
+        if args.workers > 1 or args.follow or args.checkpoint or source_names:
+            parser.error("--sample takes a single log file and cannot be combined with "
+                         "--workers, --follow or --checkpoint")
+        if not 0 < args.rare_threshold < 1 or not 0 < args.sample_confidence < 1:
+            parser.error("--rare-threshold and --sample-confidence must be between 0 and 1")
+        try:
+            sample = parse_sample_spec(args.sample)
+        except ValueError as e:
+            parser.error(f"--sample: {e}")
+        sample.update(seed=args.sample_seed, rare_threshold=args.rare_threshold,
+                      confidence=args.sample_confidence)
+    
+    es_export = None
+    if args.es_export or args.es_url:
+        es_export = {
+            'index': args.es_index,
+            'output_dir': args.es_export,
+            'endpoint': args.es_url,
+            'batch_bytes': int(args.es_batch_mb * (1 << 20)),
+            'max_in_flight': args.es_max_in_flight
+        }
+    
+    parquet_export = None
+    if args.parquet:
+        parquet_export = {
+            'output_dir': args.parquet,
+            'batch_rows': args.parquet_batch_rows,
+            'compression': args.parquet_compression
+        }
+    
     try:
         # Create schema extractor
-        extractor = SchemaExtractor(args.log_file, args.output_dir)
+        extractor = SchemaExtractor(log_file, output_dir, decoder=args.decoder,
+                                    max_sample_lines=args.max_sample_lines,
+                                    merge_field=args.merge, registry_path=args.registry,
+                                    progress_interval=args.progress_interval,
+                                    progress_format=args.progress_format,
+                                    metrics_file=args.metrics_file,
+                                    es_export=es_export, parquet_export=parquet_export,
+                                    field_stats={'max_paths': args.field_stats_max_paths,
+                                                 'top_k': args.field_stats_top_k}
+                                    if args.field_stats else None,
+                                    source_names=source_names, sample=sample,
+                                    output_format=args.output_format,
+                                    compress_output=args.gzip_output,
+                                    rejoin_lines=args.rejoin_lines)
         
         # Process the log file
-        extractor.process_log_file()
+        with profiling(args.profile, args.tracemalloc):
+            if args.follow or args.checkpoint:
+                checkpoint_path = args.checkpoint or os.path.join(
+                    extractor.output_dir, os.path.basename(log_file) + ".checkpoint.json")
+                signal.signal(signal.SIGTERM, raise_keyboard_interrupt)
+                extractor.process_incremental(checkpoint_path, follow=args.follow,
+                                              checkpoint_interval=args.checkpoint_interval,
+                                              poll_interval=args.poll_interval)
+            elif sample:
+                extractor.process_sampled()
+            elif source_names:
+                extractor.process_log_files(log_files, workers=args.workers)
+            else:
+                resume_path = os.path.join(extractor.output_dir, os.path.basename(log_file) + ".resume.json") \
+                    if args.resume else None
+                extractor.process_log_file(workers=args.workers, resume_path=resume_path,
+                                           checkpoint_interval=args.checkpoint_interval)
         
         # Save results
         schema_file, failed_file = extractor.save_results()
         
+        # The run is complete, so a later --resume must start over
+        if extractor.checkpoint_path and os.path.exists(extractor.checkpoint_path):
+            os.remove(extractor.checkpoint_path)
+        
         # Print summary
         extractor.print_summary()
         
         print(f"\nOutput files:")
         print(f"- Unique schemas: {schema_file}")
+        if extractor.merged_schema_file:
+            print(f"- Merged schemas: {extractor.merged_schema_file}")
+        if extractor.field_stats_file:
+            print(f"- Field statistics: {extractor.field_stats_file}")
         if failed_file:
             print(f"- Failed records: {failed_file}")
-        
+        if args.es_export:
+            print(f"- Elasticsearch bulk files: {args.es_export}")
+        if args.parquet:
+            print(f"- Parquet partitions: {args.parquet}")
+
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Line Recovery
+
+Helpers for recovering APISIX log records damaged by gateway buffer flushes,
+which can write two JSON objects on one line or split one object across lines.
+split_json_objects cuts a line into consecutive objects with
+JSONDecoder.raw_decode and tells whether what is left is the cut-off start of
+another object, which the extractor then tries to rejoin with the next lines.
+"""
+
+import json
+import re
+from typing import Any, List, Tuple
+
+
+# Default and byte limit for rejoining a record split over several lines
+REJOIN_LINES = 4
+REJOIN_MAX_BYTES = 1 << 20
+
+# Lines kept back at the start of a worker shard until one parses on its own;
+# they may continue a record split across the shard boundary
+HEAD_DEFER_LINES = 1024
+
+# JSON literals a truncated value may end with a prefix of
+JSON_LITERALS = ('true', 'false', 'null')
+
+# What the parser leaves of a number cut off before its digits: "-", "12." or "1e-"
+NUMBER_TAIL = re.compile(r'-|\.|[eE][-+]?')
+
+WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+_decoder = json.JSONDecoder()
+
+
+def is_truncated(text: str, error: json.JSONDecodeError) -> bool:
+    """
+    True if a parse error means the document was cut off rather than malformed:
+    the parser ran out of input, inside a string, a literal or a number.
+    """
+    if error.pos >= len(text) or error.msg.startswith('Unterminated string'):
+        return True
+    rest = text[error.pos:]
+    return any(literal.startswith(rest) for literal in JSON_LITERALS) or NUMBER_TAIL.fullmatch(rest) is not None
+
+
+def split_json_objects(data: bytes) -> Tuple[List[Any], bytes, bool]:
+    """
+    Parse data as consecutive JSON objects. Returns the objects decoded, the
+    remaining bytes from the first one that could not be decoded (b'' when all
+    of data was consumed) and whether that remainder is the truncated start of
+    an object. Only objects are taken, as every log record is one.
+    """
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return [], data, False
+
+    objects = []
+    position = WHITESPACE.match(text).end()
+    while position < len(text):
+        if text[position] != '{':
+            return objects, text[position:].encode('utf-8'), False
+        try:
+            obj, end = _decoder.raw_decode(text, position)
+        except json.JSONDecodeError as e:
+            return objects, text[position:].encode('utf-8'), is_truncated(text, e)
+        objects.append(obj)
+        position = WHITESPACE.match(text, end).end()
+    return objects, b'', False
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Log Sampling
+
+Sampling designs and estimators for quick schema surveys of large APISIX logs:
+every-Nth line (systematic) or random byte-offset seeks, where each seek takes
+the line containing the offset. Estimated counts per schema come with
+confidence intervals, and the sample size is chosen so that any schema at or
+above a rare-schema frequency threshold is seen with the requested confidence.
+"""
+
+import math
+import random
+from collections import defaultdict
+from statistics import NormalDist
+from typing import BinaryIO, Dict, List, Any, Tuple
+
+
+# Sample outcome keys for lines that are not records of a schema
+SAMPLE_FAILED = "<failed>"
+SAMPLE_EMPTY = "<empty>"
+
+# Bytes read backwards per step when looking for the start of a sampled line
+LINE_START_BLOCK = 4096
+
+# Bytes read from the start of a file to estimate its mean line length
+LINE_LENGTH_PROBE = 1 << 20
+
+
+def parse_sample_spec(spec: str) -> Dict[str, Any]:
+    """
+    Parse a --sample value: "every:N" (every Nth line), "seek:K" (K random
+    byte-offset seeks), or "every"/"seek" to size the sample from the
+    rare-schema threshold.
+    """
+    method, _, size = spec.partition(':')
+    if method not in ('every', 'seek'):
+        raise ValueError(f"unknown sampling method {method!r} (use every:N or seek:K)")
+    if not size:
+        return {'method': method, 'size': None}
+    if not size.isdigit() or int(size) < 1:
+        raise ValueError(f"sample size must be a positive integer, got {size!r}")
+    return {'method': method, 'size': int(size)}
+
+
+def required_sample_size(threshold: float, confidence: float) -> int:
+    """
+    Draws needed so that a schema with frequency >= threshold appears at least
+    once with probability >= confidence: 1 - (1 - threshold)^n >= confidence.
+    """
+    if threshold >= 1:
+        return 1
+    return max(1, math.ceil(math.log(1 - confidence) / math.log(1 - threshold)))
+
+
+def detection_probability(frequency: float, draws: int) -> float:
+    """Probability that a schema with this frequency appears in a sample of `draws` lines."""
+    return 1 - (1 - frequency) ** draws
+
+
+def wilson_interval(successes: int, trials: int, z: float) -> Tuple[float, float]:
+    """Wilson score interval for a binomial proportion."""
+    if not trials:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def estimate_line_count(file_path: str, file_size: int) -> int:
+    """Rough line count of a plain file from the mean line length of its first megabyte."""
+    with open(file_path, 'rb') as f:
+        probe = f.read(LINE_LENGTH_PROBE)
+    if not probe:
+        return 0
+    if len(probe) == file_size:
+        return probe.count(b"\n") + (not probe.endswith(b"\n"))
+    return max(1, round(file_size * max(1, probe.count(b"\n")) / len(probe)))
+
+
+def random_offsets(file_size: int, draws: int, seed: int = None) -> List[int]:
+    """`draws` uniform byte offsets (with replacement), sorted so the seeks move forward."""
+    rng = random.Random(seed)
+    return sorted(rng.randrange(file_size) for _ in range(draws))
+
+
+def find_line_start(file: BinaryIO, offset: int) -> int:
+    """Start of the line containing byte `offset`, found by reading backwards to the previous newline."""
+    position = offset
+    while position > 0:
+        read_start = max(0, position - LINE_START_BLOCK)
+        file.seek(read_start)
+        newline = file.read(position - read_start).rfind(b"\n")
+        if newline >= 0:
+            return read_start + newline + 1
+        position = read_start
+    return 0
+
+
+class SampleEstimator:
+    """
+    Turns per-line sample outcomes into population estimates.
+
+    every: each sampled line stands for N lines; counts are scaled to the exact
+    line total and intervals are Wilson intervals on the sampled proportion.
+
+    seek: a random byte offset selects the line containing it, so a line is
+    drawn with probability len(line) / file size. Each draw is weighted by the
+    inverse of that probability (Hansen-Hurwitz), which keeps the estimates
+    unbiased regardless of line length; intervals use the normal approximation.
+    """
+
+    def __init__(self, method: str, confidence: float = 0.95, rare_threshold: float = 0.001):
+        self.method = method
+        self.confidence = confidence
+        self.rare_threshold = rare_threshold
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+        self.draws = 0
+        # Per outcome key (schema ID, SAMPLE_FAILED or SAMPLE_EMPTY): sum and sum of squares of the weights
+        self.weights: Dict[str, float] = defaultdict(float)
+        self.squares: Dict[str, float] = defaultdict(float)
+        self.total_weight = 0.0
+        self.total_squares = 0.0
+        # every: exact number of lines in the input, set once the pass is complete
+        self.total_lines = None
+
+    def add(self, key: str, weight: float = 1.0):
+        """Record one draw with its outcome key and inverse selection probability."""
+        self.draws += 1
+        self.weights[key] += weight
+        self.squares[key] += weight * weight
+        self.total_weight += weight
+        self.total_squares += weight * weight
+
+    def interval(self, weight_sum: float, square_sum: float) -> Tuple[float, float, float]:
+        """(estimate, low, high) of a population total from the draws' weight sums."""
+        if not self.draws:
+            return 0.0, 0.0, 0.0
+
+        if self.method == 'every':
+            total = self.total_lines if self.total_lines is not None else self.draws
+            low, high = wilson_interval(round(weight_sum), self.draws, self.z)
+            return total * weight_sum / self.draws, total * low, total * high
+
+        estimate = weight_sum / self.draws
+        if self.draws < 2:
+            return estimate, 0.0, math.inf
+        variance = max(0.0, (square_sum / self.draws - estimate * estimate) * self.draws / (self.draws - 1))
+        margin = self.z * math.sqrt(variance / self.draws)
+        return estimate, max(0.0, estimate - margin), estimate + margin
+
+    def estimate(self, key: str) -> Dict[str, Any]:
+        """Estimated population count of one outcome, with its confidence interval."""
+        estimate, low, high = self.interval(self.weights.get(key, 0.0), self.squares.get(key, 0.0))
+        return {'estimated_count': round(estimate),
+                'estimated_count_ci': [math.floor(low), math.ceil(high) if math.isfinite(high) else None]}
+
+    def summary(self) -> Dict[str, Any]:
+        """Sample size, estimated line total and the rare-schema detection guarantee."""
+        if self.method == 'every':
+            total = {'total_lines': self.total_lines}
+        else:
+            estimate, low, high = self.interval(self.total_weight, self.total_squares)
+            total = {'estimated_total_lines': round(estimate),
+                     'estimated_total_lines_ci': [math.floor(low),
+                                                  math.ceil(high) if math.isfinite(high) else None]}
+        return dict({
+            'method': self.method,
+            'sampled_lines': self.draws,
+            'confidence': self.confidence,
+            'rare_threshold': self.rare_threshold,
+            'rare_detection_probability': round(detection_probability(self.rare_threshold, self.draws), 6)
+        }, **total)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Parquet Partition Export
+
+Optional columnar output stage for the APISIX schema extractor: flattens each
+parsed record by its schema into one column per leaf path and writes batched
+Arrow record batches to Parquet files partitioned as
+schema_id=<id>/date=<YYYY-MM-DD>/, readable by Spark with partition pruning.
+Requires pyarrow.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Tuple
+
+from schema_nodes import SchemaNode
+
+# pyarrow is optional; only the Parquet stage needs it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# Partition value used by Hive/Spark for records without a usable start_time
+DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Arrow type per schema leaf type; anything else (arrays, unknown) is stored as JSON text
+ARROW_TYPE_NAMES = {
+    'integer': 'int64',
+    'number': 'float64',
+    'boolean': 'bool',
+    'string': 'string',
+    'null': 'string'
+}
+
+
+def flatten_columns(shape: SchemaNode, prefix: Tuple[str, ...] = ()) -> List[Tuple[Tuple[str, ...], str]]:
+    """
+    Leaf columns of a schema shape as (key path, schema type) pairs. Objects are
+    flattened into their fields; arrays stay one column.
+    """
+    if shape.type == 'object':
+        columns = []
+        for key, child in shape.properties():
+            columns.extend(flatten_columns(child, prefix + (key,)))
+        return columns
+    return [(prefix, shape.type)]
+
+
+def json_text_values(values: List[Any]) -> List[str]:
+    """Buffered column values as JSON text; nulls stay null and text is kept as is."""
+    return [value if value is None or isinstance(value, str) else json.dumps(value) for value in values]
+
+
+def partition_date(record: Dict) -> str:
+    """UTC date of a record's start_time (epoch millis), for the date= partition."""
+    start_time = record.get('start_time')
+    if isinstance(start_time, (int, float)) and not isinstance(start_time, bool):
+        try:
+            return datetime.fromtimestamp(start_time / 1000, timezone.utc).strftime('%Y-%m-%d')
+        except (OverflowError, OSError, ValueError):
+            pass
+    return DEFAULT_PARTITION
+
+
+class ParquetPartitionWriter:
+    """
+    Buffers flattened rows per (schema fingerprint, date) and writes them as row
+    groups of batch_rows rows. Files are staged under the fingerprint, since worker
+    shards do not know the final schema IDs; publish_partitions moves them into
+    schema_id=<id>/date=<date>/ once the IDs are assigned.
+    """
+
+    def __init__(self, output_dir: str, file_prefix: str = "part", batch_rows: int = 65536,
+                 compression: str = 'snappy'):
+        if pa is None:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+
+        self.output_dir = output_dir
+        self.staging_dir = os.path.join(output_dir, "_staging")
+        self.file_prefix = file_prefix
+        self.batch_rows = batch_rows
+        self.compression = compression
+
+        # Per fingerprint: leaf key paths, and the Arrow schema with dotted column names
+        self.column_paths: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+        self.arrow_schemas: Dict[str, Any] = {}
+
+        # Per (fingerprint, date): column-wise row buffers and the open ParquetWriter
+        self.buffers: Dict[Tuple[str, str], List[List]] = {}
+        self.writers: Dict[Tuple[str, str], Any] = {}
+        self.file_number = 0
+        self.rows_written = 0
+
+        # Finished files not yet published: (fingerprint, date, staged path)
+        self.staged_files: List[Tuple[str, str, str]] = []
+
+    def add(self, record: Dict, shape: SchemaNode, fingerprint: str):
+        """Flatten one record by its schema shape and buffer it."""
+        paths = self.column_paths.get(fingerprint)
+        if paths is None:
+            paths = self.register_schema(shape, fingerprint)
+        if not paths:
+            return  # an empty object has no columns to store
+
+        key = (fingerprint, partition_date(record))
+        columns = self.buffers.get(key)
+        if columns is None:
+            columns = self.buffers[key] = [[] for _ in paths]
+
+        for column, (path, leaf_type) in zip(columns, paths):
+            value = record
+            for name in path:
+                value = value[name]
+            if leaf_type not in ARROW_TYPE_NAMES and value is not None:
+                value = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+            column.append(value)
+
+        if len(columns[0]) >= self.batch_rows:
+            self.flush_partition(key)
+
+    def register_schema(self, shape: SchemaNode, fingerprint: str) -> List[Tuple[Tuple[str, ...], str]]:
+        """Compute and cache the column layout of a newly seen schema."""
+        paths = flatten_columns(shape) if shape.type == 'object' else []
+        self.column_paths[fingerprint] = paths
+        self.arrow_schemas[fingerprint] = pa.schema([
+            ('.'.join(path), getattr(pa, ARROW_TYPE_NAMES.get(leaf_type, 'string'))())
+            for path, leaf_type in paths
+        ])
+        return paths
+
+    def flush_partition(self, key: Tuple[str, str]):
+        """Write one partition's buffered rows as a record batch (row group)."""
+        columns = self.buffers.pop(key, None)
+        if not columns:
+            return
+
+        fingerprint, date = key
+        arrays = []
+        for index, values in enumerate(columns):
+            field = self.arrow_schemas[fingerprint].field(index)
+            try:
+                arrays.append(pa.array(values, type=field.type))
+            except (OverflowError, pa.ArrowInvalid, pa.ArrowTypeError):
+                # A valid JSON integer outside the int64 range
+                self.widen_column(fingerprint, index)
+                arrays.append(pa.array(json_text_values(values), type=pa.string()))
+        schema = self.arrow_schemas[fingerprint]
+        batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+        writer = self.writers.get(key)
+        if writer is None:
+            self.file_number += 1
+            staged_dir = os.path.join(self.staging_dir, fingerprint, date)
+            os.makedirs(staged_dir, exist_ok=True)
+            staged_path = os.path.join(staged_dir, f"{self.file_prefix}-{self.file_number:05d}.parquet")
+            writer = pq.ParquetWriter(staged_path, schema, compression=self.compression)
+            self.writers[key] = writer
+            self.staged_files.append((fingerprint, date, staged_path))
+
+        writer.write_batch(batch)
+        self.rows_written += batch.num_rows
+
+    def widen_column(self, fingerprint: str, index: int):
+        """
+        Store an integer column of a schema as JSON text from now on, like non-scalar
+        leaves, including the rows already buffered for its other dates. Files already
+        open with the int64 column are closed, so the rows that follow go to new files
+        with the string column.
+        """
+        paths = self.column_paths[fingerprint]
+        path, _ = paths[index]
+        # add() reads this list, so later values are buffered as JSON text
+        paths[index] = (path, 'json')
+        # Rows buffered for the schema's other dates hold the integers as they are
+        for key, columns in self.buffers.items():
+            if key[0] == fingerprint:
+                columns[index] = json_text_values(columns[index])
+        schema = self.arrow_schemas[fingerprint]
+        self.arrow_schemas[fingerprint] = schema.set(index, pa.field(schema.field(index).name, pa.string()))
+
+        for key in [key for key in self.writers if key[0] == fingerprint]:
+            self.writers.pop(key).close()
+
+    def flush(self) -> List[Tuple[str, str, str]]:
+        """
+        Write all buffered rows, close every open file and return the finished
+        staged files (which are then no longer tracked here).
+        """
+        for key in list(self.buffers):
+            self.flush_partition(key)
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+        staged_files = self.staged_files
+        self.staged_files = []
+        return staged_files
+
+
+def publish_partitions(output_dir: str, staged_files: List[Tuple[str, str, str]],
+                       schema_ids: Dict[str, str]) -> List[str]:
+    """
+    Move finished staged files into output_dir/schema_id=<id>/date=<date>/,
+    mapping fingerprints to schema IDs, and return the published paths.
+    """
+    published = []
+    for fingerprint, date, staged_path in staged_files:
+        target_dir = os.path.join(output_dir, f"schema_id={schema_ids[fingerprint]}", f"date={date}")
+        os.makedirs(target_dir, exist_ok=True)
+        target_path = os.path.join(target_dir, os.path.basename(staged_path))
+        os.replace(staged_path, target_path)
+        published.append(target_path)
+
+    # Drop the staging tree once nothing is left in it
+    staging_dir = os.path.join(output_dir, "_staging")
+    if os.path.isdir(staging_dir) and not any(files for _, _, files in os.walk(staging_dir)):
+        shutil.rmtree(staging_dir)
+    return published
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Log Pipeline Benchmark Suite
+
+This script benchmarks SchemaExtractor and SchemaDiffAnalyzer end to end on a
+synthetic (or supplied) APISIX log, reporting records/sec, peak RSS and time
+per phase (extraction, saving, diffing) for each processing mode, and can
+compare against a previous run to catch throughput regressions.
+"""
+
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Any
+import argparse
+
+from apisix_log_generator import APISIXLogGenerator
+
+
+DEFAULT_MODES = ['serial', 'workers:4', 'merge', 'decoder:json']
+
+
+def parse_mode(mode: str) -> Dict[str, Any]:
+    """
+    Turn a mode spec such as 'workers:4+decoder:json' into extractor options.
+    Supported parts: serial, workers:N, merge[:FIELD], decoder:NAME, samples:N.
+    """
+    options = {'workers': 1, 'extractor': {}}
+    for part in mode.split('+'):
+        key, _, value = part.partition(':')
+        if key == 'serial':
+            continue
+        elif key == 'workers':
+            options['workers'] = int(value)
+        elif key == 'merge':
+            options['extractor']['merge_field'] = value or 'route_id'
+        elif key == 'decoder':
+            options['extractor']['decoder'] = value
+        elif key == 'samples':
+            options['extractor']['max_sample_lines'] = int(value)
+        else:
+            raise ValueError(f"Unknown benchmark mode part: {part}")
+    return options
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its (worker) children, in MB."""
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is reported in KB on Linux
+    return max(self_rss, children_rss) / 1024
+
+
+def run_one(mode: str, log_file: str, output_dir: str) -> Dict[str, Any]:
+    """Run every pipeline phase once in this process and return the measurements."""
+    from jsonparsor import SchemaExtractor
+    from schemadiffertiater import SchemaDiffAnalyzer
+
+    options = parse_mode(mode)
+    phases = {}
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        extractor = SchemaExtractor(log_file, output_dir, verbose=False, **options['extractor'])
+
+        start = time.perf_counter()
+        extractor.process_log_file(workers=options['workers'])
+        phases['extract'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        schema_file, _ = extractor.save_results()
+        phases['save'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analyzer = SchemaDiffAnalyzer(schema_file, output_dir)
+        analyzer.load_schemas()
+        analyzer.analyze_all_schemas()
+        analyzer.generate_detailed_report()
+        analyzer.generate_json_report()
+        phases['diff'] = time.perf_counter() - start
+
+    return {
+        'mode': mode,
+        'records': extractor.processed_count,
+        'failed': extractor.failed_count,
+        'schemas': len(extractor.schemas),
+        'records_per_sec': extractor.processed_count / phases['extract'] if phases['extract'] else 0.0,
+        'phases': phases,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_isolated(mode: str, log_file: str) -> Dict[str, Any]:
+    """Run one mode in a fresh interpreter so peak RSS is measured per mode."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-one', mode, log_file, output_dir],
+            capture_output=True, text=True, check=True
+        )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare_results(results: List[Dict], previous_file: str, max_regression: float) -> bool:
+    """Print throughput changes against a previous run; return False on a regression."""
+    with open(previous_file, 'r', encoding='utf-8') as f:
+        previous = {entry['mode']: entry for entry in json.load(f)['results']}
+
+    ok = True
+    print(f"\nComparison with {previous_file}:")
+    for result in results:
+        before = previous.get(result['mode'])
+        if not before or not before['records_per_sec']:
+            print(f"  {result['mode']}: no previous measurement")
+            continue
+        change = result['records_per_sec'] / before['records_per_sec'] - 1
+        flag = ""
+        if change < -max_regression:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"  {result['mode']}: {change:+.1%} records/sec{flag}")
+    return ok
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--run-one':
+        print(json.dumps(run_one(sys.argv[2], sys.argv[3], sys.argv[4])))
+        return 0
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark the APISIX log pipeline (extract, save, diff) across modes"
+    )
+    parser.add_argument(
+        "log_file", nargs="?",
+        help="Log file to benchmark (default: generate a synthetic one)"
+    )
+    parser.add_argument(
+        "--modes", nargs="+", default=DEFAULT_MODES,
+        help="Modes to run, e.g. serial workers:4 merge decoder:json workers:4+merge "
+             f"(default: {' '.join(DEFAULT_MODES)})"
+    )
+    parser.add_argument(
+        "-n", "--lines", type=int, default=200000,
+        help="Lines in the generated log (default: 200000)"
+    )
+    parser.add_argument(
+        "--variety", type=int, default=50,
+        help="Schema variants in the generated log (default: 50)"
+    )
+    parser.add_argument(
+        "--malformed-rate", type=float, default=0.001,
+        help="Malformed line rate in the generated log (default: 0.001)"
+    )
+    parser.add_argument(
+        "--nesting-depth", type=int, default=0,
+        help="Extra nesting depth in the generated log (default: 0)"
+    )
+    parser.add_argument(
+        "--json-out",
+        help="Write the results as JSON (for later --compare)"
+    )
+    parser.add_argument(
+        "--compare",
+        help="Previous --json-out file to compare records/sec against"
+    )
+    parser.add_argument(
+        "--max-regression", type=float, default=0.10,
+        help="Allowed records/sec drop before --compare fails (default: 0.10)"
+    )
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        log_file = args.log_file
+        if not log_file:
+            log_file = os.path.join(work_dir, "apisix_bench.log")
+            generator = APISIXLogGenerator(args.variety, args.malformed_rate, args.nesting_depth)
+            start = time.perf_counter()
+            stats = generator.write(log_file, lines=args.lines)
+            print(f"Generated {stats['lines']} lines ({stats['bytes'] / (1 << 20):.1f} MB) "
+                  f"in {time.perf_counter() - start:.1f}s")
+
+        results = []
+        print(f"\n{'mode':<24} {'rec/s':>10} {'extract s':>10} {'save s':>8} {'diff s':>8} {'peak MB':>9} {'schemas':>8}")
+        print("-" * 82)
+        for mode in args.modes:
+            result = run_isolated(mode, log_file)
+            results.append(result)
+            phases = result['phases']
+            print(f"{mode:<24} {result['records_per_sec']:>10,.0f} {phases['extract']:>10.2f} "
+                  f"{phases['save']:>8.2f} {phases['diff']:>8.2f} {result['peak_rss_mb']:>9.1f} "
+                  f"{result['schemas']:>8}")
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump({'log_file': args.log_file, 'lines': args.lines, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+
+    if args.compare and not compare_results(results, args.compare, args.max_regression):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Log Pipeline Metrics
+
+Rate-limited structured progress reporting, opt-in cProfile/tracemalloc hooks
+and Prometheus textfile export for the APISIX schema extractor.
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from typing import Dict, Iterator
+
+
+class ProgressReporter:
+    """
+    Prints throughput at most once per `interval` seconds and caps per-line
+    warnings to `max_warnings` per interval, so a burst of malformed lines
+    cannot flood the console and slow the run down.
+    """
+
+    def __init__(self, interval: float = 5.0, output_format: str = 'text', max_warnings: int = 10):
+        self.interval = interval
+        self.output_format = output_format
+        self.max_warnings = max_warnings
+        self.start_time = time.monotonic()
+        self.last_report_time = self.start_time
+        self.last_lines = 0
+        self.last_bytes = 0
+        self.warning_window_start = self.start_time
+        self.warnings_in_window = 0
+        self.suppressed_warnings = 0
+
+    def maybe_report(self, stats: Dict[str, float]):
+        """Report if at least `interval` seconds have passed since the last report."""
+        if time.monotonic() - self.last_report_time >= self.interval:
+            self.report(stats)
+
+    def report(self, stats: Dict[str, float], final: bool = False):
+        """Print one structured progress line with rates since the previous report."""
+        now = time.monotonic()
+        elapsed = now - self.last_report_time if not final else now - self.start_time
+        lines = stats['lines_read'] - (self.last_lines if not final else 0)
+        read_bytes = stats['bytes_read'] - (self.last_bytes if not final else 0)
+        busy = stats['parse_seconds'] + stats['schema_seconds']
+
+        entry = {
+            'event': 'summary' if final else 'progress',
+            'elapsed_s': round(now - self.start_time, 1),
+            'lines': stats['lines_read'],
+            'records': stats['processed_count'],
+            'failed': stats['failed_count'],
+            'schemas': stats['unique_schemas'],
+            'lines_per_s': round(lines / elapsed) if elapsed > 0 else 0,
+            'mb_per_s': round(read_bytes / elapsed / (1 << 20), 2) if elapsed > 0 else 0.0,
+            'parse_pct': round(100 * stats['parse_seconds'] / busy, 1) if busy else 0.0,
+            'schema_pct': round(100 * stats['schema_seconds'] / busy, 1) if busy else 0.0
+        }
+        self.flush_suppressed()
+
+        if self.output_format == 'json':
+            print(json.dumps(entry))
+        else:
+            print(f"[{entry['event']}] " + " ".join(f"{key}={value}" for key, value in entry.items()
+                                                      if key != 'event'))
+
+        self.last_report_time = now
+        self.last_lines = stats['lines_read']
+        self.last_bytes = stats['bytes_read']
+
+    def allow_warning(self) -> bool:
+        """Return True if another per-line warning may be printed in this interval."""
+        now = time.monotonic()
+        if now - self.warning_window_start >= self.interval:
+            self.flush_suppressed()
+            self.warning_window_start = now
+            self.warnings_in_window = 0
+
+        if self.warnings_in_window < self.max_warnings:
+            self.warnings_in_window += 1
+            return True
+        self.suppressed_warnings += 1
+        return False
+
+    def flush_suppressed(self):
+        """Print how many warnings were suppressed since the last flush."""
+        if self.suppressed_warnings:
+            print(f"Warning: {self.suppressed_warnings} more failed lines not shown "
+                  f"(limit {self.max_warnings} per {self.interval:g}s)")
+            self.suppressed_warnings = 0
+
+
+def escape_label_value(value: str) -> str:
+    """Escape a Prometheus label value (backslash, double quote, newline)."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_prometheus_textfile(path: str, metrics: Dict[str, float], labels: Dict[str, str] = None,
+                              prefix: str = "apisix_schema_extractor"):
+    """
+    Write metrics in the Prometheus text exposition format for the node_exporter
+    textfile collector. The file is replaced atomically so scrapes never see a partial write.
+    """
+    label_text = ""
+    if labels:
+        label_text = "{" + ",".join(f'{key}="{escape_label_value(value)}"'
+                                    for key, value in labels.items()) + "}"
+
+    lines = []
+    for name, value in metrics.items():
+        metric_type = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+        lines.append(f"{prefix}_{name}{label_text} {value}")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+@contextlib.contextmanager
+def profiling(profile_path: str = None, trace_memory: bool = False, top: int = 20) -> Iterator[None]:
+    """
+    Optionally run the enclosed block under cProfile (stats dumped to profile_path
+    and the top functions printed) and/or tracemalloc (top allocation sites printed).
+    Only the current process is profiled, not --workers children.
+    """
+    profiler = cProfile.Profile() if profile_path else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"\nProfile written to {profile_path}; top {top} by cumulative time:")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"\nTraced memory peak: {peak / (1 << 20):.1f} MB; top {top} allocation sites:")
+            for stat in snapshot.statistics('lineno')[:top]:
+                print(f"  {stat}")
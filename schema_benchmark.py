@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Schema Extractor Benchmark
+
+This script measures SchemaExtractor throughput (records/sec) as the number
+of distinct schemas grows, comparing the fingerprint index against the
+legacy linear scan over schemas_equal, and compares the available JSON
+decoder backends on the per-line hot path.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List, Any
+import argparse
+
+from jsonparsor import SchemaExtractor, available_decoder_backends
+
+
+def make_record(variant: int) -> Dict[str, Any]:
+    """Build an APISIX-like record whose header set encodes the variant number."""
+    headers = {
+        "host": "api.example.com",
+        "accept": "*/*",
+        "user-agent": "curl/8.0"
+    }
+    # Each bit of the variant toggles an optional header, giving a distinct schema
+    bit = 0
+    while variant >> bit:
+        if (variant >> bit) & 1:
+            headers[f"x-custom-{bit}"] = "1"
+        bit += 1
+
+    return {
+        "client_ip": "10.0.0.1",
+        "route_id": "r1",
+        "start_time": 1700000000000,
+        "latency": 12.5,
+        "request": {"method": "GET", "uri": "/v1/items", "size": 120, "headers": headers},
+        "response": {"status": 200, "size": 512, "headers": {"content-type": "application/json"}},
+        "server": {"hostname": "gw-1", "version": "3.9.0"}
+    }
+
+
+def legacy_add_schema(extractor: SchemaExtractor, schema: Dict, record_line: int) -> str:
+    """The original O(schemas) linear-scan add_schema, kept for comparison."""
+    for existing_id, existing_schema in extractor.schemas.items():
+        if extractor.schemas_equal(schema, existing_schema['schema']):
+            existing_schema['count'] += 1
+            existing_schema['sample_lines'].append(record_line)
+            return existing_id
+
+    schema_id = f"schema_{len(extractor.schemas) + 1}"
+    extractor.schemas[schema_id] = {
+        'schema': schema,
+        'count': 1,
+        'sample_lines': [record_line],
+        'first_seen': record_line
+    }
+    return schema_id
+
+
+def run_add_schema(distinct: int, records: int, legacy: bool, seed: int = 42) -> float:
+    """Feed `records` records drawn from `distinct` schemas and return records/sec."""
+    rng = random.Random(seed)
+    templates = [make_record(v) for v in range(distinct)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        extractor = SchemaExtractor(os.path.join(tmp_dir, "bench.log"), tmp_dir)
+
+        # Pre-seed so every variant exists and we measure steady-state lookups
+        for i, record in enumerate(templates, 1):
+            extractor.add_schema(extractor.get_json_schema(record), i)
+        if legacy:
+            extractor.fingerprint_index.clear()
+
+        start = time.perf_counter()
+        for line_number in range(1, records + 1):
+            record = templates[rng.randrange(distinct)]
+            if legacy:
+                legacy_add_schema(extractor, extractor.get_json_schema(record), line_number)
+            else:
+                extractor.add_schema_shape(extractor.get_schema_shape(record), line_number)
+        elapsed = time.perf_counter() - start
+
+    return records / elapsed if elapsed > 0 else float('inf')
+
+
+def run_decoder(decoder: str, records: int, distinct: int = 20, seed: int = 42) -> float:
+    """Run process_line over pre-encoded log lines with one decoder backend and return records/sec."""
+    rng = random.Random(seed)
+    templates = [(json.dumps(make_record(v)) + "\n").encode('utf-8') for v in range(distinct)]
+    lines = [templates[rng.randrange(distinct)] for _ in range(records)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        extractor = SchemaExtractor(os.path.join(tmp_dir, "bench.log"), tmp_dir,
+                                    verbose=False, decoder=decoder)
+
+        start = time.perf_counter()
+        for line_number, raw_line in enumerate(lines, 1):
+            extractor.process_line(raw_line, line_number)
+        elapsed = time.perf_counter() - start
+
+    return records / elapsed if elapsed > 0 else float('inf')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark SchemaExtractor throughput as distinct schemas grow"
+    )
+    parser.add_argument(
+        "--distinct", type=int, nargs="+", default=[1, 10, 100, 500],
+        help="Numbers of distinct schemas to benchmark (default: 1 10 100 500)"
+    )
+    parser.add_argument(
+        "--records", type=int, default=5000,
+        help="Records fed per measurement (default: 5000)"
+    )
+    parser.add_argument(
+        "--skip-legacy", action="store_true",
+        help="Skip the legacy linear-scan measurement"
+    )
+    parser.add_argument(
+        "--decoders", nargs="+", default=None,
+        help="Decoder backends to compare (default: all installed)"
+    )
+
+    args = parser.parse_args()
+
+    print(f"{'schemas':>8} {'indexed rec/s':>15} {'linear rec/s':>15} {'speedup':>9}")
+    print("-" * 50)
+    for distinct in args.distinct:
+        indexed = run_add_schema(distinct, args.records, legacy=False)
+        if args.skip_legacy:
+            print(f"{distinct:>8} {indexed:>15,.0f} {'-':>15} {'-':>9}")
+            continue
+        linear = run_add_schema(distinct, args.records, legacy=True)
+        print(f"{distinct:>8} {indexed:>15,.0f} {linear:>15,.0f} {indexed / linear:>8.1f}x")
+
+    decoders = args.decoders or available_decoder_backends()
+    print(f"\n{'decoder':>8} {'rec/s':>15} {'vs json':>9}")
+    print("-" * 34)
+    results = {decoder: run_decoder(decoder, args.records) for decoder in decoders}
+    baseline = results.get('json') or run_decoder('json', args.records)
+    for decoder, rate in results.items():
+        print(f"{decoder:>8} {rate:>15,.0f} {rate / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Schema Distance
+
+All-pairs Jaccard distances between the field path sets of schemas, and
+clustering of schemas into families. Each path set is encoded as a bitset (a
+Python int with one bit per distinct path across all schemas), so the
+intersection and union of a pair are single word-parallel operations followed
+by a bit count. Rows of the matrix can be spread across worker processes.
+The path-distance medoid used as a diff baseline needs no pairs at all.
+"""
+
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+# Row blocks per worker, so workers that get the long rows at the top of the
+# triangle do not hold up the others
+BLOCKS_PER_WORKER = 4
+
+
+def encode_path_sets(path_sets: Iterable[Iterable[str]]) -> Tuple[List[int], List[str]]:
+    """
+    Encode path sets as bitsets. Paths get bits in first-seen order; returns
+    the bitsets and the path of each bit.
+    """
+    bits = {}
+    bitsets = []
+    for paths in path_sets:
+        bitset = 0
+        for path in paths:
+            bit = bits.get(path)
+            if bit is None:
+                bit = bits[path] = len(bits)
+            bitset |= 1 << bit
+        bitsets.append(bitset)
+    return bitsets, list(bits)
+
+
+def distance_rows(bitsets: Sequence[int], start: int, stop: int) -> List[array]:
+    """
+    Rows start..stop-1 of the condensed distance matrix: row i holds the Jaccard
+    distances from schema i to schemas i+1..n-1. Two empty path sets are identical.
+    Distances are float64 and computed with a single division, so one that equals
+    a threshold such as 0.2 exactly compares equal to it.
+    """
+    rows = []
+    for i in range(start, stop):
+        a = bitsets[i]
+        rows.append(array('d', [((a ^ b).bit_count() / union) if (union := (a | b).bit_count()) else 0.0
+                                for b in bitsets[i + 1:]]))
+    return rows
+
+
+def row_blocks(n: int, blocks: int) -> List[Tuple[int, int]]:
+    """Split rows 0..n-1 of the condensed matrix into ranges holding about the same number of pairs."""
+    total = n * (n - 1) // 2
+    target = total / blocks
+    ranges = []
+    start = 0
+    pairs = 0
+    for i in range(n):
+        pairs += n - 1 - i
+        if pairs >= target * (len(ranges) + 1) or i == n - 1:
+            ranges.append((start, i + 1))
+            start = i + 1
+    return ranges
+
+
+def jaccard_distance_matrix(bitsets: Sequence[int], workers: int = 1) -> List[array]:
+    """
+    The condensed all-pairs Jaccard distance matrix (see distance_rows), as float64
+    rows, so thousands of schemas fit in well under 100 MB. With workers > 1, blocks
+    of rows are computed in separate processes.
+    """
+    if workers <= 1 or len(bitsets) < 2:
+        return distance_rows(bitsets, 0, len(bitsets))
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(distance_rows, bitsets, start, stop)
+                   for start, stop in row_blocks(len(bitsets), workers * BLOCKS_PER_WORKER)]
+        for future in futures:
+            rows.extend(future.result())
+    return rows
+
+
+def pair_distance(matrix: List[array], i: int, j: int) -> float:
+    """Distance between schemas i and j in a condensed matrix."""
+    if i == j:
+        return 0.0
+    if i > j:
+        i, j = j, i
+    return matrix[i][j - i - 1]
+
+
+def cluster_by_threshold(matrix: List[array], threshold: float) -> List[List[int]]:
+    """
+    Single-linkage families: schemas are in the same cluster when a chain of
+    schemas joins them with every step at most threshold apart. Clusters are
+    listed by their first member, members in index order.
+    """
+    n = len(matrix)
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, row in enumerate(matrix):
+        for offset in [k for k, distance in enumerate(row) if distance <= threshold]:
+            root_i, root_j = find(i), find(i + 1 + offset)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
+
+
+def find_medoid(matrix: List[array], members: Sequence[int], weights: Sequence[int] = None) -> Tuple[int, float]:
+    """
+    The member with the smallest total distance to the other members, ties going
+    to the larger weight (e.g. record count), then to the earlier member.
+    Returns (medoid, its mean distance to the other members).
+    """
+    members = sorted(members)
+    totals = [0.0] * len(members)
+    for k, i in enumerate(members):
+        row = matrix[i]
+        for m in range(k + 1, len(members)):
+            distance = row[members[m] - i - 1]
+            totals[k] += distance
+            totals[m] += distance
+
+    best = min(range(len(members)), key=lambda k: (totals[k], -(weights[members[k]] if weights else 0), k))
+    mean = totals[best] / (len(members) - 1) if len(members) > 1 else 0.0
+    return members[best], mean
+
+
+def find_path_medoid(path_sets: Sequence[Iterable[str]], weights: Sequence[int] = None) -> Tuple[int, int]:
+    """
+    The path set with the smallest total path distance (size of the symmetric
+    difference) to all the others, without comparing pairs: over n sets where
+    path p occurs in f(p) of them, the total for set A is
+    sum(f) + sum over p in A of (n - 2 f(p)). Ties go to the larger weight, then
+    to the earlier set. Returns (index, total distance).
+    """
+    path_sets = [set(paths) for paths in path_sets]
+    frequency = Counter(path for paths in path_sets for path in paths)
+    n = len(path_sets)
+    base = sum(frequency.values())
+    totals = [base + sum(n - 2 * frequency[path] for path in paths) for paths in path_sets]
+    best = min(range(n), key=lambda i: (totals[i], -(weights[i] if weights else 0), i))
+    return best, totals[best]
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Schema Nodes
+
+Compact internal representation of extracted JSON schemas for the APISIX
+schema extractor: immutable, hashable slotted nodes with interned field
+names. Equality ignores property order, like schemas_equal, and the JSON
+layout with 'path' on every node is only built when results are written.
+"""
+
+import sys
+from typing import Dict, Any, Iterable, Tuple
+
+
+class SchemaNode:
+    """
+    One node of a schema tree. Objects keep their property names (interned,
+    in first-seen order) and child nodes as parallel tuples; their required
+    list is the property names. Arrays keep the node of their first item.
+    Nodes are immutable, so subtrees are freely shared between schemas.
+    """
+
+    __slots__ = ('type', 'names', 'children', 'items', 'value_type', '_hash')
+
+    def __init__(self, node_type: str, names: Iterable[str] = (), children: Iterable['SchemaNode'] = (),
+                 items: 'SchemaNode' = None, value_type: str = None):
+        names = tuple(map(sys.intern, names))
+        children = tuple(children)
+        init = object.__setattr__
+        init(self, 'type', sys.intern(node_type))
+        init(self, 'names', names)
+        init(self, 'children', children)
+        init(self, 'items', items)
+        init(self, 'value_type', value_type)
+        # Property order does not affect equality, so the hash must not depend on it either
+        init(self, '_hash', hash((node_type, frozenset(zip(names, children)) if names else None,
+                                  items, value_type)))
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("SchemaNode is immutable")
+
+    def __delattr__(self, name: str):
+        raise AttributeError("SchemaNode is immutable")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, SchemaNode):
+            return NotImplemented
+        if (self._hash != other._hash or self.type != other.type or self.items != other.items
+                or self.value_type != other.value_type or len(self.names) != len(other.names)):
+            return False
+        if self.names == other.names:
+            return self.children == other.children
+        return dict(zip(self.names, self.children)) == dict(zip(other.names, other.children))
+
+    def __reduce__(self) -> Tuple:
+        return SchemaNode, (self.type, self.names, self.children, self.items, self.value_type)
+
+    def __repr__(self) -> str:
+        if self.names:
+            return f"SchemaNode({self.type!r}, {list(self.names)!r})"
+        if self.items is not None:
+            return f"SchemaNode({self.type!r}, items={self.items!r})"
+        return f"SchemaNode({self.type!r})"
+
+    def properties(self) -> Iterable[Tuple[str, 'SchemaNode']]:
+        """(name, child) pairs of an object node, in first-seen order."""
+        return zip(self.names, self.children)
+
+    def to_json(self, path: str = "root") -> Dict:
+        """
+        The output schema layout: a fresh dict tree with 'path' on every node.
+        Arrays only seen empty get an unknown item type without a path.
+        """
+        schema = {"type": self.type}
+        if self.type == 'object':
+            schema['properties'] = {name: child.to_json(f"{path}.{name}")
+                                    for name, child in self.properties()}
+            schema['required'] = list(self.names)
+        elif self.items is not None:
+            if self.items.type == 'unknown' and self.items.value_type is None:
+                schema['items'] = {"type": "unknown"}
+            else:
+                schema['items'] = self.items.to_json(f"{path}[0]")
+        if self.value_type is not None:
+            schema['value_type'] = self.value_type
+        schema['path'] = path
+        return schema
+
+    def canonical(self) -> Dict:
+        """
+        The order-independent, path-less form used for fingerprints (the same as
+        normalize_schema_for_comparison of the JSON layout).
+        """
+        schema = {"type": self.type}
+        if self.type == 'object':
+            schema['properties'] = {name: child.canonical()
+                                    for name, child in sorted(self.properties(), key=lambda item: item[0])}
+            schema['required'] = sorted(self.names)
+        elif self.items is not None:
+            schema['items'] = self.items.canonical()
+        if self.value_type is not None:
+            schema['value_type'] = self.value_type
+        return schema
+
+    @classmethod
+    def from_json(cls, schema: Dict) -> 'SchemaNode':
+        """Rebuild a node tree from the JSON layout (with or without paths), e.g. from a checkpoint."""
+        if schema.get('type') == 'object':
+            properties = schema.get('properties', {})
+            return cls('object', properties, [cls.from_json(child) for child in properties.values()])
+        if schema.get('type') == 'array':
+            return cls('array', items=cls.from_json(schema.get('items', {"type": "unknown"})))
+        return cls(schema.get('type', 'unknown'), value_type=schema.get('value_type'))
+
+
+# Shared nodes for JSON leaf values, keyed by exact Python type
+LEAF_NODES = {
+    type(None): SchemaNode('null'),
+    bool: SchemaNode('boolean'),
+    int: SchemaNode('integer'),
+    float: SchemaNode('number'),
+    str: SchemaNode('string')
+}
+UNKNOWN_NODE = SchemaNode('unknown')
+EMPTY_ARRAY_NODE = SchemaNode('array', items=UNKNOWN_NODE)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Persistent Schema Registry
+
+SQLite-backed store of every schema the extractor has seen, keyed by schema
+fingerprint, so schema IDs stay stable across runs and counts accumulate.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from typing import Dict, List, Any
+import argparse
+from datetime import datetime
+
+
+# First bytes of every SQLite 3 database file
+SQLITE_MAGIC = b'SQLite format 3\x00'
+
+
+def is_registry_file(path: str) -> bool:
+    """Return True if the path is an SQLite database (a schema registry)."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+class SchemaRegistry:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS schemas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fingerprint TEXT NOT NULL UNIQUE,
+                schema_json TEXT NOT NULL,
+                total_count INTEGER NOT NULL DEFAULT 0,
+                first_seen_at TEXT NOT NULL,
+                last_seen_at TEXT NOT NULL,
+                first_seen_source TEXT,
+                first_seen_line INTEGER
+            )
+        """)
+        self.connection.commit()
+
+        # In-memory cache of fingerprint -> schema_id; a run only touches
+        # the database for schemas it has never seen
+        self.cache: Dict[str, str] = {
+            fingerprint: self.format_id(row_id)
+            for row_id, fingerprint in self.connection.execute("SELECT id, fingerprint FROM schemas")
+        }
+
+    @staticmethod
+    def format_id(row_id: int) -> str:
+        """Registry row IDs map to the extractor's schema_N naming."""
+        return f"schema_{row_id}"
+
+    def get_or_create(self, fingerprint: str, schema: Dict, source: str = None, line: int = None) -> str:
+        """
+        Return the stable schema_id for a fingerprint, inserting the schema if it is new.
+        Inserts are committed by flush_counts.
+        """
+        schema_id = self.cache.get(fingerprint)
+        if schema_id is not None:
+            return schema_id
+
+        now = datetime.now().isoformat()
+        cursor = self.connection.execute(
+            "INSERT INTO schemas (fingerprint, schema_json, first_seen_at, last_seen_at, "
+            "first_seen_source, first_seen_line) VALUES (?, ?, ?, ?, ?, ?)",
+            (fingerprint, json.dumps(schema, ensure_ascii=False), now, now, source, line)
+        )
+        schema_id = self.format_id(cursor.lastrowid)
+        self.cache[fingerprint] = schema_id
+        return schema_id
+
+    def flush_counts(self, count_deltas: Dict[str, int], add_counts: bool = True):
+        """
+        Add per-fingerprint record counts from a run and commit, including pending inserts.
+        With add_counts False (sampled runs) only last_seen_at of the schemas seen is updated.
+        """
+        now = datetime.now().isoformat()
+        self.connection.executemany(
+            "UPDATE schemas SET total_count = total_count + ?, last_seen_at = ? WHERE fingerprint = ?",
+            [(delta if add_counts else 0, now, fingerprint) for fingerprint, delta in count_deltas.items() if delta]
+        )
+        self.connection.commit()
+
+    def load_schemas(self) -> Dict[str, Dict]:
+        """
+        Load every registered schema in the unique_schemas file layout, with
+        cumulative counts. Sample lines are not kept across runs.
+        """
+        schemas = {}
+        rows = self.connection.execute(
+            "SELECT id, fingerprint, schema_json, total_count, first_seen_line, "
+            "first_seen_source, first_seen_at, last_seen_at FROM schemas ORDER BY id"
+        )
+        for row_id, fingerprint, schema_json, total_count, first_line, source, first_at, last_at in rows:
+            schemas[self.format_id(row_id)] = {
+                'schema': json.loads(schema_json),
+                'count': total_count,
+                'sample_lines': [],
+                'first_seen': first_line,
+                'fingerprint': fingerprint,
+                'first_seen_source': source,
+                'first_seen_at': first_at,
+                'last_seen_at': last_at
+            }
+        return schemas
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="List the schemas stored in a schema registry"
+    )
+    parser.add_argument(
+        "registry",
+        help="Path to the SQLite schema registry"
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.registry):
+        print(f"Error: Registry not found: {args.registry}")
+        sys.exit(1)
+
+    registry = SchemaRegistry(args.registry)
+    schemas = registry.load_schemas()
+    registry.close()
+
+    print(f"{'schema_id':<14} {'count':>12}  {'first seen':<20} {'last seen':<20}")
+    print("-" * 70)
+    for schema_id, info in schemas.items():
+        print(f"{schema_id:<14} {info['count']:>12}  {info['first_seen_at'][:19]:<20} {info['last_seen_at'][:19]:<20}")
+    print(f"\nTotal schemas: {len(schemas)}")
+
+
+if __name__ == "__main__":
+    main()
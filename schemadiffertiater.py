@@ -3,9 +3,13 @@
 Schema Difference Analyzer
 
 This script analyzes the differences between captured JSON schemas,
-comparing each schema against the first (baseline) schema.
+comparing each schema against a baseline schema: the first one, the most
+frequent one, the medoid or a given schema ID. In all-pairs mode
+it also measures the distance between every pair of schemas and groups them
+into families, each represented by its medoid.
 """
 
+import hashlib
 import json
 import os
 import sys
@@ -13,84 +17,169 @@ from typing import Dict, List, Set, Any, Tuple
 import argparse
 from datetime import datetime
 
+from diff_cache import DiffCache
+from json_output import iter_json_table
+from schema_distance import (cluster_by_threshold, encode_path_sets, find_medoid, find_path_medoid,
+                             jaccard_distance_matrix, pair_distance)
+from schema_registry import SchemaRegistry, is_registry_file
+
+
+# Sample line numbers kept per schema when loading (0 keeps all)
+MAX_SAMPLE_LINES = 100
+
+# Baseline choices besides an explicit schema ID: the first schema seen, the
+# schema with the most records, or the one with the smallest total path distance
+BASELINE_STRATEGIES = ('first', 'most-frequent', 'medoid')
+
+# Jaccard distance at or below which two schemas belong to the same family
+CLUSTER_THRESHOLD = 0.2
+
 
 class SchemaDiffAnalyzer:
-    def __init__(self, schema_file_path: str, output_dir: str = None):
+    def __init__(self, schema_file_path: str, output_dir: str = None, baseline: str = 'first',
+                 diff_cache_path: str = None, max_sample_lines: int = MAX_SAMPLE_LINES):
         self.schema_file_path = schema_file_path
         self.output_dir = output_dir or os.path.dirname(schema_file_path)
+        # One of BASELINE_STRATEGIES or a schema ID
+        self.baseline = baseline
+        # Loaded schema entries keep their counters and capped sample_lines, not the
+        # schema tree, which is flattened into path_indexes (see add_schema)
         self.schemas = {}
-        self.baseline_schema = None
+        self.max_sample_lines = max_sample_lines
         self.baseline_schema_id = None
         self.differences = {}
+        # Flattened path -> (type, required) per schema ID (see get_path_index)
+        self.path_indexes = {}
+        # Comparison results reused across runs, by (baseline, schema) path index digest
+        self.diff_cache = DiffCache(diff_cache_path) if diff_cache_path else None
+        self.diff_keys = {}
+        # All-pairs mode: condensed distance matrix over distance_ids, and the families
+        self.distance_ids = []
+        self.distance_matrix = None
+        self.clusters = []
+        self.cluster_threshold = None
         
         # Create output directory if it doesn't exist
         os.makedirs(self.output_dir, exist_ok=True)
     
     def load_schemas(self):
-        """Load schemas from the input file."""
+        """
+        Load schemas from the input file or a schema registry database. Files are
+        streamed one schema entry at a time (iter_json_table), so only the path
+        indexes and counters of all schemas are held, never the whole file.
+        """
         print(f"Loading schemas from: {self.schema_file_path}")
         
         if not os.path.exists(self.schema_file_path):
             raise FileNotFoundError(f"Schema file not found: {self.schema_file_path}")
         
-        with open(self.schema_file_path, 'r', encoding='utf-8') as f:
-            self.schemas = json.load(f)
+        if is_registry_file(self.schema_file_path):
+            registry = SchemaRegistry(self.schema_file_path)
+            entries = registry.load_schemas().items()
+            registry.close()
+        else:
+            # Any extractor output layout: pretty or compact JSON, or JSON Lines, optionally gzipped
+            entries = iter_json_table(self.schema_file_path)
+        
+        for schema_id, schema_info in entries:
+            self.add_schema(schema_id, schema_info)
         
         if not self.schemas:
             raise ValueError("No schemas found in the input file")
         
-        # Set the first schema as baseline
-        self.baseline_schema_id = list(self.schemas.keys())[0]
-        self.baseline_schema = self.schemas[self.baseline_schema_id]['schema']
+        self.baseline_schema_id = self.select_baseline()
         
         print(f"Loaded {len(self.schemas)} schemas")
-        print(f"Using '{self.baseline_schema_id}' as baseline schema")
+        print(f"Using '{self.baseline_schema_id}' as baseline schema ({self.baseline_description()})")
+    
+    def add_schema(self, schema_id: str, schema_info: Dict):
+        """
+        Keep a loaded schema entry: its schema tree is flattened into the path index
+        and dropped, and sample_lines are cut to max_sample_lines.
+        """
+        schema = schema_info.pop('schema')
+        self.path_indexes[schema_id] = self.build_path_index(schema)
+        sample_lines = schema_info.get('sample_lines')
+        if self.max_sample_lines and sample_lines and len(sample_lines) > self.max_sample_lines:
+            schema_info['sample_lines'] = sample_lines[:self.max_sample_lines]
+        self.schemas[schema_id] = schema_info
+    
+    def select_baseline(self) -> str:
+        """
+        Pick the baseline schema ID by the baseline strategy. The medoid is the schema
+        with the smallest total path distance (missing plus additional fields) to all
+        the others, which keeps the diff reports as small as possible; it is found
+        from path frequencies, without comparing pairs of schemas.
+        """
+        schema_ids = list(self.schemas)
+        if self.baseline == 'first':
+            return schema_ids[0]
+        if self.baseline == 'most-frequent':
+            # max keeps the first of equally frequent schemas
+            return max(schema_ids, key=lambda schema_id: self.schemas[schema_id]['count'])
+        if self.baseline == 'medoid':
+            medoid, _ = find_path_medoid([self.get_path_index(schema_id).keys() for schema_id in schema_ids],
+                                         [self.schemas[schema_id]['count'] for schema_id in schema_ids])
+            return schema_ids[medoid]
+        if self.baseline not in self.schemas:
+            raise ValueError(f"Baseline schema not found: {self.baseline} "
+                             f"(use a schema ID or one of {', '.join(BASELINE_STRATEGIES)})")
+        return self.baseline
     
-    def get_all_paths(self, schema: Dict, parent_path: str = "") -> Set[str]:
-        """Extract all field paths from a schema."""
-        paths = set()
+    def baseline_description(self) -> str:
+        """How the baseline was chosen, for reports."""
+        return 'given schema ID' if self.baseline not in BASELINE_STRATEGIES else self.baseline
+    
+    def build_path_index(self, schema: Dict, parent_path: str = "",
+                         index: Dict[str, Tuple[str, bool]] = None) -> Dict[str, Tuple[str, bool]]:
+        """
+        Flatten a schema in one walk into field path -> (type, required).
+        Fields of array items are listed under "<array path>[]".
+        """
+        if index is None:
+            index = {}
         
         if isinstance(schema, dict):
             if schema.get('type') == 'object' and 'properties' in schema:
+                required = set(schema.get('required', []))
                 for prop_name, prop_schema in schema['properties'].items():
                     current_path = f"{parent_path}.{prop_name}" if parent_path else prop_name
-                    paths.add(current_path)
-                    paths.update(self.get_all_paths(prop_schema, current_path))
+                    # A dotted property name can repeat a nested path; the first one wins
+                    index.setdefault(current_path, (prop_schema.get('type', 'unknown'), prop_name in required))
+                    self.build_path_index(prop_schema, current_path, index)
             elif schema.get('type') == 'array' and 'items' in schema:
-                paths.update(self.get_all_paths(schema['items'], f"{parent_path}[]"))
+                self.build_path_index(schema['items'], f"{parent_path}[]", index)
         
-        return paths
+        return index
     
-    def get_field_info(self, schema: Dict, target_path: str, current_path: str = "") -> Dict:
-        """Get detailed information about a specific field path."""
-        if isinstance(schema, dict):
-            if schema.get('type') == 'object' and 'properties' in schema:
-                for prop_name, prop_schema in schema['properties'].items():
-                    field_path = f"{current_path}.{prop_name}" if current_path else prop_name
-                    
-                    if field_path == target_path:
-                        return {
-                            'type': prop_schema.get('type', 'unknown'),
-                            'required': prop_name in schema.get('required', []),
-                            'path': field_path
-                        }
-                    
-                    if target_path.startswith(field_path + "."):
-                        return self.get_field_info(prop_schema, target_path, field_path)
-            
-            elif schema.get('type') == 'array' and 'items' in schema:
-                array_path = f"{current_path}[]"
-                if target_path.startswith(array_path):
-                    remaining_path = target_path[len(array_path)+1:]
-                    if remaining_path:
-                        return self.get_field_info(schema['items'], remaining_path, array_path)
-        
-        return None
+    def get_path_index(self, schema_id: str) -> Dict[str, Tuple[str, bool]]:
+        """The path index of a loaded schema, built once when it was loaded (add_schema)."""
+        return self.path_indexes[schema_id]
+    
+    def get_diff_key(self, schema_id: str) -> str:
+        """
+        The key of a schema's comparison results in the diff cache: a digest of its
+        path index, i.e. exactly the field paths, types (unions included) and
+        required flags a comparison reads. Extractor fingerprints are not used, as
+        merged entries have none and the canonical form drops required/optional.
+        """
+        diff_key = self.diff_keys.get(schema_id)
+        if diff_key is None:
+            index = sorted(self.get_path_index(schema_id).items())
+            diff_key = hashlib.sha1(json.dumps(index, separators=(',', ':')).encode('utf-8')).hexdigest()
+            self.diff_keys[schema_id] = diff_key
+        return diff_key
     
     def compare_schemas(self, schema1: Dict, schema2: Dict) -> Dict:
         """Compare two schemas and return the differences."""
-        baseline_paths = self.get_all_paths(schema1)
-        comparison_paths = self.get_all_paths(schema2)
+        return self.compare_path_indexes(self.build_path_index(schema1), self.build_path_index(schema2))
+    
+    def compare_path_indexes(self, baseline_index: Dict[str, Tuple[str, bool]],
+                             comparison_index: Dict[str, Tuple[str, bool]]) -> Dict:
+        """Compare two schemas by their path indexes and return the differences."""
+        # Dict key views support set operations without copying the paths
+        baseline_paths = baseline_index.keys()
+        comparison_paths = comparison_index.keys()
         
         # Find differences
         missing_in_comparison = baseline_paths - comparison_paths
@@ -99,28 +188,27 @@ class SchemaDiffAnalyzer:
         
         # Check for type differences in common paths
         type_differences = []
-        for path in common_paths:
-            baseline_info = self.get_field_info(schema1, path)
-            comparison_info = self.get_field_info(schema2, path)
+        for path in sorted(common_paths):
+            baseline_type, baseline_required = baseline_index[path]
+            comparison_type, comparison_required = comparison_index[path]
             
-            if baseline_info and comparison_info:
-                if baseline_info['type'] != comparison_info['type']:
-                    type_differences.append({
-                        'path': path,
-                        'baseline_type': baseline_info['type'],
-                        'comparison_type': comparison_info['type']
-                    })
-                elif baseline_info['required'] != comparison_info['required']:
-                    type_differences.append({
-                        'path': path,
-                        'baseline_required': baseline_info['required'],
-                        'comparison_required': comparison_info['required'],
-                        'difference_type': 'required_status'
-                    })
+            if baseline_type != comparison_type:
+                type_differences.append({
+                    'path': path,
+                    'baseline_type': baseline_type,
+                    'comparison_type': comparison_type
+                })
+            elif baseline_required != comparison_required:
+                type_differences.append({
+                    'path': path,
+                    'baseline_required': baseline_required,
+                    'comparison_required': comparison_required,
+                    'difference_type': 'required_status'
+                })
         
         return {
-            'missing_fields': sorted(list(missing_in_comparison)),
-            'additional_fields': sorted(list(added_in_comparison)),
+            'missing_fields': sorted(missing_in_comparison),
+            'additional_fields': sorted(added_in_comparison),
             'type_differences': type_differences,
             'total_baseline_fields': len(baseline_paths),
             'total_comparison_fields': len(comparison_paths),
@@ -132,6 +220,13 @@ class SchemaDiffAnalyzer:
         print("\nAnalyzing schema differences...")
         print("-" * 50)
         
+        cached = {}
+        baseline_key = None
+        if self.diff_cache is not None:
+            baseline_key = self.get_diff_key(self.baseline_schema_id)
+            cached = self.diff_cache.load(baseline_key)
+        computed = 0
+        
         for schema_id, schema_info in self.schemas.items():
             if schema_id == self.baseline_schema_id:
                 # Skip the baseline schema
@@ -143,16 +238,109 @@ class SchemaDiffAnalyzer:
             
             print(f"Comparing {schema_id} with baseline...")
             
-            comparison_result = self.compare_schemas(
-                self.baseline_schema,
-                schema_info['schema']
-            )
+            diff_key = self.get_diff_key(schema_id) if self.diff_cache is not None else None
+            comparison = cached.get(diff_key)
+            if comparison is None:
+                schema_index = self.get_path_index(schema_id)
+                comparison_result = self.compare_path_indexes(
+                    self.get_path_index(self.baseline_schema_id),
+                    schema_index
+                )
+                # Types of the additional fields go with the result, so the reports
+                # need no path index of a schema whose comparison was cached
+                comparison = {
+                    'differences': comparison_result,
+                    'additional_field_info': {path: schema_index[path]
+                                              for path in comparison_result['additional_fields']}
+                }
+                if self.diff_cache is not None:
+                    self.diff_cache.add(baseline_key, diff_key, comparison)
+                computed += 1
             
             self.differences[schema_id] = {
                 'is_baseline': False,
                 'schema_info': schema_info,
-                'differences': comparison_result
+                'differences': comparison['differences'],
+                'additional_field_info': comparison['additional_field_info']
             }
+        
+        if self.diff_cache is not None:
+            self.diff_cache.flush()
+            print(f"Diff cache: {len(self.differences) - 1 - computed} comparisons reused, {computed} computed")
+    
+    def cluster_schemas(self, threshold: float = CLUSTER_THRESHOLD, workers: int = 1):
+        """
+        All-pairs mode: compute the Jaccard distance between the field path sets of
+        every pair of schemas, then group schemas into single-linkage families at
+        threshold. Each family is represented by its medoid, the member with the
+        smallest total distance to the others.
+        """
+        print(f"\nComputing all-pairs distances between {len(self.schemas)} schemas...")
+        
+        self.distance_ids = list(self.schemas)
+        bitsets, paths = encode_path_sets(self.get_path_index(schema_id).keys() for schema_id in self.distance_ids)
+        print(f"Encoded {len(paths)} distinct field paths as bitsets")
+        self.distance_matrix = jaccard_distance_matrix(bitsets, workers)
+        self.cluster_threshold = threshold
+        
+        counts = [self.schemas[schema_id]['count'] for schema_id in self.distance_ids]
+        self.clusters = []
+        for members in cluster_by_threshold(self.distance_matrix, threshold):
+            medoid, mean_distance = find_medoid(self.distance_matrix, members, counts)
+            distances = {i: pair_distance(self.distance_matrix, medoid, i) for i in members}
+            self.clusters.append({
+                'medoid': self.distance_ids[medoid],
+                'schema_count': len(members),
+                'record_count': sum(counts[i] for i in members),
+                'mean_distance_to_medoid': round(mean_distance, 4),
+                'members': [{'schema_id': self.distance_ids[i], 'distance_to_medoid': round(distances[i], 4)}
+                            for i in sorted(members, key=lambda i: (distances[i], i))]
+            })
+        
+        # Largest families by records first
+        self.clusters.sort(key=lambda cluster: -cluster['record_count'])
+        for number, cluster in enumerate(self.clusters, 1):
+            cluster['cluster_id'] = f"cluster_{number}"
+    
+    def print_cluster_summary(self):
+        """Print the schema families found in all-pairs mode."""
+        print("\n" + "=" * 80)
+        print(f"SCHEMA FAMILIES (Jaccard distance <= {self.cluster_threshold})")
+        print("=" * 80)
+        print(f"Schemas: {len(self.distance_ids)}, families: {len(self.clusters)}")
+        print()
+        
+        for cluster in self.clusters:
+            member_ids = [member['schema_id'] for member in cluster['members']]
+            print(f"{cluster['cluster_id']}: {cluster['schema_count']} schemas, {cluster['record_count']} records")
+            print(f"  Medoid: {cluster['medoid']} (mean distance {cluster['mean_distance_to_medoid']})")
+            print(f"  Members: {', '.join(member_ids[:10])}")
+            if len(member_ids) > 10:
+                print(f"    ... and {len(member_ids) - 10} more")
+    
+    def generate_cluster_report(self) -> str:
+        """Generate a JSON report with the schema families found in all-pairs mode."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        json_file = os.path.join(self.output_dir, f"schema_clusters_{timestamp}.json")
+        
+        report_data = {
+            'metadata': {
+                'generated_at': datetime.now().isoformat(),
+                'input_file': self.schema_file_path,
+                'distance': 'jaccard',
+                'linkage': 'single',
+                'threshold': self.cluster_threshold,
+                'total_schemas': len(self.distance_ids),
+                'total_clusters': len(self.clusters)
+            },
+            'clusters': {cluster['cluster_id']: {key: value for key, value in cluster.items() if key != 'cluster_id'}
+                         for cluster in self.clusters}
+        }
+        
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(report_data, f, indent=2, ensure_ascii=False)
+        
+        return json_file
     
     def print_summary(self):
         """Print a summary of all differences."""
@@ -160,7 +348,7 @@ class SchemaDiffAnalyzer:
         print("SCHEMA COMPARISON SUMMARY")
         print("=" * 80)
         
-        print(f"Baseline Schema: {self.baseline_schema_id}")
+        print(f"Baseline Schema: {self.baseline_schema_id} ({self.baseline_description()})")
         print(f"Baseline Schema Count: {self.schemas[self.baseline_schema_id]['count']} records")
         print()
         
@@ -212,22 +400,21 @@ class SchemaDiffAnalyzer:
             f.write("=" * 80 + "\n\n")
             f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"Input file: {self.schema_file_path}\n")
-            f.write(f"Baseline schema: {self.baseline_schema_id}\n\n")
+            f.write(f"Baseline schema: {self.baseline_schema_id} ({self.baseline_description()})\n\n")
             
             # Baseline schema details
             f.write("BASELINE SCHEMA DETAILS:\n")
             f.write("-" * 40 + "\n")
-            baseline_paths = self.get_all_paths(self.baseline_schema)
-            f.write(f"Total fields: {len(baseline_paths)}\n")
+            baseline_index = self.get_path_index(self.baseline_schema_id)
+            f.write(f"Total fields: {len(baseline_index)}\n")
             f.write(f"Record count: {self.schemas[self.baseline_schema_id]['count']}\n")
             f.write(f"Sample lines: {self.schemas[self.baseline_schema_id]['sample_lines']}\n\n")
             
             f.write("Baseline schema fields:\n")
-            for path in sorted(baseline_paths):
-                field_info = self.get_field_info(self.baseline_schema, path)
-                if field_info:
-                    required_status = "required" if field_info['required'] else "optional"
-                    f.write(f"  - {path} ({field_info['type']}, {required_status})\n")
+            for path in sorted(baseline_index):
+                field_type, required = baseline_index[path]
+                required_status = "required" if required else "optional"
+                f.write(f"  - {path} ({field_type}, {required_status})\n")
             f.write("\n")
             
             # Detailed comparison for each schema
@@ -247,20 +434,18 @@ class SchemaDiffAnalyzer:
                     f.write(f"MISSING FIELDS ({len(diff['missing_fields'])}):\n")
                     f.write("Fields present in baseline but missing in this schema:\n")
                     for field in diff['missing_fields']:
-                        field_info = self.get_field_info(self.baseline_schema, field)
-                        if field_info:
-                            required_status = "required" if field_info['required'] else "optional"
-                            f.write(f"  ✗ {field} ({field_info['type']}, {required_status})\n")
+                        field_type, required = baseline_index[field]
+                        required_status = "required" if required else "optional"
+                        f.write(f"  ✗ {field} ({field_type}, {required_status})\n")
                     f.write("\n")
                 
                 if diff['additional_fields']:
                     f.write(f"ADDITIONAL FIELDS ({len(diff['additional_fields'])}):\n")
                     f.write("Fields present in this schema but not in baseline:\n")
                     for field in diff['additional_fields']:
-                        field_info = self.get_field_info(diff_info['schema_info']['schema'], field)
-                        if field_info:
-                            required_status = "required" if field_info['required'] else "optional"
-                            f.write(f"  ✓ {field} ({field_info['type']}, {required_status})\n")
+                        field_type, required = diff_info['additional_field_info'][field]
+                        required_status = "required" if required else "optional"
+                        f.write(f"  ✓ {field} ({field_type}, {required_status})\n")
                     f.write("\n")
                 
                 if diff['type_differences']:
@@ -293,13 +478,14 @@ class SchemaDiffAnalyzer:
                 'generated_at': datetime.now().isoformat(),
                 'input_file': self.schema_file_path,
                 'baseline_schema_id': self.baseline_schema_id,
+                'baseline_strategy': self.baseline_description(),
                 'total_schemas': len(self.schemas)
             },
             'baseline_schema': {
                 'schema_id': self.baseline_schema_id,
                 'record_count': self.schemas[self.baseline_schema_id]['count'],
                 'sample_lines': self.schemas[self.baseline_schema_id]['sample_lines'],
-                'total_fields': len(self.get_all_paths(self.baseline_schema))
+                'total_fields': len(self.get_path_index(self.baseline_schema_id))
             },
             'schema_comparisons': {}
         }
@@ -319,6 +505,11 @@ class SchemaDiffAnalyzer:
             json.dump(report_data, f, indent=2, ensure_ascii=False)
         
         return json_file
+    
+    def close(self):
+        """Close the diff cache, if any."""
+        if self.diff_cache is not None:
+            self.diff_cache.close()
 
 
 def main():
@@ -327,18 +518,49 @@ def main():
     )
     parser.add_argument(
         "schema_file",
-        help="Path to the schema file generated by the schema extractor"
+        help="Path to the schema file generated by the schema extractor (.json, .jsonl, optionally .gz), "
+             "or a schema registry database"
     )
     parser.add_argument(
         "-o", "--output-dir",
         help="Output directory for reports (default: same as input file directory)"
     )
+    parser.add_argument(
+        "--baseline", default='first',
+        help="Schema every other schema is compared with: first (first seen), most-frequent "
+             "(most records), medoid (smallest total field difference to all others) or a "
+             "schema ID (default: first)"
+    )
+    parser.add_argument(
+        "--max-sample-lines", type=int, default=MAX_SAMPLE_LINES,
+        help="Maximum sample line numbers kept and reported per schema; 0 keeps all (default: 100)"
+    )
+    parser.add_argument(
+        "--diff-cache",
+        help="SQLite file caching comparison results by the (baseline, schema) field paths, types "
+             "and required flags, so later runs only compare new schema pairs (created if missing)"
+    )
+    parser.add_argument(
+        "--all-pairs", action="store_true",
+        help="Also compute the distance between every pair of schemas and report schema families "
+             "with a representative medoid each"
+    )
+    parser.add_argument(
+        "--cluster-threshold", type=float, default=CLUSTER_THRESHOLD,
+        help="Jaccard distance between field path sets at or below which schemas join the same "
+             "family (default: 0.2)"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help="Number of worker processes for the all-pairs distance matrix (default: 1)"
+    )
     
     args = parser.parse_args()
     
     try:
         # Create analyzer
-        analyzer = SchemaDiffAnalyzer(args.schema_file, args.output_dir)
+        analyzer = SchemaDiffAnalyzer(args.schema_file, args.output_dir, args.baseline, args.diff_cache,
+                                      args.max_sample_lines)
         
         # Load schemas
         analyzer.load_schemas()
@@ -353,9 +575,19 @@ def main():
         txt_report = analyzer.generate_detailed_report()
         json_report = analyzer.generate_json_report()
         
+        cluster_report = None
+        if args.all_pairs:
+            analyzer.cluster_schemas(args.cluster_threshold, args.workers)
+            analyzer.print_cluster_summary()
+            cluster_report = analyzer.generate_cluster_report()
+        
+        analyzer.close()
+        
         print(f"\nReports generated:")
         print(f"- Detailed text report: {txt_report}")
         print(f"- JSON report: {json_report}")
+        if cluster_report:
+            print(f"- Schema families report: {cluster_report}")
         
     except Exception as e:
         print(f"Error: {str(e)}")
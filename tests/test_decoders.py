@@ -0,0 +1,50 @@
+import json
+import math
+
+import pytest
+
+from jsonparsor import WIDE_INTEGER, available_decoder_backends, get_decoder_backend
+
+
+LINES = [
+    b'{"a": 18446744073709551616}',
+    b'{"a": [1, -9223372036854775809]}',
+    b'{"a": 18446744073709551615, "b": "\\u00e9"}',
+    b'{"a": "\\ud800"}',
+    b'{"a": Infinity, "b": -Infinity}',
+    b'{"id": "1700000000123456789012", "n": 1.5}',
+]
+
+
+@pytest.mark.parametrize("backend", available_decoder_backends())
+@pytest.mark.parametrize("line", LINES)
+def test_backends_decode_like_json(backend, line):
+    record = get_decoder_backend(backend).loads(line)
+    expected = json.loads(line)
+    assert record == expected
+    assert [type(value) for value in record.values()] == [type(value) for value in expected.values()]
+
+
+@pytest.mark.parametrize("backend", available_decoder_backends())
+def test_backends_keep_nan(backend):
+    assert math.isnan(get_decoder_backend(backend).loads(b'{"a": NaN}')['a'])
+
+
+@pytest.mark.parametrize("backend", available_decoder_backends())
+@pytest.mark.parametrize("line", [b'{bad', b'{"a": 1', b'{"a": nan}'])
+def test_backends_reject_what_json_rejects(backend, line):
+    decoder = get_decoder_backend(backend)
+    with pytest.raises(decoder.decode_errors):
+        decoder.loads(line)
+
+
+@pytest.mark.parametrize("line, wide", [
+    (b'{"a":18446744073709551616}', True),
+    (b'{"a": [1, -9223372036854775809]}', True),
+    (b'{"a":1234567890123456789.5}', True),
+    (b'{"request_id":"1700000000123456789"}', False),
+    (b'{"upstream_ts":"ts-17000000001234567890"}', False),
+    (b'{"a":123456789012345678}', False),
+])
+def test_wide_integer_prescan(line, wide):
+    assert (WIDE_INTEGER.search(line) is not None) == wide
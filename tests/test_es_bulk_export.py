@@ -0,0 +1,81 @@
+import json
+
+from es_bulk_export import ESBulkExporter, add_derived_fields, dumps_bytes, start_stub_server
+from jsonparsor import SchemaExtractor
+
+
+def make_record(status, start_time=1700000000000):
+    return {"route_id": "r1", "start_time": start_time, "response": {"status": status}}
+
+
+def test_dumps_bytes_large_integer():
+    assert json.loads(dumps_bytes({"id": 2 ** 70})) == {"id": 2 ** 70}
+
+
+def test_dumps_bytes_lone_surrogate():
+    assert json.loads(dumps_bytes({"name": "\ud800é"})) == {"name": "\ud800é"}
+
+
+def test_export_to_bulk_stub():
+    server, _ = start_stub_server(0)
+    try:
+        exporter = ESBulkExporter(endpoint=f"http://127.0.0.1:{server.server_address[1]}",
+                                  batch_bytes=256, max_in_flight=2, max_retries=0)
+        for status in (200, 404, 502, 201, 301):
+            exporter.add(make_record(status))
+        exporter.add({"big": 2 ** 70})
+        stats = exporter.close()
+    finally:
+        server.shutdown()
+
+    assert server.received_docs == 6
+    assert stats['docs'] == 6
+    assert stats['batches'] == server.received_batches > 1
+    assert stats['failed_docs'] == 0
+    assert stats['failed_batches'] == 0
+    assert stats['retries'] == 0
+
+
+def test_export_to_files(tmp_path):
+    exporter = ESBulkExporter(index="logs", output_dir=str(tmp_path))
+    exporter.add(make_record(503))
+    stats = exporter.close()
+
+    lines = (tmp_path / "bulk_000001.ndjson").read_bytes().splitlines()
+    assert json.loads(lines[0]) == {"index": {"_index": "logs"}}
+    document = json.loads(lines[1])
+    assert document['status_class'] == "5xx"
+    assert document['@timestamp'] == "2023-11-14T22:13:20.000Z"
+    assert document['day_of_week'] == "Tuesday"
+    assert stats == {'docs': 1, 'batches': 1, 'bytes': sum(len(line) + 1 for line in lines),
+                     'failed_docs': 0, 'failed_batches': 0, 'retries': 0}
+
+
+def test_start_time_out_of_range_gets_no_time_fields():
+    record = add_derived_fields(make_record(200, start_time=1e20))
+    assert record['status_class'] == "2xx"
+    assert 'hour_of_day' not in record and '@timestamp' not in record
+
+
+def test_export_error_fails_only_that_record(tmp_path):
+    log_file = tmp_path / "access.log"
+    log_file.write_bytes(b'{"route_id": "r1"}\n{"route_id": "boom"}\n{"route_id": "r2"}\n')
+    extractor = SchemaExtractor(str(log_file), str(tmp_path / "out"), verbose=False,
+                                es_export={'output_dir': str(tmp_path / "es")})
+    add = extractor.exporter.add
+
+    def failing_add(record):
+        if record['route_id'] == "boom":
+            raise RuntimeError("stage failed")
+        add(record)
+
+    extractor.exporter.add = failing_add
+    extractor.process_log_file()
+    extractor.close_failed_spill()
+
+    assert extractor.failed_count == 1
+    with open(extractor.failed_spill_path, encoding='utf-8') as f:
+        failed = json.loads(f.readline())
+    assert failed['line_number'] == 2
+    assert failed['error'] == "Export error: stage failed"
+    assert extractor.exporter.close()['docs'] == 2
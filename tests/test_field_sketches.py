@@ -0,0 +1,72 @@
+import json
+import math
+
+from field_sketches import DDSketch, FieldStatsCollector, PathStats
+
+
+def test_quantiles_within_relative_accuracy():
+    sketch = DDSketch()
+    for value in range(1, 1001):
+        sketch.add(value)
+    assert abs(sketch.quantile(0.5) - 500) <= 500 * 0.01 + 1
+    assert sketch.mean() == 500.5
+    assert (sketch.min, sketch.max) == (1, 1000)
+
+
+def test_infinities_and_nan_stay_out_of_the_buckets():
+    sketch = DDSketch()
+    for value in (1.0, 2.0, math.inf, -math.inf, float('1e400'), math.nan):
+        sketch.add(value)
+
+    assert (sketch.negative_infinite, sketch.positive_infinite, sketch.nan_count) == (1, 2, 1)
+    assert sketch.zero_count == 0
+    assert sketch.count == 6
+    assert (sketch.min, sketch.max) == (-math.inf, math.inf)
+    assert sketch.quantile(0.0) == -math.inf
+    assert abs(sketch.quantile(0.3) - 1.0) <= 0.01
+    assert sketch.quantile(0.99) == math.inf
+    assert math.isnan(sketch.mean())
+
+    restored = DDSketch.from_state(json.loads(json.dumps(sketch.to_state())))
+    assert restored.quantile(0.99) == math.inf
+    assert restored.nan_count == 1
+
+
+def test_only_nan():
+    sketch = DDSketch()
+    sketch.add(math.nan, 3)
+    assert math.isnan(sketch.quantile(0.5))
+    assert sketch.zero_count == 0
+
+
+def test_huge_integers():
+    sketch = DDSketch()
+    sketch.add(10 ** 400)
+    sketch.add(-10 ** 400)
+    sketch.add(5)
+    assert sketch.quantile(1.0) == 10 ** 400
+    assert sketch.quantile(0.0) == -10 ** 400
+    assert sketch.quantile(0.5) == sketch.bucket_value(math.ceil(math.log(5) / sketch.log_gamma))
+    assert sketch.mean() == 5 / 3
+
+
+def test_collector_summary_with_special_numbers():
+    collector = FieldStatsCollector()
+    for latency in (1.5, math.inf, -math.inf, math.nan, 10 ** 400):
+        collector.add_record({"latency": latency})
+    numeric = collector.summary()['paths']['root.latency']['numeric']
+    assert numeric['count'] == 5
+    assert numeric['max'] == math.inf
+
+
+def test_equal_values_of_different_types_stay_apart():
+    summaries = []
+    for values in ([1, 1.0, True, True], [True, True, 1.0, 1]):
+        stats = PathStats(top_k=5)
+        for value in values:
+            stats.add(value)
+        summaries.append(stats.summary(len(values)))
+
+    assert summaries[0] == summaries[1]
+    assert summaries[0]['numeric']['count'] == 2
+    assert sorted(summaries[0]['top_values'], key=repr) == [[1, 1], [1.0, 1], [True, 2]]
@@ -0,0 +1,73 @@
+import io
+import json
+
+import pytest
+
+from json_output import OUTPUT_FORMATS, iter_json_object, iter_json_table, write_json_table
+
+
+TABLE = {
+    "schema_1": {"count": 12, "ratio": -1.5e-3, "flags": [True, False, None], "big": 2 ** 70},
+    "esc\"aped\\key": {"text": "line\nbreak \"quoted\" \\ back\\slash é 😀 \\u0041"},
+    "nested": {"a": {"b": [{"c": "}{,:"}, [], {}]}, "n": 0, "e": 1E+10},
+    "empty": {},
+}
+
+
+def chunked_sizes(text):
+    return range(1, len(text) + 2)
+
+
+@pytest.mark.parametrize("dump", [
+    lambda table: json.dumps(table, indent=2, ensure_ascii=False),
+    lambda table: json.dumps(table, separators=(',', ':'), ensure_ascii=False),
+    lambda table: json.dumps(table),
+], ids=["pretty", "compact", "ascii"])
+def test_every_chunk_boundary(dump):
+    text = dump(TABLE)
+    for chunk_size in chunked_sizes(text):
+        assert dict(iter_json_object(io.StringIO(text), chunk_size)) == TABLE, chunk_size
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{}', []),
+    ('  \n{ }\n', []),
+    ('{"a":1}', [("a", 1)]),
+    ('{"a": 123456789, "b": 1.25e-7}', [("a", 123456789), ("b", 1.25e-7)]),
+    ('{"a": -0.5}\n', [("a", -0.5)]),
+    ('{"a":"\\\\"}', [("a", "\\")]),
+    ('{"a":"\\ud83d\\ude00"}', [("a", "\U0001F600")]),
+    ('{"a":true,"b":false,"c":null}', [("a", True), ("b", False), ("c", None)]),
+    ('{"a":Infinity,"b":-Infinity}', [("a", float('inf')), ("b", float('-inf'))]),
+])
+def test_values_split_anywhere(text, expected):
+    for chunk_size in chunked_sizes(text):
+        assert list(iter_json_object(io.StringIO(text), chunk_size)) == expected, chunk_size
+
+
+@pytest.mark.parametrize("text", ['', '[1]', '{"a" 1}', '{"a": 1', '{"a": 1,}', '{1: 2}', '{"a": 1 "b": 2}',
+                                  '{"a": "unterminated}'])
+def test_malformed(text):
+    for chunk_size in (1, 3, 1 << 20):
+        with pytest.raises(ValueError):
+            list(iter_json_object(io.StringIO(text), chunk_size))
+
+
+def test_entries_are_streamed():
+    text = '{"a": 1, "b": 2, "c": oops}'
+    entries = iter_json_object(io.StringIO(text), 4)
+    assert next(entries) == ("a", 1)
+    assert next(entries) == ("b", 2)
+    with pytest.raises(ValueError):
+        next(entries)
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+@pytest.mark.parametrize("compress", [False, True])
+def test_table_round_trip(tmp_path, output_format, compress):
+    path = write_json_table(str(tmp_path / "unique_schemas"), TABLE.items(), output_format, compress,
+                            key_field='schema_id')
+    assert list(iter_json_table(path)) == list(TABLE.items())
+    if output_format == 'pretty' and not compress:
+        with open(path, encoding='utf-8') as f:
+            assert f.read() == json.dumps(TABLE, indent=2, ensure_ascii=False)
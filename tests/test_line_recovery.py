@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from jsonparsor import SchemaExtractor
+from line_recovery import split_json_objects
+
+
+def test_single_object():
+    assert split_json_objects(b'{"a": 1}\n') == ([{"a": 1}], b'', False)
+
+
+def test_concatenated_objects():
+    objects, rest, truncated = split_json_objects(b'{"a": 1}{"b": [2]} {"c": "}{"}')
+    assert objects == [{"a": 1}, {"b": [2]}, {"c": "}{"}]
+    assert (rest, truncated) == (b'', False)
+
+
+@pytest.mark.parametrize("cut", [
+    b'{"a": "unterminated',
+    b'{"a": "escape \\',
+    b'{"a": tr',
+    b'{"a": nul',
+    b'{"a": -',
+    b'{"a": 12.',
+    b'{"a": 1e-',
+    b'{"a": [1, ',
+    b'{"a"',
+    b'{',
+])
+def test_truncated_remainder(cut):
+    objects, rest, truncated = split_json_objects(b'{"x": 0}' + cut)
+    assert objects == [{"x": 0}]
+    assert rest == cut
+    assert truncated
+
+
+@pytest.mark.parametrize("line", [b'{"a": 1} trailing', b'{"a": 1}{"a": x}', b'{"a": 1}[1, 2]'])
+def test_malformed_remainder(line):
+    objects, rest, truncated = split_json_objects(line)
+    assert objects == [{"a": 1}]
+    assert rest and not truncated
+
+
+def test_invalid_utf8():
+    assert split_json_objects(b'{"a": "\xff"}') == ([], b'{"a": "\xff"}', False)
+
+
+@pytest.mark.parametrize("decoder", ["json", "auto"])
+def test_extractor_recovers_concatenated_and_split_lines(tmp_path, decoder):
+    log_file = tmp_path / "access.log"
+    log_file.write_bytes(
+        b'{"route_id": "r1", "status": 200}{"route_id": "r2", "status": 404}\n'
+        b'{"route_id": "r3", "upstream": "10.0.0.1:80",\n'
+        b' "status": 502}\n'
+        b'{"route_id": "r4", "status": 200}\n'
+        b'{"route_id": \n'
+        b'not json\n'
+    )
+    extractor = SchemaExtractor(str(log_file), str(tmp_path / "out"), verbose=False, decoder=decoder)
+    extractor.process_log_file()
+    extractor.close_failed_spill()
+
+    assert extractor.processed_count == 4
+    assert extractor.recovered_concatenated == 2
+    assert extractor.recovered_split == 1
+    assert extractor.failed_count == 2
+    assert sorted(info['count'] for info in extractor.schemas.values()) == [1, 3]
+
+    with open(extractor.failed_spill_path, encoding='utf-8') as f:
+        failed = [json.loads(line) for line in f]
+    assert [record['line_number'] for record in failed] == [5, 6]
@@ -0,0 +1,50 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from parquet_export import ParquetPartitionWriter, publish_partitions
+from schema_nodes import LEAF_NODES, SchemaNode
+
+
+SHAPE = SchemaNode('object', ['start_time', 'bytes'], [LEAF_NODES[int], LEAF_NODES[int]])
+
+# 2023-11-14 and 2020-09-13 in epoch millis
+DAY_1 = 1700000000000
+DAY_2 = 1600000000000
+
+
+def read_partitions(paths):
+    tables = {}
+    for path in paths:
+        date = path.split("date=")[1].split("/")[0]
+        tables.setdefault(date, []).append(pq.read_table(path))
+    return tables
+
+
+def test_partitions_by_schema_and_date(tmp_path):
+    writer = ParquetPartitionWriter(str(tmp_path), batch_rows=2)
+    for start_time, size in ((DAY_1, 1), (DAY_2, 2), (DAY_1, 3)):
+        writer.add({"start_time": start_time, "bytes": size}, SHAPE, "fp")
+    published = publish_partitions(str(tmp_path), writer.flush(), {"fp": "schema_1"})
+
+    tables = read_partitions(published)
+    assert sorted(tables) == ["2020-09-13", "2023-11-14"]
+    assert tables["2023-11-14"][0].column("bytes").to_pylist() == [1, 3]
+    assert tables["2023-11-14"][0].schema.field("bytes").type == pa.int64()
+    assert all(path.startswith(str(tmp_path / "schema_id=schema_1")) for path in published)
+    assert not (tmp_path / "_staging").exists()
+
+
+def test_wide_integer_widens_column_in_every_date(tmp_path):
+    writer = ParquetPartitionWriter(str(tmp_path), batch_rows=2)
+    writer.add({"start_time": DAY_1, "bytes": 1}, SHAPE, "fp")
+    writer.add({"start_time": DAY_2, "bytes": 2}, SHAPE, "fp")
+    writer.add({"start_time": DAY_1, "bytes": 2 ** 70}, SHAPE, "fp")
+    writer.add({"start_time": DAY_2, "bytes": 3}, SHAPE, "fp")
+    published = publish_partitions(str(tmp_path), writer.flush(), {"fp": "schema_1"})
+
+    tables = read_partitions(published)
+    assert tables["2023-11-14"][0].column("bytes").to_pylist() == ["1", str(2 ** 70)]
+    assert tables["2020-09-13"][0].column("bytes").to_pylist() == ["2", "3"]
+    assert writer.rows_written == 4
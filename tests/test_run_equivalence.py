@@ -0,0 +1,192 @@
+"""
+Serial, --workers and resumed-after-kill runs of the extractor must write
+byte-identical unique_schemas and failed_records files.
+"""
+
+import glob
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTRACTOR = os.path.join(ROOT, "jsonparsor.py")
+
+# Run the extractor CLI, killing the process with SIGKILL when it reaches a line
+KILL_AT_LINE = """
+import os, signal, sys
+sys.path.insert(0, {root!r})
+import jsonparsor
+
+process_line = jsonparsor.SchemaExtractor.process_line
+
+def killing_process_line(self, raw_line, line_number):
+    if line_number == {line}:
+        os.kill(os.getpid(), signal.SIGKILL)
+    return process_line(self, raw_line, line_number)
+
+jsonparsor.SchemaExtractor.process_line = killing_process_line
+sys.argv = ["jsonparsor.py"] + {args!r}
+jsonparsor.main()
+"""
+
+
+def log_lines(count, seed=7):
+    """APISIX-like lines with several schemas, malformed, concatenated and split records."""
+    rng = random.Random(seed)
+    lines = []
+    while len(lines) < count:
+        record = {"route_id": f"r{rng.randrange(5)}", "status": rng.choice([200, 404, 502]),
+                  "start_time": 1700000000000 + len(lines), "latency": rng.random() * 100}
+        if rng.random() < 0.3:
+            record["upstream"] = {"addr": "10.0.0.1:80", "tries": [rng.randrange(3)]}
+        if rng.random() < 0.1:
+            record["headers"] = {"x-request-id": str(rng.getrandbits(64))}
+        line = json.dumps(record)
+        kind = rng.random()
+        if kind < 0.03:
+            lines.append(line[:rng.randrange(1, len(line))].replace("\n", ""))
+        elif kind < 0.06:
+            lines.append(line + json.dumps({"route_id": "r9", "status": 200}))
+        elif kind < 0.09:
+            cut = line.index(",") + 1
+            lines.extend([line[:cut], line[cut:]])
+        else:
+            lines.append(line)
+    return [line.encode("utf-8") + b"\n" for line in lines]
+
+
+def write_plain(path, lines):
+    path.write_bytes(b"".join(lines))
+
+
+def write_gzip_members(path, lines, members=6):
+    """A gzip file of several members, cut at arbitrary bytes (not line boundaries)."""
+    data = b"".join(lines)
+    cuts = sorted(random.Random(3).sample(range(1, len(data)), members - 1))
+    with open(path, "wb") as f:
+        for start, end in zip([0] + cuts, cuts + [len(data)]):
+            f.write(gzip.compress(data[start:end]))
+
+
+def write_zstd_frames(path, lines, frames=6):
+    zstandard = pytest.importorskip("zstandard")
+    data = b"".join(lines)
+    step = len(data) // frames + 1
+    with open(path, "wb") as f:
+        for start in range(0, len(data), step):
+            f.write(zstandard.ZstdCompressor().compress(data[start:start + step]))
+
+
+def run(args, check=True):
+    return subprocess.run([sys.executable, EXTRACTOR, *args], capture_output=True, check=check)
+
+
+def run_killed(args, line):
+    script = KILL_AT_LINE.format(root=ROOT, line=line, args=list(args))
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True)
+    assert result.returncode == -9, result.stderr.decode()
+
+
+def read_output(directory, prefix):
+    paths = glob.glob(os.path.join(directory, prefix + "_*"))
+    assert len(paths) <= 1, paths
+    if not paths:
+        return None
+    with open(paths[0], "rb") as f:
+        data = f.read()
+    return gzip.decompress(data) if paths[0].endswith(".gz") else data
+
+
+def outputs(directory):
+    return {prefix: read_output(directory, prefix) for prefix in ("unique_schemas", "failed_records")}
+
+
+@pytest.fixture(scope="module")
+def lines():
+    return log_lines(6000)
+
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory, lines):
+    """Output of a serial run over the plain log."""
+    directory = tmp_path_factory.mktemp("reference")
+    log_file = directory / "access.log"
+    write_plain(log_file, lines)
+    run([str(log_file), "-o", str(directory / "out")])
+    result = outputs(str(directory / "out"))
+    assert result["unique_schemas"] and result["failed_records"]
+    return result
+
+
+WRITERS = {"plain": write_plain, "gzip": write_gzip_members, "zstd": write_zstd_frames}
+
+
+@pytest.mark.parametrize("compression", list(WRITERS))
+@pytest.mark.parametrize("workers", [1, 2, 5])
+def test_workers_match_serial(tmp_path, lines, reference, compression, workers):
+    log_file = tmp_path / "access.log"
+    WRITERS[compression](log_file, lines)
+    run([str(log_file), "-o", str(tmp_path / "out"), "--workers", str(workers)])
+    assert outputs(str(tmp_path / "out")) == reference
+
+
+@pytest.mark.parametrize("compression", list(WRITERS))
+@pytest.mark.parametrize("kill_line", [1500, 4900])
+def test_resume_after_kill_matches_serial(tmp_path, lines, reference, compression, kill_line):
+    log_file = tmp_path / "access.log"
+    WRITERS[compression](log_file, lines)
+    args = [str(log_file), "-o", str(tmp_path / "out"), "--resume", "--checkpoint-interval", "0"]
+
+    run_killed(args, kill_line)
+    assert os.path.exists(tmp_path / "out" / "access.log.resume.json")
+    run(args)
+
+    assert outputs(str(tmp_path / "out")) == reference
+    assert not os.path.exists(tmp_path / "out" / "access.log.resume.json")
+
+
+def test_gzip_output_matches_serial(tmp_path, lines, reference):
+    log_file = tmp_path / "access.log"
+    write_plain(log_file, lines)
+    args = [str(log_file), "-o", str(tmp_path / "out"), "--resume", "--checkpoint-interval", "0",
+            "--gzip-output"]
+
+    run_killed(args, 3000)
+    run(args)
+
+    assert outputs(str(tmp_path / "out")) == reference
+
+
+def test_registry_ids_match_serial(tmp_path, lines):
+    log_file = tmp_path / "access.log"
+    write_plain(log_file, lines)
+    results = []
+    for workers in (1, 3):
+        out = tmp_path / f"out{workers}"
+        run([str(log_file), "-o", str(out), "--workers", str(workers),
+             "--registry", str(tmp_path / f"registry{workers}.db")])
+        results.append(outputs(str(out)))
+    assert results[0] == results[1]
+
+
+def test_parquet_rows_match_serial(tmp_path, lines):
+    pq = pytest.importorskip("pyarrow.parquet")
+    log_file = tmp_path / "access.log"
+    write_plain(log_file, lines)
+    rows = []
+    for workers in (1, 3):
+        parquet_dir = tmp_path / f"parquet{workers}"
+        run([str(log_file), "-o", str(tmp_path / f"out{workers}"), "--workers", str(workers),
+             "--parquet", str(parquet_dir)])
+        partitions = {}
+        for path in glob.glob(str(parquet_dir / "schema_id=*" / "date=*" / "*.parquet")):
+            partition = os.path.relpath(os.path.dirname(path), parquet_dir)
+            partitions.setdefault(partition, []).extend(
+                json.dumps(row, sort_keys=True) for row in pq.read_table(path).to_pylist())
+        rows.append({partition: sorted(values) for partition, values in partitions.items()})
+    assert rows[0] and rows[0] == rows[1]
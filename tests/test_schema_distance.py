@@ -0,0 +1,20 @@
+from schema_distance import cluster_by_threshold, encode_path_sets, jaccard_distance_matrix, pair_distance
+
+
+def test_pair_at_threshold_is_clustered():
+    bitsets, _ = encode_path_sets([list("abcde"), list("abcd"), list("abcdefghij"), list("abcdefg")])
+    matrix = jaccard_distance_matrix(bitsets)
+
+    assert pair_distance(matrix, 0, 1) == 0.2
+    assert pair_distance(matrix, 2, 3) == 0.3
+    assert cluster_by_threshold(matrix, 0.2) == [[0, 1], [2], [3]]
+    assert cluster_by_threshold(matrix, 0.3) == [[0, 1, 2, 3]]
+    assert cluster_by_threshold(matrix, 0.19) == [[0], [1], [2], [3]]
+
+
+def test_empty_path_sets_are_identical():
+    bitsets, _ = encode_path_sets([[], [], ["a"]])
+    matrix = jaccard_distance_matrix(bitsets)
+
+    assert pair_distance(matrix, 0, 1) == 0.0
+    assert pair_distance(matrix, 0, 2) == 1.0
@@ -0,0 +1,59 @@
+import json
+
+from jsonparsor import SchemaExtractor
+from schema_registry import SchemaRegistry, is_registry_file
+
+
+def test_ids_are_stable_and_counts_accumulate(tmp_path):
+    db_path = str(tmp_path / "registry.db")
+    registry = SchemaRegistry(db_path)
+    first = registry.get_or_create("fp-a", {"type": "object"}, "access.log", 1)
+    second = registry.get_or_create("fp-b", {"type": "string"}, "access.log", 2)
+    registry.flush_counts({"fp-a": 3, "fp-b": 1})
+    registry.close()
+
+    registry = SchemaRegistry(db_path)
+    assert registry.get_or_create("fp-b", {"type": "string"}) == second
+    assert registry.get_or_create("fp-c", {"type": "null"}) == "schema_3"
+    registry.flush_counts({"fp-a": 2, "fp-c": 1})
+    schemas = registry.load_schemas()
+    registry.close()
+
+    assert (first, second) == ("schema_1", "schema_2")
+    assert {schema_id: info['count'] for schema_id, info in schemas.items()} == \
+        {"schema_1": 5, "schema_2": 1, "schema_3": 1}
+    assert schemas["schema_1"]['first_seen_source'] == "access.log"
+    assert is_registry_file(db_path)
+    assert not is_registry_file(str(tmp_path / "missing.db"))
+
+
+def test_flush_without_counts_only_marks_seen(tmp_path):
+    registry = SchemaRegistry(str(tmp_path / "registry.db"))
+    registry.get_or_create("fp-a", {"type": "object"})
+    registry.flush_counts({"fp-a": 4})
+    registry.flush_counts({"fp-a": 7}, add_counts=False)
+    assert registry.load_schemas()["schema_1"]['count'] == 4
+    registry.close()
+
+
+def test_extractor_runs_share_registry_ids(tmp_path):
+    db_path = str(tmp_path / "registry.db")
+    logs = [b'{"a": 1}\n{"b": "x"}\n', b'{"c": null}\n{"b": "y"}\n{"a": 2}\n']
+    ids = []
+    for run, data in enumerate(logs):
+        log_file = tmp_path / f"access{run}.log"
+        log_file.write_bytes(data)
+        extractor = SchemaExtractor(str(log_file), str(tmp_path / f"out{run}"), verbose=False,
+                                    registry_path=db_path)
+        extractor.process_log_file()
+        extractor.save_results()
+        ids.append({json.dumps(sorted(info['schema'].names)): schema_id
+                    for schema_id, info in extractor.schemas.items()})
+
+    assert ids[1]['["a"]'] == ids[0]['["a"]']
+    assert ids[1]['["b"]'] == ids[0]['["b"]']
+    assert ids[1]['["c"]'] == "schema_3"
+    registry = SchemaRegistry(db_path)
+    assert {info['count'] for info in registry.load_schemas().values()} == {2, 1}
+    assert registry.load_schemas()[ids[0]['["a"]']]['count'] == 2
+    registry.close()
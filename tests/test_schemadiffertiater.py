@@ -0,0 +1,49 @@
+import json
+
+from schemadiffertiater import SchemaDiffAnalyzer
+
+
+def merged_entry(properties, required, first_seen):
+    return {"schema": {"type": "object", "properties": properties, "required": required,
+                       "optional": [name for name in properties if name not in required]},
+            "count": 1, "first_seen": first_seen, "sample_lines": [first_seen]}
+
+
+def write_schemas(path, table):
+    path.write_text(json.dumps(table, indent=2), encoding='utf-8')
+    return str(path)
+
+
+def test_load_merged_schemas_with_type_unions(tmp_path):
+    schema_file = write_schemas(tmp_path / "merged_schemas.json", {
+        "route_id:r1": merged_entry({"a": {"type": ["integer", "string"]}, "b": {"type": "string"}}, ["a"], 1),
+        "route_id:r2": merged_entry({"a": {"type": "integer"}}, ["a"], 2),
+    })
+    analyzer = SchemaDiffAnalyzer(schema_file, str(tmp_path / "out"))
+    analyzer.load_schemas()
+    analyzer.analyze_all_schemas()
+
+    assert analyzer.get_path_index("route_id:r1") == {"a": (["integer", "string"], True), "b": ("string", False)}
+    differences = analyzer.differences["route_id:r2"]["differences"]
+    assert differences["missing_fields"] == ["b"]
+    assert differences["type_differences"] == [
+        {"path": "a", "baseline_type": ["integer", "string"], "comparison_type": "integer"}]
+
+
+def test_diff_cache_keys_on_required_fields(tmp_path):
+    properties = {"a": {"type": "integer"}, "b": {"type": "string"}}
+    cache_path = str(tmp_path / "diffs.db")
+    results = []
+    for run, required in enumerate((["a"], ["a", "b"])):
+        schema_file = write_schemas(tmp_path / f"merged_{run}.json", {
+            "route_id:r0": merged_entry(properties, ["a", "b"], 1),
+            "route_id:r1": merged_entry(properties, required, 2),
+        })
+        analyzer = SchemaDiffAnalyzer(schema_file, str(tmp_path / "out"), diff_cache_path=cache_path)
+        analyzer.load_schemas()
+        analyzer.analyze_all_schemas()
+        analyzer.diff_cache.close()
+        results.append(analyzer.differences["route_id:r1"]["differences"]["type_differences"])
+
+    assert [difference["path"] for difference in results[0]] == ["b"]
+    assert results[1] == []